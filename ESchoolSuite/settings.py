@@ -188,6 +188,17 @@ MEDIA_ROOT = BASE_DIR / 'media'
 CELERY_TIMEZONE = "Africa/Accra"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+CELERY_BEAT_SCHEDULE = {
+    # Releases scheduled bulk messages that are due
+    'release-scheduled-bulk-messages': {
+        'task': 'ESchoolSuite.tasks.release_scheduled_messages_task',
+        'schedule': 60.0,
+    },
+}
+
+# Score changes queue a grade recompute that runs this many seconds after the first change in a burst
+GRADE_RECOMPUTE_DEBOUNCE_SECONDS = 5
+GRADE_RECOMPUTE_BATCH_SIZE = 500
 
 # cache configuration using redis
 CACHES = {
@@ -199,6 +210,20 @@ CACHES = {
         },
     }
 }
+# Students per report card rendering task; the chunks of a batch run in parallel across the Celery workers
+REPORT_CARD_BATCH_CHUNK_SIZE = 50
+
+# The dashboard snapshot is served while older than this, but recomputed in the background
+DASHBOARD_SNAPSHOT_MAX_AGE = 5 * 60
+
+# Custom report results are cached until a model they read is written to, or for at most this long
+REPORT_CACHE_TIMEOUT = 5 * 60
+# Larger custom reports are streamed without being cached
+REPORT_CACHE_MAX_ROWS = 10000
+
+# The course availability index and each class's cached open seats; seat changes only refresh their own class
+COURSE_AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
 # celery and redis configurations
 CELERY_BROKER_URL = 'redis://localhost:6379'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379'
@@ -238,10 +263,23 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
+# Bulk messages stream their recipients from the database in chunks of this size
+RECIPIENT_CHUNK_SIZE = 500
+# Bulk messages to at least this many recipients are spread over BULK_MESSAGE_SEND_WINDOW seconds
+BULK_MESSAGE_SPREAD_THRESHOLD = 1000
+BULK_MESSAGE_SEND_WINDOW = 10 * 60
+# Bulk email: recipients per batch task (each batch reuses one SMTP connection) and retries of temporary failures
+EMAIL_BATCH_SIZE = 50
+EMAIL_MAX_RETRIES = 3
 
 
 ARKESEL_API_KEY =  config('ARKESEL_API_KEY')
 ARKESEL_SENDER_ID =  config('ARKESEL_SENDER_ID')
+ARKESEL_SMS_URL = config('ARKESEL_SMS_URL', default='https://sms.arkesel.com/v2/sms/send')  # Point at `manage.py sms_stub_server` to test throughput
+# Bulk SMS: recipients per request, messages per minute allowed by the provider, concurrent requests
+SMS_BATCH_SIZE = 100
+SMS_RATE_LIMIT = 100
+SMS_WORKERS = 4
 
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': config('CLOUDINARY_CLOUD_NAME'),
@@ -1,10 +1,19 @@
 from __future__ import absolute_import, unicode_literals
-from time import sleep
-from celery import shared_task
+import math
+from celery import chord, shared_task
 from django.core.mail import send_mail
 from django.conf import settings
-import requests
 from students.models import AdmissionApplication, Student
+from academics.grading import drain_recompute_queue
+from reports.batch import fail_report_card_batch, finish_report_card_batch, render_report_card_chunk, start_report_card_batch
+from dashboard.snapshot import refresh_dashboard_snapshot
+from reports.models import ReportCardBatch
+from communications.mailer import is_permanent_failure, send_individual_emails
+from communications.delivery import create_delivery_logs, finish_bulk_message, record_deliveries
+from communications.models import BulkMessage
+from communications.recipients import count_recipients, recipient_chunks
+from communications.scheduling import claim_bulk_message, due_bulk_message_ids, send_window
+from communications.sms import ArkeselClient, send_bulk_sms, sms_rate_limiter
 from django.utils.html import strip_tags
 from django.template.loader import render_to_string
 
@@ -43,70 +52,177 @@ from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
 
+@shared_task(bind=True, max_retries=getattr(settings, 'EMAIL_MAX_RETRIES', 3))
+def send_email_batch_task(self, subject, message_body, from_email, recipients, bulk_message_id=None):
+    """
+    Sends each recipient of the batch their own message over one SMTP connection and
+    returns {recipient: "sent" or "failed: <error>"}. Only recipients that failed with a
+    temporary error are retried, with exponential backoff. Outcomes are written to the bulk
+    message's delivery logs when one is given.
+    """
+    outcomes, message_ids = send_individual_emails(subject, message_body, from_email, recipients)
+    retry = [recipient for recipient, error in outcomes.items() if error and not is_permanent_failure(error)]
+    if self.request.retries >= self.max_retries:
+        retry = []
+    for recipient, error in outcomes.items():
+        if error:
+            print(f"Failed to send email to {recipient}: {error}")
+    print(f"Email batch sent to {sum(error is None for error in outcomes.values())} of {len(recipients)} recipient(s)")
+    if bulk_message_id:
+        record_deliveries(bulk_message_id, outcomes, message_ids, retrying=retry)
+
+    if retry:
+        self.retry(args=(subject, message_body, from_email, retry, bulk_message_id), countdown=60 * 2 ** self.request.retries)
+    return {recipient: "sent" if error is None else f"failed: {error}" for recipient, error in outcomes.items()}
+
+
+@shared_task
+def send_sms_chunk_task(bulk_message_id, message_body, recipients):
+    """
+    Sends one chunk of a bulk SMS message within the shared rate limit (see
+    communications.sms.send_bulk_sms) and writes the outcomes to its delivery logs.
+    """
+    result = send_bulk_sms(settings.ARKESEL_API_KEY, settings.ARKESEL_SENDER_ID, message_body, recipients)
+    outcomes = dict.fromkeys(recipients)
+    outcomes.update(result['failed'])
+    record_deliveries(bulk_message_id, outcomes, result['provider_ids'])
+    print(f"SMS chunk sent to {result['sent']} of {len(recipients)} recipient(s)")
+    return result['sent']
+
+
 @shared_task
-def send_bulk_email_task(subject, message_body, from_email, recipient_list):
+def dispatch_bulk_message_task(bulk_message_id):
+    """
+    Streams a bulk message's recipients from the database in chunks, recording each chunk
+    in the delivery log and queueing it as its own task: an email batch, or an SMS chunk
+    sent under the shared rate limit. The message is Sending once every chunk is out, and
+    Sent (or Failed when it reached no one) when nothing is pending.
+    """
     try:
-        send_mail(
-            subject=subject,
-            message=message_body,
-            from_email=from_email,
-            recipient_list=recipient_list,
-            fail_silently=False,
-        )
-        return "success"  # Indicate successful sending
-    except Exception as e:
-        return f"failed: {str(e)}"  # Indicate failure
-    
+        bulk_message = BulkMessage.objects.get(pk=bulk_message_id)
+    except BulkMessage.DoesNotExist:
+        print(f"Error: Bulk message with ID {bulk_message_id} not found.")
+        return
+    if bulk_message.status != 'Queued':
+        print(f"Bulk message {bulk_message_id} is {bulk_message.status}, not dispatching it.")
+        return
+
+    # Large sends are spread over BULK_MESSAGE_SEND_WINDOW instead of all going out at once
+    channel = 'email' if bulk_message.delivery_method == BulkMessage.DeliveryMethod.EMAIL else 'sms'
+    if channel == 'email':
+        chunk_size = getattr(settings, 'EMAIL_BATCH_SIZE', 50)
+    else:
+        chunk_size = getattr(settings, 'RECIPIENT_CHUNK_SIZE', 500)
+    expected = count_recipients(bulk_message.recipient_group, bulk_message.custom_recipients, channel)
+    window = send_window(expected)
+    interval = window / max(math.ceil(expected / chunk_size), 1)
+
+    total = 0
+    chunks = recipient_chunks(bulk_message.recipient_group, bulk_message.custom_recipients, channel, chunk_size=chunk_size)
+    for index, chunk in enumerate(chunks):
+        chunk = create_delivery_logs(bulk_message_id, chunk)
+        if not chunk:
+            continue
+        countdown = min(index * interval, window)
+        if channel == 'email':
+            send_email_batch_task.apply_async(
+                args=(bulk_message.subject, bulk_message.message_body, settings.DEFAULT_FROM_EMAIL, chunk, bulk_message_id),
+                countdown=countdown,
+            )
+        else:
+            send_sms_chunk_task.apply_async(args=(bulk_message_id, bulk_message.message_body, chunk), countdown=countdown)
+        total += len(chunk)
+
+    BulkMessage.objects.filter(pk=bulk_message_id, status='Queued').update(status='Sending')
+    finish_bulk_message(bulk_message_id)
+    print(f"Bulk message {bulk_message_id} dispatched to {total} recipient(s)")
+    return total
 
 
 @shared_task
-def send_bulk_sms_task(api_key, sender_id, message_body, recipients):
+def release_scheduled_messages_task():
     """
-    Sends bulk SMS messages using Arkesel's API with rate limiting.
+    Releases the bulk messages whose scheduled time has come, oldest first. Runs every
+    minute from Celery beat, and at each message's scheduled time as a Celery ETA.
+    """
+    released = 0
+    for bulk_message_id in due_bulk_message_ids():
+        if claim_bulk_message(bulk_message_id):
+            dispatch_bulk_message_task.delay(bulk_message_id)
+            released += 1
+    if released:
+        print(f"Released {released} scheduled bulk message(s)")
+    return released
+
+
+@shared_task
+def process_grade_recompute_queue():
+    """Recomputes the grades queued by score changes, in batches."""
+    processed = drain_recompute_queue()
+    print(f"Recomputed {processed} queued grade(s)")
+    return processed
+
 
-    Args:
-        api_key: Your Arkesel API key.
-        sender_id: Your Arkesel sender ID.
-        message_body: The message content.
-        recipients: A list of recipient phone numbers.
+@shared_task
+def refresh_dashboard_snapshot_task():
+    """Recomputes the cached dashboard snapshot."""
+    snapshot = refresh_dashboard_snapshot()
+    return snapshot['computed_at']
+
+
+@shared_task
+def generate_report_card_batch_task(batch_id):
     """
-    url = "https://sms.arkesel.com/v2/sms/send"
-    headers = {'api-key': api_key}
-
-    # Arkesel API rate limit: 100 messages per minute (adjust if needed)
-    rate_limit = 100
-    delay = 60 / rate_limit  # Delay in seconds between messages
-
-    for recipient_chunk in chunks(recipients, rate_limit):
-        for recipient in recipient_chunk:
-            payload = {
-                'sender': sender_id,
-                'message': message_body,
-                'recipients': [recipient]
-            }
-            try:
-                response = requests.post(url, headers=headers, json=payload)
-                response.raise_for_status()  # Raise an exception for bad status codes
-
-                # Check for successful response from Arkesel
-                if response.json()['status'] == 'success':
-                    print(f"SMS sent to {recipient}")
-                else:
-                    print(f"Failed to send SMS to {recipient}: {response.json()}")
-
-            except requests.exceptions.RequestException as e:
-                print(f"Error sending SMS to {recipient}: {e}")
-            except (KeyError, ValueError):
-                print(f"Error sending SMS to {recipient}: Invalid response format")
-
-            sleep(delay)  # Delay to respect rate limit
-
-def chunks(lst, n):
-    """Yield successive n-sized chunks from lst."""
-    for i in range(0, len(lst), n):
-        yield lst[i:i + n]
-        
-        
+    Generates the report cards of a ReportCardBatch: the cards to render are split into
+    chunks, each rendered by its own task so the work spreads over every worker, and a
+    final task completes the batch once all chunks are done.
+    """
+    try:
+        batch = ReportCardBatch.objects.get(pk=batch_id)
+    except ReportCardBatch.DoesNotExist:
+        print(f"Error: Report card batch with ID {batch_id} not found.")
+        return
+    try:
+        chunks = start_report_card_batch(batch)
+    except Exception as e:
+        fail_report_card_batch(batch, e)
+        raise
+    if not chunks:
+        return finish_report_card_batch_task([], batch_id)
+    # A chunk task that raises skips the callback, so the errback fails the batch instead of leaving it Running
+    callback = finish_report_card_batch_task.s(batch_id).on_error(fail_report_card_batch_task.si(batch_id))
+    chord(render_report_card_chunk_task.s(batch_id, chunk) for chunk in chunks)(callback)
+    print(f"Report card batch {batch_id} split into {len(chunks)} chunk(s)")
+    return len(chunks)
+
+
+@shared_task
+def render_report_card_chunk_task(batch_id, student_ids):
+    """Renders and writes the report cards of one chunk of a batch's students."""
+    batch = ReportCardBatch.objects.get(pk=batch_id)
+    return render_report_card_chunk(batch, student_ids)
+
+
+@shared_task
+def finish_report_card_batch_task(chunk_manifests, batch_id):
+    """Completes a report card batch with the manifests of its chunks."""
+    batch = ReportCardBatch.objects.get(pk=batch_id)
+    manifest = finish_report_card_batch(batch, chunk_manifests)
+    print(f"Report card batch {batch_id} finished with {len(manifest)} entries")
+    return len(manifest)
+
+
+@shared_task
+def fail_report_card_batch_task(batch_id):
+    """Marks a report card batch Failed when one of its chunk tasks raised."""
+    try:
+        batch = ReportCardBatch.objects.get(pk=batch_id)
+    except ReportCardBatch.DoesNotExist:
+        print(f"Error: Report card batch with ID {batch_id} not found.")
+        return
+    fail_report_card_batch(batch, "A report card chunk failed to render; see the worker logs.")
+    print(f"Report card batch {batch_id} failed")
+
 
 @shared_task
 def send_report_card_sms_task(student_id, report_card_url):
@@ -129,24 +245,13 @@ def send_report_card_sms_task(student_id, report_card_url):
     sender_id = settings.ARKESEL_SENDER_ID
     message = f"Dear Parent, your child's report card is ready. Download it here: {report_card_url}"
 
-    url = "https://sms.arkesel.com/v2/sms/send"
-    headers = {'api-key': api_key}
-    payload = {
-        'sender': sender_id,
-        'message': message,
-        'recipients': [parent_phone_number]
-    }
-
+    sms_rate_limiter().acquire()
+    client = ArkeselClient(api_key, sender_id)
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-
-        if response.json()['status'] == 'success':
-            print(f"Report card SMS sent to {parent_phone_number}")
-        else:
-            print(f"Failed to send report card SMS to {parent_phone_number}: {response.json()}")
-
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending SMS to {parent_phone_number}: {e}")
-    except (KeyError, ValueError):
-        print(f"Error sending SMS to {parent_phone_number}: Invalid response format")
\ No newline at end of file
+        error, _ = client.send(message, [parent_phone_number])
+    finally:
+        client.close()
+    if error:
+        print(f"Failed to send report card SMS to {parent_phone_number}: {error}")
+    else:
+        print(f"Report card SMS sent to {parent_phone_number}")
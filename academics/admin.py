@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Course, Class, Enrollment, Attendance, Grade, GradingScale, GradeComponent, Score
+from .models import Course, Class, Enrollment, Attendance, AttendanceRollup, Grade, GradingScale, GradeComponent, Score
 
 # Register your models here.
 admin.site.site_header = "ESchoolSuite Admin"
@@ -55,4 +55,11 @@ class EnrollmentAdmin(admin.ModelAdmin):
 class AttendanceAdmin(admin.ModelAdmin):
     list_display = ('student', 'class_session', 'date', 'status', 'remark')
     list_filter = ('status', 'date')
-    search_fields = ('student__first_name', 'student__last_name', 'class_session__name', 'remark')
\ No newline at end of file
+    search_fields = ('student__first_name', 'student__last_name', 'class_session__name', 'remark')
+
+@admin.register(AttendanceRollup)
+class AttendanceRollupAdmin(admin.ModelAdmin):
+    list_display = ('student', 'class_session', 'month', 'status', 'count')
+    list_filter = ('status', 'month', 'class_session')
+    search_fields = ('student__first_name', 'student__last_name', 'class_session__name')
+    readonly_fields = ('student', 'class_session', 'month', 'status', 'count')
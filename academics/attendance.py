@@ -0,0 +1,158 @@
+from collections import Counter
+from datetime import datetime
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from rest_framework.exceptions import ValidationError
+from dashboard.snapshot import bump_dashboard_counters
+from .models import Attendance, AttendanceRollup
+
+
+def rollup_key(attendance):
+    """Returns the (student, class, month, status) rollup key of an attendance record."""
+    return (attendance.student_id, attendance.class_session_id, attendance.date.replace(day=1), attendance.status)
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Applies {(student_id, class_id, month, status): delta} to the rollup table.
+
+    Existing rows are incremented with F() expressions in one bulk_update; missing rows are
+    created in one bulk_create, falling back to row-by-row upserts if a concurrent writer
+    created one of them first.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        bump_dashboard_counters(
+            attendance_total=sum(deltas.values()),
+            attendance_present=sum(delta for key, delta in deltas.items() if key[3] == Attendance.AttendanceStatus.PRESENT),
+        )
+        existing = {
+            (rollup.student_id, rollup.class_session_id, rollup.month, rollup.status): rollup
+            for rollup in AttendanceRollup.objects.filter(
+                student_id__in={key[0] for key in deltas},
+                class_session_id__in={key[1] for key in deltas},
+                month__in={key[2] for key in deltas},
+            )
+        }
+        to_update = []
+        to_create = []
+        for key, delta in deltas.items():
+            rollup = existing.get(key)
+            if rollup is not None:
+                rollup.count = F('count') + delta
+                to_update.append(rollup)
+            elif delta > 0:
+                student_id, class_id, month, status = key
+                to_create.append(AttendanceRollup(
+                    student_id=student_id, class_session_id=class_id, month=month, status=status, count=delta,
+                ))
+        AttendanceRollup.objects.bulk_update(to_update, ['count'], batch_size=500)
+
+        try:
+            with transaction.atomic():
+                AttendanceRollup.objects.bulk_create(to_create, batch_size=500)
+        except IntegrityError:
+            for rollup in to_create:
+                updated = AttendanceRollup.objects.filter(
+                    student_id=rollup.student_id, class_session_id=rollup.class_session_id,
+                    month=rollup.month, status=rollup.status,
+                ).update(count=F('count') + rollup.count)
+                if not updated:
+                    rollup.save()
+
+
+def record_attendance(attendances):
+    """Adds newly created attendance records (e.g. from a bulk insert) to the rollups."""
+    apply_rollup_deltas(Counter(rollup_key(attendance) for attendance in attendances))
+
+
+def rebuild_attendance_rollups():
+    """Recomputes the whole rollup table from the attendance records and returns the number of rows."""
+    rows = (
+        Attendance.objects.annotate(month=TruncMonth('date'))
+        .values('student_id', 'class_session_id', 'month', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        AttendanceRollup.objects.all().delete()
+        rollups = AttendanceRollup.objects.bulk_create(
+            (
+                AttendanceRollup(
+                    student_id=row['student_id'],
+                    class_session_id=row['class_session_id'],
+                    month=row['month'],
+                    status=row['status'],
+                    count=row['total'],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+    return len(rollups)
+
+
+def summarize_counts(counts):
+    """Builds totals and the attendance rate (share of PRESENT records) from {status: count}."""
+    total = sum(counts.values())
+    present = counts.get(Attendance.AttendanceStatus.PRESENT, 0)
+    return {
+        'counts': counts,
+        'total': total,
+        'attendance_rate': (present / total) * 100 if total else 0,
+    }
+
+
+def attendance_rate(rollups=None):
+    """Returns the percentage of PRESENT records across the given rollups (all by default)."""
+    rollups = AttendanceRollup.objects.all() if rollups is None else rollups
+    totals = rollups.aggregate(
+        total=Sum('count'),
+        present=Sum('count', filter=Q(status=Attendance.AttendanceStatus.PRESENT)),
+    )
+    if not totals['total']:
+        return 0  # Avoid division by zero
+    return (totals['present'] or 0) / totals['total'] * 100
+
+
+def attendance_summary_by_class(rollups):
+    """
+    Returns per-class attendance totals and rates for the given rollups, in O(classes) rows.
+    """
+    summary = {}
+    for row in rollups.values('class_session_id', 'class_session__name', 'status').annotate(total=Sum('count')).order_by():
+        entry = summary.setdefault(row['class_session_id'], {
+            'class_session': row['class_session_id'],
+            'class_name': row['class_session__name'],
+            'counts': {},
+        })
+        entry['counts'][row['status']] = row['total']
+    return [dict(entry, **summarize_counts(entry['counts'])) for entry in summary.values()]
+
+
+def attendance_summary(rollups):
+    """Returns overall totals and the attendance rate for the given rollups, plus the per-class breakdown."""
+    classes = attendance_summary_by_class(rollups)
+    counts = Counter()
+    for entry in classes:
+        counts.update(entry['counts'])
+    return dict(summarize_counts(dict(counts)), classes=classes)
+
+
+def filter_rollups(rollups, params):
+    """Applies the student, class_session and month (YYYY-MM) query parameters to a rollup queryset."""
+    if params.get('student'):
+        rollups = rollups.filter(student_id=params['student'])
+    if params.get('class_session'):
+        rollups = rollups.filter(class_session_id=params['class_session'])
+    if params.get('month'):
+        try:
+            month = datetime.strptime(params['month'], '%Y-%m').date()
+        except ValueError:
+            raise ValidationError({"month": "Use the YYYY-MM format."})
+        rollups = rollups.filter(month=month)
+    return rollups
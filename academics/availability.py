@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .models import Class
+
+
+AVAILABILITY_CACHE_KEY = 'academics:course-availability'
+CLASS_SEATS_KEY = 'academics:class-seats:{}'
+
+
+def availability_cache_timeout():
+    return getattr(settings, 'COURSE_AVAILABILITY_CACHE_TIMEOUT', 60 * 60)
+
+
+def build_availability_index():
+    """
+    Builds {course_id: {'level': ..., 'classes': [(class_id, academic_year), ...]}}, the
+    classes teaching each course. Open seats are cached per class (see get_open_seats), so
+    enrollments never rebuild the index.
+    """
+    index = {}
+    rows = Class.objects.filter(courses__isnull=False).values_list('id', 'academic_year', 'courses__id', 'courses__level')
+    for class_id, academic_year, course_id, level in rows:
+        entry = index.setdefault(course_id, {'level': level, 'classes': []})
+        entry['classes'].append((class_id, academic_year))
+    return index
+
+
+def get_availability_index():
+    """Returns the availability index from the cache, rebuilding it on a miss."""
+    index = cache.get(AVAILABILITY_CACHE_KEY)
+    if index is None:
+        index = build_availability_index()
+        cache.set(AVAILABILITY_CACHE_KEY, index, timeout=availability_cache_timeout())
+    return index
+
+
+def invalidate_availability_index():
+    """Drops the cached index once the current transaction commits; for changes to classes, courses or their links."""
+    transaction.on_commit(lambda: cache.delete(AVAILABILITY_CACHE_KEY))
+
+
+def read_open_seats(class_ids):
+    """Reads {class_id: open seats} from the classes' seat counters and caches it."""
+    seats = {
+        class_id: max(open_seats, 0)
+        for class_id, open_seats in Class.objects.filter(pk__in=class_ids).values_list('id', F('max_students') - F('enrolled_count'))
+    }
+    cache.set_many({CLASS_SEATS_KEY.format(class_id): open_seats for class_id, open_seats in seats.items()}, timeout=availability_cache_timeout())
+    return seats
+
+
+def get_open_seats(class_ids):
+    """Returns {class_id: open seats} from the cache, reading the missing classes in one query."""
+    keys = {class_id: CLASS_SEATS_KEY.format(class_id) for class_id in class_ids}
+    cached = cache.get_many(list(keys.values()))
+    seats = {class_id: cached[key] for class_id, key in keys.items() if key in cached}
+    missing = [class_id for class_id in keys if class_id not in seats]
+    if missing:
+        seats.update(read_open_seats(missing))
+    return seats
+
+
+def refresh_class_seats(*class_ids):
+    """
+    Re-reads the open seats of the given classes into the cache once the current
+    transaction commits. Only these classes' entries change; the index is kept.
+    """
+    class_ids = [class_id for class_id in class_ids if class_id]
+    if class_ids:
+        transaction.on_commit(lambda: read_open_seats(class_ids))
+
+
+def available_course_ids(level=None, academic_year=None):
+    """Returns the ids of courses with open seats in at least one class, optionally filtered."""
+    candidates = {}
+    for course_id, entry in get_availability_index().items():
+        if level and entry['level'] != level:
+            continue
+        candidates[course_id] = [class_id for class_id, year in entry['classes'] if not academic_year or year == academic_year]
+    seats = get_open_seats({class_id for class_ids in candidates.values() for class_id in class_ids})
+    return [course_id for course_id, class_ids in candidates.items() if any(seats.get(class_id, 0) > 0 for class_id in class_ids)]
@@ -0,0 +1,118 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from rest_framework.exceptions import ValidationError
+from students.models import Student
+from dashboard.snapshot import bump_dashboard_counters
+from reports.report_cache import bump_model_version
+from .availability import refresh_class_seats
+from .models import Class, Enrollment
+from .scope import invalidate_user_scopes, scope_user_ids
+
+
+def reserve_seats(class_id, wanted):
+    """
+    Atomically takes up to `wanted` seats in the class and returns how many were granted.
+
+    The counter is only bumped by a conditional UPDATE that re-checks capacity in the
+    database, so concurrent requests can never push a class past max_students.
+    """
+    for _ in range(5):
+        free = Class.objects.filter(pk=class_id).values_list(F('max_students') - F('enrolled_count'), flat=True).first()
+        granted = min(wanted, max(free or 0, 0))
+        if granted == 0:
+            return 0
+        if Class.objects.filter(pk=class_id, enrolled_count__lte=F('max_students') - granted).update(
+            enrolled_count=F('enrolled_count') + granted
+        ):
+            refresh_class_seats(class_id)
+            return granted
+    return 0
+
+
+def reserve_seat(class_id):
+    """Atomically takes one seat in the class; returns False if the class is full."""
+    reserved = Class.objects.filter(pk=class_id, enrolled_count__lt=F('max_students')).update(
+        enrolled_count=F('enrolled_count') + 1
+    ) == 1
+    if reserved:
+        refresh_class_seats(class_id)
+    return reserved
+
+
+def release_seats(class_id, count=1):
+    """Gives back seats after enrollments are removed from the class."""
+    Class.objects.filter(pk=class_id, enrolled_count__gte=count).update(enrolled_count=F('enrolled_count') - count)
+    refresh_class_seats(class_id)
+
+
+def enroll_student(student, course, class_enrolled=None):
+    """
+    Creates an enrollment, taking a seat in the class first.
+
+    The seat and the enrollment are written in one transaction, so a failed insert
+    (e.g. a duplicate enrollment) gives the seat back.
+    """
+    try:
+        with transaction.atomic():
+            if class_enrolled and not reserve_seat(class_enrolled.pk):
+                raise ValidationError({"detail": "This class is already full."})
+            enrollment = Enrollment(student=student, course=course, class_enrolled=class_enrolled)
+            enrollment._seat_reserved = True
+            enrollment.save()
+    except IntegrityError:
+        # The (student, course) unique constraint; the serializer can't check it as student is read-only
+        raise ValidationError({"detail": "This student is already enrolled in this course."})
+    return enrollment
+
+
+def bulk_enroll(student_ids, course, class_enrolled):
+    """
+    Enrolls many students in a course and class at once and returns the result per student.
+
+    Students are enrolled in the given order until the class is full.
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    results = {}
+    with transaction.atomic():
+        already_enrolled = set(
+            Enrollment.objects.filter(course=course, student_id__in=student_ids).values_list('student_id', flat=True)
+        )
+        existing_students = set(Student.objects.filter(pk__in=student_ids).values_list('id', flat=True))
+
+        candidates = []
+        for student_id in student_ids:
+            if student_id not in existing_students:
+                results[student_id] = 'not_found'
+            elif student_id in already_enrolled:
+                results[student_id] = 'already_enrolled'
+            else:
+                candidates.append(student_id)
+
+        granted = reserve_seats(class_enrolled.pk, len(candidates)) if candidates else 0
+        # bulk_create skips the save signals, so the seats reserved above are not counted twice
+        Enrollment.objects.bulk_create(
+            [Enrollment(student_id=student_id, course=course, class_enrolled=class_enrolled) for student_id in candidates[:granted]],
+            batch_size=500,
+        )
+        for student_id in candidates[:granted]:
+            results[student_id] = 'enrolled'
+        for student_id in candidates[granted:]:
+            results[student_id] = 'class_full'
+        if granted:
+            invalidate_user_scopes(scope_user_ids(student_ids=candidates[:granted], class_ids=[class_enrolled.pk]))
+            # bulk_create skips the save signals that keep the dashboard counters and cached reports current
+            bump_dashboard_counters(enrollments=granted)
+            bump_model_version('enrollments')
+
+    return [{"student": student_id, "result": results[student_id]} for student_id in student_ids]
+
+
+def sync_seat_counts():
+    """Resets every class's enrolled_count from the enrollment table and returns the number of classes fixed."""
+    fixed = []
+    for class_id, counted, total in Class.objects.annotate(total=Count('enrollments')).values_list('id', 'enrolled_count', 'total'):
+        if counted != total:
+            Class.objects.filter(pk=class_id).update(enrolled_count=total)
+            fixed.append(class_id)
+    refresh_class_seats(*fixed)
+    return len(fixed)
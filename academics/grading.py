@@ -0,0 +1,276 @@
+import re
+from bisect import bisect_right
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+from django.db.models import Sum, F, Q, ExpressionWrapper, DecimalField
+from reports.report_cache import bump_model_version
+from .models import Course, Enrollment, Grade, GradeComponent, Score
+
+
+CA_COMPONENT_TYPES = [
+    GradeComponent.ComponentType.QUIZ,
+    GradeComponent.ComponentType.ASSIGNMENT,
+    GradeComponent.ComponentType.MIDSEM,
+]
+
+TWO_PLACES = Decimal('0.01')
+
+NUMBER = r'(\d+(?:\.\d+)?)'
+RANGE_KEY = re.compile(rf'^\s*{NUMBER}\s*-\s*{NUMBER}\s*$')  # e.g. "70-100": "A"
+RANGE_IN_VALUE = re.compile(rf'\(\s*{NUMBER}\s*-\s*{NUMBER}\s*\)')  # e.g. "A": "Excellent (80-100)"
+BELOW_IN_VALUE = re.compile(rf'\(\s*below\s+{NUMBER}\s*\)', re.IGNORECASE)  # e.g. "F": "Fail (Below 40)"
+
+
+def parse_grade_entry(key, value):
+    """
+    Returns (threshold, letter) for one entry of GradingScale.grades, or None if the entry
+    carries no numeric boundary (e.g. the WASSCE "A1": "Excellent" entries).
+    """
+    try:
+        return float(key), value
+    except (TypeError, ValueError):
+        pass
+
+    match = RANGE_KEY.match(key)
+    if match:
+        return float(match.group(1)), value
+
+    if isinstance(value, str):
+        match = RANGE_IN_VALUE.search(value)
+        if match:
+            return float(match.group(1)), key
+        if BELOW_IN_VALUE.search(value):
+            return 0.0, key
+
+    return None
+
+
+class CompiledGradingScale:
+    """
+    A grading scale compiled into a sorted table of numeric thresholds.
+
+    A grade gets the letter of the first entry, in the scale's own order, whose threshold
+    it reaches, as Grade.save always did. Sorting the thresholds and keeping, for each
+    one, the earliest entry at or below it lets letter_for() find that entry by bisection,
+    with no per-call parsing of the JSON grades, whatever order the scale is stored in.
+    """
+
+    def __init__(self, grades):
+        entries = [entry for entry in (parse_grade_entry(key, value) for key, value in grades.items()) if entry is not None]
+        order = sorted(range(len(entries)), key=lambda index: entries[index][0])
+        self.thresholds = [entries[index][0] for index in order]
+        self.letters = []
+        first = None
+        for index in order:
+            if first is None or index < first:
+                first = index
+            self.letters.append(entries[first][1])
+
+    def letter_for(self, final_grade):
+        index = bisect_right(self.thresholds, float(final_grade))
+        return self.letters[index - 1] if index else None
+
+
+# Process-level cache of compiled scales, keyed by (scale id, version)
+_compiled_scales = {}
+
+
+def get_compiled_scale(grading_scale):
+    """Returns the compiled lookup table for the grading scale, compiling it at most once per version."""
+    if grading_scale.pk is None:
+        return CompiledGradingScale(grading_scale.grades)
+
+    key = (grading_scale.pk, grading_scale.version)
+    compiled = _compiled_scales.get(key)
+    if compiled is None:
+        compiled = CompiledGradingScale(grading_scale.grades)
+        invalidate_compiled_scale(grading_scale.pk)
+        _compiled_scales[key] = compiled
+    return compiled
+
+
+def invalidate_compiled_scale(scale_id):
+    """Drops every cached version of the grading scale's lookup table."""
+    for key in [key for key in list(_compiled_scales) if key[0] == scale_id]:
+        _compiled_scales.pop(key, None)
+
+
+def get_component_weights(course_ids):
+    """
+    Returns {course_id: (ca_weight, exam_weight)} for the given courses in a single grouped query.
+    """
+    rows = GradeComponent.objects.filter(course_id__in=course_ids).values('course_id').annotate(
+        ca_weight=Sum('weight', filter=Q(component_type__in=CA_COMPONENT_TYPES)),
+        exam_weight=Sum('weight', filter=Q(component_type=GradeComponent.ComponentType.EXAM)),
+    )
+    return {row['course_id']: (row['ca_weight'] or 0, row['exam_weight'] or 0) for row in rows}
+
+
+def recompute_grades(course_ids, student_ids=None, create_missing=True):
+    """
+    Recomputes final and letter grades for every student in the given courses.
+
+    This is the set-based version of Grade.calculate_final_grade: the component weights,
+    CA totals and exam scores for all students are fetched with grouped queries and the
+    results are written back with bulk_update / bulk_create instead of one save per student.
+
+    Args:
+        course_ids: The ids of the courses to recompute.
+        student_ids: Optionally restrict the recompute to these students.
+        create_missing: Create Grade rows for students that have scores but no grade yet.
+
+    Returns:
+        A dict with the number of grades updated and created, and the courses that were
+        skipped because their component weights do not add up to 100.
+    """
+    courses = Course.objects.select_related('grading_scale').in_bulk(list(course_ids))
+    weights = get_component_weights(courses.keys())
+
+    skipped = {}
+    valid_course_ids = []
+    for course_id, course in courses.items():
+        ca_weight, exam_weight = weights.get(course_id, (0, 0))
+        if ca_weight + exam_weight != 100:
+            skipped[course_id] = (
+                f"The total weights of CA components and Exam component for course '{course}' must add up to 100%. "
+                f"Currently CA: {ca_weight}%, Exam: {exam_weight}%."
+            )
+        else:
+            valid_course_ids.append(course_id)
+
+    if not valid_course_ids:
+        return {'updated': 0, 'created': 0, 'skipped': skipped}
+
+    scores = Score.objects.filter(component__course_id__in=valid_course_ids)
+    grades = Grade.objects.filter(course_id__in=valid_course_ids)
+    if student_ids is not None:
+        scores = scores.filter(student_id__in=student_ids)
+        grades = grades.filter(student_id__in=student_ids)
+
+    # Weighted CA totals per (student, course)
+    ca_totals = {
+        (row['student_id'], row['component__course_id']): row['total_ca'] or 0
+        for row in scores.filter(component__component_type__in=CA_COMPONENT_TYPES)
+        .values('student_id', 'component__course_id')
+        .annotate(total_ca=Sum(ExpressionWrapper(F('score') * F('component__weight') / 100, output_field=DecimalField())))
+    }
+
+    # The first exam score per (student, course), matching calculate_final_grade
+    exam_scores = {}
+    for student_id, course_id, score in scores.filter(
+        component__component_type=GradeComponent.ComponentType.EXAM
+    ).order_by('pk').values_list('student_id', 'component__course_id', 'score'):
+        exam_scores.setdefault((student_id, course_id), score)
+
+    existing = {(grade.student_id, grade.course_id): grade for grade in grades}
+    keys = set(existing) | (set(ca_totals) | set(exam_scores) if create_missing else set())
+
+    to_update = []
+    to_create = []
+    for student_id, course_id in keys:
+        course = courses[course_id]
+        ca_weight, exam_weight = weights[course_id]
+        total_ca = Decimal(ca_totals.get((student_id, course_id), 0))
+        exam_score = Decimal(exam_scores.get((student_id, course_id), 0))
+        final_grade = ((total_ca * ca_weight / 100) + (exam_score * exam_weight / 100)).quantize(TWO_PLACES)
+
+        grade = existing.get((student_id, course_id))
+        if grade is None:
+            grade = Grade(student_id=student_id, course_id=course_id)
+            to_create.append(grade)
+        else:
+            to_update.append(grade)
+        grade.final_grade = final_grade
+        grade.grading_scale = course.grading_scale
+        letter = course.grading_scale.get_letter_grade(final_grade) if course.grading_scale else None
+        if letter is not None:
+            grade.letter_grade = letter
+
+    with transaction.atomic():
+        Grade.objects.bulk_update(to_update, ['final_grade', 'grading_scale', 'letter_grade'], batch_size=500)
+        Grade.objects.bulk_create(to_create, batch_size=500)
+        # bulk writes skip the save signals that retire cached reports
+        if to_update or to_create:
+            bump_model_version('grades')
+
+    return {'updated': len(to_update), 'created': len(to_create), 'skipped': skipped}
+
+
+def recompute_course_grades(course, create_missing=True):
+    """Recomputes the grades of every student taking the course."""
+    return recompute_grades([course.pk], create_missing=create_missing)
+
+
+def recompute_class_grades(class_obj, create_missing=True):
+    """Recomputes the grades of every student enrolled in the class, for each of its courses."""
+    course_ids = list(class_obj.courses.values_list('id', flat=True))
+    student_ids = list(Enrollment.objects.filter(class_enrolled=class_obj).values_list('student_id', flat=True).distinct())
+    return recompute_grades(course_ids, student_ids=student_ids, create_missing=create_missing)
+
+
+RECOMPUTE_QUEUE_KEY = 'grades:recompute:pending'
+RECOMPUTE_SCHEDULED_KEY = 'grades:recompute:scheduled'
+
+
+def enqueue_grade_recompute(student_id, course_id):
+    """
+    Queues a (student, course) grade recompute once the current transaction commits.
+
+    Pending keys live in a Redis set, so repeated edits of the same student and course
+    coalesce into one recompute, and a single debounced Celery run drains the queue.
+    """
+    def enqueue():
+        get_redis_connection('default').sadd(RECOMPUTE_QUEUE_KEY, f"{student_id}:{course_id}")
+        schedule_recompute_run()
+
+    transaction.on_commit(enqueue)
+
+
+def schedule_recompute_run():
+    """Schedules a debounced run of the recompute queue unless one is already scheduled."""
+    debounce = getattr(settings, 'GRADE_RECOMPUTE_DEBOUNCE_SECONDS', 5)
+    # Only the first change in a burst schedules a run; the flag expires in case a worker dies
+    if cache.add(RECOMPUTE_SCHEDULED_KEY, True, timeout=debounce + 300):
+        from ESchoolSuite.tasks import process_grade_recompute_queue
+        process_grade_recompute_queue.apply_async(countdown=debounce)
+
+
+def pending_grade_recomputes():
+    """Returns the number of (student, course) recomputes waiting in the queue."""
+    return get_redis_connection('default').scard(RECOMPUTE_QUEUE_KEY)
+
+
+def drain_recompute_queue(batch_size=None):
+    """
+    Recomputes every queued (student, course) pair in batches and returns how many were processed.
+    """
+    batch_size = batch_size or getattr(settings, 'GRADE_RECOMPUTE_BATCH_SIZE', 500)
+    redis = get_redis_connection('default')
+    # Clear the flag first so changes queued while draining schedule another run
+    cache.delete(RECOMPUTE_SCHEDULED_KEY)
+
+    processed = 0
+    while True:
+        members = redis.spop(RECOMPUTE_QUEUE_KEY, batch_size)
+        if not members:
+            break
+
+        students_by_course = {}
+        for member in members:
+            student_id, course_id = (int(part) for part in member.decode().split(':'))
+            students_by_course.setdefault(course_id, set()).add(student_id)
+
+        try:
+            for course_id, student_ids in students_by_course.items():
+                recompute_grades([course_id], student_ids=student_ids, create_missing=False)
+        except Exception:
+            # Put the batch back and schedule the run that retries it
+            redis.sadd(RECOMPUTE_QUEUE_KEY, *members)
+            schedule_recompute_run()
+            raise
+        processed += len(members)
+
+    return processed
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from academics.attendance import rebuild_attendance_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the attendance rollup table from the attendance records'
+
+    def handle(self, *args, **options):
+        count = rebuild_attendance_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {count} attendance rollup row(s)'))
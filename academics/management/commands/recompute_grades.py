@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from academics.grading import recompute_class_grades, recompute_grades
+from academics.models import Class, Course
+
+
+class Command(BaseCommand):
+    help = 'Recomputes final and letter grades for whole courses or classes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', action='append', default=[], help='Course code to recompute (can be repeated)')
+        parser.add_argument('--class', action='append', default=[], type=int, dest='classes', help='Class id to recompute (can be repeated)')
+        parser.add_argument('--all', action='store_true', help='Recompute every course')
+
+    def handle(self, *args, **options):
+        if not (options['course'] or options['classes'] or options['all']):
+            raise CommandError('Specify --course, --class or --all.')
+
+        if options['all']:
+            self.report('all courses', recompute_grades(Course.objects.values_list('id', flat=True)))
+        elif options['course']:
+            courses = dict(Course.objects.filter(code__in=options['course']).values_list('code', 'id'))
+            missing = set(options['course']) - set(courses)
+            if missing:
+                raise CommandError(f"Unknown course code(s): {', '.join(sorted(missing))}")
+            self.report(', '.join(courses), recompute_grades(courses.values()))
+
+        for class_id in options['classes']:
+            try:
+                class_obj = Class.objects.get(pk=class_id)
+            except Class.DoesNotExist:
+                raise CommandError(f"Class with ID {class_id} does not exist.")
+            self.report(class_obj.name, recompute_class_grades(class_obj))
+
+    def report(self, label, result):
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: {result['updated']} grade(s) updated, {result['created']} created"
+        ))
+        for course_id, reason in result['skipped'].items():
+            self.stdout.write(self.style.WARNING(f"Skipped course {course_id}: {reason}"))
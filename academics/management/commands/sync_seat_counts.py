@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from academics.enrollment import sync_seat_counts
+
+
+class Command(BaseCommand):
+    help = "Resets every class's enrolled seat counter from the enrollment table"
+
+    def handle(self, *args, **options):
+        fixed = sync_seat_counts()
+        self.stdout.write(self.style.SUCCESS(f'Successfully synced seat counts ({fixed} class(es) corrected)'))
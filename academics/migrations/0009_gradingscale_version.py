@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0008_assignment_lessonplan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gradingscale',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
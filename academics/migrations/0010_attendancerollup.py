@@ -0,0 +1,56 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def populate_attendance_rollups(apps, schema_editor):
+    Attendance = apps.get_model('academics', 'Attendance')
+    AttendanceRollup = apps.get_model('academics', 'AttendanceRollup')
+    rows = (
+        Attendance.objects.annotate(month=TruncMonth('date'))
+        .values('student_id', 'class_session_id', 'month', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    AttendanceRollup.objects.bulk_create(
+        (
+            AttendanceRollup(
+                student_id=row['student_id'],
+                class_session_id=row['class_session_id'],
+                month=row['month'],
+                status=row['status'],
+                count=row['total'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0009_gradingscale_version'),
+        ('students', '0003_admissionapplication_student_parent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('PRESENT', 'Present'), ('ABSENT', 'Absent'), ('LATE', 'Late'), ('EXCUSED', 'Excused')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('class_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='academics.class')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='students.student')),
+            ],
+            options={
+                'unique_together': {('student', 'class_session', 'month', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_attendance_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_enrolled_count(apps, schema_editor):
+    Class = apps.get_model('academics', 'Class')
+    for class_obj in Class.objects.annotate(total=Count('enrollments')).iterator():
+        Class.objects.filter(pk=class_obj.pk).update(enrolled_count=class_obj.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0010_attendancerollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_enrolled_count, migrations.RunPython.noop),
+    ]
@@ -18,9 +18,24 @@ class GradingScale(models.Model):
     grades = models.JSONField()  # Store grades and their meanings as JSON
     # Add a field to indicate if the scale is currently active or not
     is_active = models.BooleanField(default=True)
+    # Bumped on every edit so compiled lookup tables cached by other processes go stale
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return f"{self.name} ({self.level})"
+
+    def save(self, *args, **kwargs):
+        bump_version = self.pk is not None
+        if bump_version:
+            self.version = F('version') + 1
+        super().save(*args, **kwargs)
+        if bump_version:
+            self.refresh_from_db(fields=['version'])
+
+    def get_letter_grade(self, final_grade):
+        from .grading import get_compiled_scale
+
+        return get_compiled_scale(self).letter_for(final_grade)
     
 
 
@@ -43,6 +58,8 @@ class Class(models.Model):
     class_teacher = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, limit_choices_to={'role': User.Role.TEACHER}, related_name='classes_taught')
     courses = models.ManyToManyField(Course, related_name='classes')
     max_students = models.IntegerField(default=30)
+    # Denormalized number of enrollments, maintained by academics.enrollment
+    enrolled_count = models.PositiveIntegerField(default=0, editable=False)
     # add fields for time and room
     start_time = models.TimeField(null=True, blank=True)
     end_time = models.TimeField(null=True, blank=True)
@@ -52,6 +69,15 @@ class Class(models.Model):
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        # enrolled_count only changes through conditional updates, so never write back a stale copy
+        if not self._state.adding and not kwargs.get('update_fields'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'enrolled_count'
+            ]
+        super().save(*args, **kwargs)
     
     
 class Enrollment(models.Model):
@@ -88,6 +114,21 @@ class Attendance(models.Model):
     def __str__(self):
         return f"{self.student} - {self.class_session} - {self.date} - {self.status}"
     
+
+
+class AttendanceRollup(models.Model):
+    """Attendance counts per student, class, month and status, kept up to date by attendance writes."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_rollups')
+    class_session = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='attendance_rollups')
+    month = models.DateField()  # First day of the month
+    status = models.CharField(max_length=20, choices=Attendance.AttendanceStatus.choices)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('student', 'class_session', 'month', 'status')
+
+    def __str__(self):
+        return f"{self.student} - {self.class_session} - {self.month:%Y-%m} - {self.status}: {self.count}"
    
 class GradeComponent(models.Model):
     class ComponentType(models.TextChoices):
@@ -148,64 +189,27 @@ class Grade(models.Model):
         return f"{self.student} - {self.course} - {self.final_grade} ({self.letter_grade})"
 
     def calculate_final_grade(self):
-        course = self.course
-        student = self.student
-
-        # Calculate the total weight of CA components
-        ca_components_weight = GradeComponent.objects.filter(
-            course=course, 
-            component_type__in=[GradeComponent.ComponentType.QUIZ, GradeComponent.ComponentType.ASSIGNMENT, GradeComponent.ComponentType.MIDSEM]
-        ).aggregate(total_weight=Sum('weight'))['total_weight'] or 0
+        from .grading import recompute_grades
 
-        # Calculate the total weight of the exam component
-        exam_component_weight = GradeComponent.objects.filter(
-            course=course, 
-            component_type=GradeComponent.ComponentType.EXAM
-        ).aggregate(total_weight=Sum('weight'))['total_weight'] or 0
+        course = self.course
+        result = recompute_grades([course.pk], student_ids=[self.student_id])
 
         # Check if the total weights are not equal to 100
-        if ca_components_weight + exam_component_weight != 100:
-            raise Exception(f"The total weights of CA components and Exam component for course '{course}' must add up to 100%. Currently CA: {ca_components_weight}%, Exam: {exam_component_weight}%.")
-        
-        # Calculate CA component
-        ca_scores = Score.objects.filter(
-            student=student,
-            component__course=course,
-            component__component_type__in=[GradeComponent.ComponentType.QUIZ, GradeComponent.ComponentType.ASSIGNMENT, GradeComponent.ComponentType.MIDSEM]
-        ).annotate(
-            weighted_score=ExpressionWrapper(F('score') * F('component__weight') / 100, output_field=DecimalField())
-        )
-        total_ca_score = ca_scores.aggregate(total_ca=Sum('weighted_score'))['total_ca'] or 0
-
-        # Calculate Exam component
-        exam_score_obj = Score.objects.filter(
-            student=student,
-            component__course=course,
-            component__component_type=GradeComponent.ComponentType.EXAM
-        ).first()
-        exam_score = exam_score_obj.score if exam_score_obj else 0
-
-        # Calculate final grade
-        final_grade = (total_ca_score * ca_components_weight / 100) + (exam_score * exam_component_weight / 100)
-
-        # Update or create the Grade instance
-        grade, created = Grade.objects.update_or_create(
-            student=student, 
-            course=course,
-            defaults={
-                'final_grade': final_grade,
-                'grading_scale': course.grading_scale  # Assuming the course has a grading_scale field
-            }
-        )
+        if course.pk in result['skipped']:
+            raise Exception(result['skipped'][course.pk])
 
+        # A student without any scores still gets a 0.00 grade, as update_or_create used to give them
+        grade, _ = Grade.objects.get_or_create(
+            student_id=self.student_id, course=course,
+            defaults={'final_grade': 0, 'grading_scale': course.grading_scale},
+        )
         return grade
     
     def save(self, *args, **kwargs):
         if self.final_grade is not None and self.grading_scale:
-            for grade_value, letter in self.grading_scale.grades.items():
-                if self.final_grade >= float(grade_value):
-                    self.letter_grade = letter
-                    break
+            letter = self.grading_scale.get_letter_grade(self.final_grade)
+            if letter is not None:
+                self.letter_grade = letter
         super().save(*args, **kwargs)
         
         
@@ -0,0 +1,87 @@
+import time
+from collections import namedtuple
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import serializers
+from students.models import Student
+from users.models import Parent, User
+from .models import Class, Enrollment
+
+
+SCOPE_VERSION_KEY = 'academics:scope:version:{}'
+
+# Ids of the courses, classes and students a user may act on
+UserScope = namedtuple('UserScope', ['course_ids', 'class_ids', 'student_ids'])
+
+EMPTY_SCOPE = UserScope(frozenset(), frozenset(), frozenset())
+
+
+def compute_user_scope(user):
+    """
+    Resolves a user's scope from the database.
+
+    Teachers get the classes they are class teacher of, the courses those classes teach and
+    the students enrolled in them. Parents get their children and the children's classes and
+    courses; students get their own enrollments.
+    """
+    if user.role == User.Role.TEACHER:
+        class_ids = set(Class.objects.filter(class_teacher=user).values_list('id', flat=True))
+        course_ids = set(Class.courses.through.objects.filter(class_id__in=class_ids).values_list('course_id', flat=True))
+        student_ids = set(Enrollment.objects.filter(class_enrolled_id__in=class_ids).values_list('student_id', flat=True))
+    elif user.role in (User.Role.PARENT, User.Role.STUDENT):
+        if user.role == User.Role.PARENT:
+            students = Student.objects.filter(parent__user=user)
+        else:
+            students = Student.objects.filter(user=user)
+        student_ids = set(students.values_list('id', flat=True))
+        enrollments = Enrollment.objects.filter(student_id__in=student_ids).values_list('course_id', 'class_enrolled_id')
+        course_ids = {course_id for course_id, _ in enrollments}
+        class_ids = {class_id for _, class_id in enrollments if class_id}
+    else:
+        return EMPTY_SCOPE
+    return UserScope(frozenset(course_ids), frozenset(class_ids), frozenset(student_ids))
+
+
+def get_user_scope(user):
+    """
+    Returns the user's scope, cached under the user's current scope version and memoized on
+    the user object for the rest of the request.
+    """
+    version = cache.get_or_set(SCOPE_VERSION_KEY.format(user.pk), time.time_ns, timeout=None)
+    memoized = getattr(user, '_academic_scope', None)
+    if memoized and memoized[0] == version:
+        return memoized[1]
+
+    key = f'academics:scope:{version}:{user.pk}'
+    scope = cache.get(key)
+    if scope is None:
+        scope = compute_user_scope(user)
+        cache.set(key, scope, timeout=60 * 60)
+    user._academic_scope = (version, scope)
+    return scope
+
+
+def scope_user_ids(student_ids=(), class_ids=(), parent_ids=()):
+    """
+    The users whose scope covers any of the students, classes or parents: the students
+    themselves, their parents and the class teachers.
+    """
+    user_ids = set(Class.objects.filter(pk__in=class_ids).values_list('class_teacher_id', flat=True))
+    for student_user_id, parent_user_id in Student.objects.filter(pk__in=student_ids).values_list('user_id', 'parent__user_id'):
+        user_ids.update((student_user_id, parent_user_id))
+    user_ids.update(Parent.objects.filter(pk__in=parent_ids).values_list('user_id', flat=True))
+    user_ids.discard(None)
+    return user_ids
+
+
+def invalidate_user_scopes(user_ids):
+    """Retires the cached scopes of the given users once the current transaction commits."""
+    keys = [SCOPE_VERSION_KEY.format(user_id) for user_id in set(user_ids) if user_id]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()), timeout=None))
+
+
+def ensure_teaches_course(user, course_id):
+    """Raises a ValidationError unless a class the teacher is class teacher of teaches the course."""
+    if course_id not in get_user_scope(user).course_ids:
+        raise serializers.ValidationError("You are not assigned to teach this course.")
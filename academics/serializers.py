@@ -42,6 +42,17 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         fields = '__all__'
         
 
+class BulkEnrollmentSerializer(serializers.Serializer):
+    course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all())
+    class_enrolled = serializers.PrimaryKeyRelatedField(queryset=Class.objects.all())
+    students = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate(self, data):
+        if not data['class_enrolled'].courses.filter(pk=data['course'].pk).exists():
+            raise serializers.ValidationError("This class does not teach the selected course.")
+        return data
+        
+
 class AttendanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attendance
@@ -49,6 +60,15 @@ class AttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ['student', 'class_session', 'date']
         
         
+class AttendanceRollCallRecordSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Attendance.AttendanceStatus.choices, default=Attendance.AttendanceStatus.PRESENT)
+    remark = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+class AttendanceRollCallSerializer(serializers.Serializer):
+    class_session = serializers.PrimaryKeyRelatedField(queryset=Class.objects.all())
+    date = serializers.DateField()
+    records = AttendanceRollCallRecordSerializer(many=True, allow_empty=False)
 
 
 class GradeComponentSerializer(serializers.ModelSerializer):
@@ -61,6 +81,12 @@ class ScoreSerializer(serializers.ModelSerializer):
         model = Score
         fields = '__all__'
 
+class ScoreBulkRowSerializer(serializers.Serializer):
+    # Plain ids so a whole column can be validated without one lookup per row
+    student = serializers.IntegerField()
+    component = serializers.IntegerField()
+    score = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100)
+
 class GradeSerializer(serializers.ModelSerializer):
     grading_scale = serializers.PrimaryKeyRelatedField(queryset=GradingScale.objects.all())
 
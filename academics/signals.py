@@ -0,0 +1,140 @@
+from collections import Counter
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.db.models import F
+from .attendance import apply_rollup_deltas, rollup_key
+from .availability import invalidate_availability_index, refresh_class_seats
+from .enrollment import release_seats
+from students.models import Student
+from .models import Attendance, Class, Course, Enrollment
+from .scope import invalidate_user_scopes, scope_user_ids
+from .timetable import invalidate_timetable_index
+
+
+@receiver(pre_save, sender=Attendance)
+def remember_attendance_rollup_key(sender, instance, **kwargs):
+    # Keep the key the record was counted under so an edit can move its count
+    instance._previous_rollup_key = None
+    if instance.pk:
+        previous = Attendance.objects.filter(pk=instance.pk).first()
+        if previous:
+            instance._previous_rollup_key = rollup_key(previous)
+
+
+@receiver(post_save, sender=Attendance)
+def update_attendance_rollup(sender, instance, created, **kwargs):
+    deltas = Counter({rollup_key(instance): 1})
+    previous_key = getattr(instance, '_previous_rollup_key', None)
+    if not created and previous_key:
+        deltas[previous_key] -= 1
+    apply_rollup_deltas(deltas)
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_attendance_from_rollup(sender, instance, **kwargs):
+    apply_rollup_deltas({rollup_key(instance): -1})
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_enrollment_class(sender, instance, **kwargs):
+    instance._previous_class_id = instance._previous_student_id = None
+    if instance.pk:
+        previous = Enrollment.objects.filter(pk=instance.pk).values_list('class_enrolled_id', 'student_id').first()
+        if previous:
+            instance._previous_class_id, instance._previous_student_id = previous
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment_seat(sender, instance, created, **kwargs):
+    # Enrollments made through academics.enrollment have already taken their seat
+    if created and getattr(instance, '_seat_reserved', False):
+        return
+    previous_class_id = None if created else getattr(instance, '_previous_class_id', None)
+    if previous_class_id == instance.class_enrolled_id:
+        return
+    if previous_class_id:
+        release_seats(previous_class_id)
+    if instance.class_enrolled_id:
+        Class.objects.filter(pk=instance.class_enrolled_id).update(enrolled_count=F('enrolled_count') + 1)
+        refresh_class_seats(instance.class_enrolled_id)
+
+
+@receiver(post_delete, sender=Enrollment)
+def release_enrollment_seat(sender, instance, **kwargs):
+    if instance.class_enrolled_id:
+        release_seats(instance.class_enrolled_id)
+
+
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Class)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(m2m_changed, sender=Class.courses.through)
+def refresh_course_availability(sender, **kwargs):
+    # The academic year, level or the courses a class teaches may have changed
+    invalidate_availability_index()
+
+
+@receiver(post_save, sender=Class)
+def refresh_class_capacity(sender, instance, **kwargs):
+    # max_students may have changed
+    refresh_class_seats(instance.pk)
+
+
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Class)
+def refresh_timetable(sender, **kwargs):
+    invalidate_timetable_index()
+
+
+@receiver(pre_save, sender=Class)
+def remember_class_teacher(sender, instance, **kwargs):
+    instance._previous_class_teacher_id = None
+    if instance.pk:
+        instance._previous_class_teacher_id = Class.objects.filter(pk=instance.pk).values_list('class_teacher_id', flat=True).first()
+
+
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Class)
+def refresh_class_teacher_scopes(sender, instance, **kwargs):
+    # A teacher's scope follows the classes they are class teacher of
+    invalidate_user_scopes([instance.class_teacher_id, getattr(instance, '_previous_class_teacher_id', None)])
+
+
+@receiver(m2m_changed, sender=Class.courses.through)
+def refresh_class_course_scopes(sender, instance, action, reverse, pk_set, **kwargs):
+    # The courses of a class are only in its class teacher's scope
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        class_ids = [instance.pk]
+    elif pk_set is None:
+        class_ids = list(instance.classes.values_list('id', flat=True))
+    else:
+        class_ids = pk_set
+    invalidate_user_scopes(scope_user_ids(class_ids=class_ids))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def refresh_enrollment_scopes(sender, instance, **kwargs):
+    # The student, their parent and the class teachers before and after the change
+    invalidate_user_scopes(scope_user_ids(
+        student_ids=[instance.student_id, getattr(instance, '_previous_student_id', None)],
+        class_ids=[instance.class_enrolled_id, getattr(instance, '_previous_class_id', None)],
+    ))
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_parent(sender, instance, **kwargs):
+    instance._previous_parent_id = None
+    if instance.pk:
+        instance._previous_parent_id = Student.objects.filter(pk=instance.pk).values_list('parent_id', flat=True).first()
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def refresh_student_scopes(sender, instance, **kwargs):
+    # The student's own scope and those of their parent before and after the change
+    user_ids = scope_user_ids(parent_ids=[instance.parent_id, getattr(instance, '_previous_parent_id', None)])
+    invalidate_user_scopes(user_ids | {instance.user_id})
@@ -1,3 +1,487 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from students.models import Student
+from users.models import Parent, User
+from .attendance import rebuild_attendance_rollups
+from .availability import AVAILABILITY_CACHE_KEY, available_course_ids
+from .enrollment import bulk_enroll, enroll_student, reserve_seats, sync_seat_counts
+from .grading import CA_COMPONENT_TYPES, parse_grade_entry, recompute_grades
+from .models import Attendance, AttendanceRollup, Class, Course, Enrollment, Grade, GradeComponent, GradingScale, Score
+from .populate_grading_data import Command as PopulateGradingData
+from .scope import EMPTY_SCOPE, SCOPE_VERSION_KEY, get_user_scope
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_student(number, parent=None):
+    user = User.objects.create_user(username=f'student{number}', password='password', role=User.Role.STUDENT)
+    return Student.objects.create(
+        user=user, student_id=f'S{number:04d}', first_name='Student', last_name=str(number),
+        date_of_birth=date(2010, 1, 1), gender='Female', address='1 School Road', city='Accra',
+        region='Greater Accra', email=f'student{number}@example.com', admission_number=f'A{number:04d}',
+        admission_date=date(2024, 9, 1), emergency_contact_name='Guardian',
+        emergency_contact_phone='+233200000000', emergency_contact_relationship='Parent', parent=parent,
+    )
+
+
+def make_course(code, grading_scale=None, weights=((GradeComponent.ComponentType.QUIZ, 20), (GradeComponent.ComponentType.MIDSEM, 30), (GradeComponent.ComponentType.EXAM, 50))):
+    course = Course.objects.create(name=f'Course {code}', code=code, grading_scale=grading_scale)
+    for index, (component_type, weight) in enumerate(weights):
+        GradeComponent.objects.create(name=f'{component_type} {index}', course=course, component_type=component_type, weight=weight)
+    return course
+
+
+def baseline_final_grade(student, course):
+    """The per-row formula Grade.calculate_final_grade used before the set-based recompute."""
+    ca_weight = GradeComponent.objects.filter(course=course, component_type__in=CA_COMPONENT_TYPES).aggregate(total=Sum('weight'))['total'] or 0
+    exam_weight = GradeComponent.objects.filter(course=course, component_type=GradeComponent.ComponentType.EXAM).aggregate(total=Sum('weight'))['total'] or 0
+    total_ca = Score.objects.filter(
+        student=student, component__course=course, component__component_type__in=CA_COMPONENT_TYPES,
+    ).annotate(
+        weighted_score=ExpressionWrapper(F('score') * F('component__weight') / 100, output_field=DecimalField())
+    ).aggregate(total=Sum('weighted_score'))['total'] or 0
+    exam = Score.objects.filter(student=student, component__course=course, component__component_type=GradeComponent.ComponentType.EXAM).first()
+    exam_score = exam.score if exam else 0
+    return ((total_ca * ca_weight / 100) + (exam_score * exam_weight / 100)).quantize(Decimal('0.01'))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RecomputeGradesTests(TestCase):
+    def setUp(self):
+        self.scale = GradingScale.objects.create(name='Percent', level=GradingScale.Level.SHS, grades={'80': 'A', '60': 'B', '0': 'F'})
+        self.course = make_course('MATH1', self.scale)
+        self.components = {component.component_type: component for component in self.course.grade_components.all()}
+        self.students = [make_student(number) for number in range(3)]
+        scores = [
+            {'QUIZ': '90', 'MIDSEM': '75.5', 'EXAM': '88'},
+            {'QUIZ': '40', 'MIDSEM': '62.25'},  # No exam yet
+            {'EXAM': '55'},
+        ]
+        for student, student_scores in zip(self.students, scores):
+            for component_type, score in student_scores.items():
+                Score.objects.create(student=student, component=self.components[component_type], score=Decimal(score))
+
+    def test_matches_the_per_row_formula(self):
+        result = recompute_grades([self.course.pk])
+
+        self.assertEqual(result, {'updated': 0, 'created': 3, 'skipped': {}})
+        for student in self.students:
+            grade = Grade.objects.get(student=student, course=self.course)
+            self.assertEqual(grade.final_grade, baseline_final_grade(student, self.course))
+            self.assertEqual(grade.letter_grade, self.scale.get_letter_grade(grade.final_grade))
+
+    def test_updates_existing_grades_of_the_given_students_only(self):
+        recompute_grades([self.course.pk])
+        Score.objects.filter(student=self.students[0], component=self.components['EXAM']).update(score=Decimal('20'))
+        Score.objects.filter(student=self.students[1], component=self.components['QUIZ']).update(score=Decimal('100'))
+
+        result = recompute_grades([self.course.pk], student_ids=[self.students[0].pk])
+
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(Grade.objects.get(student=self.students[0]).final_grade, baseline_final_grade(self.students[0], self.course))
+        self.assertNotEqual(Grade.objects.get(student=self.students[1]).final_grade, baseline_final_grade(self.students[1], self.course))
+
+    def test_skips_courses_whose_weights_do_not_add_up(self):
+        course = make_course('BAD1', weights=((GradeComponent.ComponentType.QUIZ, 30), (GradeComponent.ComponentType.EXAM, 50)))
+
+        result = recompute_grades([course.pk])
+
+        self.assertIn(course.pk, result['skipped'])
+        self.assertFalse(Grade.objects.filter(course=course).exists())
+
+    def test_a_recompute_retires_cached_reports_on_grades(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin', password='password', role=User.Role.ADMIN))
+        definition = {'model': 'grades', 'fields': ['student.student_id', 'final_grade']}
+        with self.captureOnCommitCallbacks(execute=True):
+            recompute_grades([self.course.pk])
+        first = client.post(reverse('custom_report'), definition, format='json')
+        first_csv = b''.join(first.streaming_content)
+        self.assertEqual(client.post(reverse('custom_report'), definition, format='json')['X-Report-Cache'], 'HIT')
+
+        Score.objects.filter(student=self.students[0], component=self.components['EXAM']).update(score=Decimal('20'))
+        with self.captureOnCommitCallbacks(execute=True):
+            recompute_grades([self.course.pk])
+
+        second = client.post(reverse('custom_report'), definition, format='json')
+        self.assertEqual(second['X-Report-Cache'], 'MISS')
+        self.assertNotEqual(b''.join(second.streaming_content), first_csv)
+
+    def test_calculate_final_grade_creates_a_zero_grade_without_scores(self):
+        student = make_student(10)
+
+        grade = Grade(student=student, course=self.course).calculate_final_grade()
+
+        grade.refresh_from_db()
+        self.assertEqual(grade.final_grade, Decimal('0.00'))
+        self.assertEqual(grade.letter_grade, 'F')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ScoreBulkUpsertTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.TEACHER)
+        self.course = make_course('SCI1')
+        self.quiz = self.course.grade_components.get(component_type=GradeComponent.ComponentType.QUIZ)
+        self.exam = self.course.grade_components.get(component_type=GradeComponent.ComponentType.EXAM)
+        class_obj = Class.objects.create(name='Form 1A', academic_year='2024/2025', class_teacher=self.teacher)
+        class_obj.courses.add(self.course)
+        self.students = [make_student(number) for number in range(2)]
+        self.api = APIClient()
+        self.api.force_authenticate(self.teacher)
+        self.url = reverse('score-bulk-upsert')
+
+    def post(self, rows):
+        return self.api.post(self.url, {'scores': rows}, format='json')
+
+    def test_creates_and_updates_scores_and_queues_each_grade_once(self):
+        Score.objects.create(student=self.students[0], component=self.exam, score=Decimal('40'))
+        rows = [
+            {'student': self.students[0].pk, 'component': self.quiz.pk, 'score': '80'},
+            {'student': self.students[0].pk, 'component': self.exam.pk, 'score': '60'},
+            {'student': self.students[1].pk, 'component': self.exam.pk, 'score': '70'},
+        ]
+
+        with mock.patch('academics.views.enqueue_grade_recompute') as enqueue:
+            response = self.post(rows)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'created': 2, 'updated': 1, 'unchanged': 0, 'grade_recomputes_queued': 2})
+        self.assertEqual(Score.objects.get(student=self.students[0], component=self.exam).score, Decimal('60'))
+        self.assertCountEqual(
+            [call.args for call in enqueue.call_args_list],
+            [(self.students[0].pk, self.course.pk), (self.students[1].pk, self.course.pk)],
+        )
+
+        # The queued pairs recompute to the per-row formula
+        recompute_grades([self.course.pk])
+        for student in self.students:
+            self.assertEqual(Grade.objects.get(student=student).final_grade, baseline_final_grade(student, self.course))
+
+    def test_unchanged_scores_queue_nothing(self):
+        Score.objects.create(student=self.students[0], component=self.exam, score=Decimal('40'))
+
+        with mock.patch('academics.views.enqueue_grade_recompute') as enqueue:
+            response = self.post([{'student': self.students[0].pk, 'component': self.exam.pk, 'score': '40'}])
+
+        self.assertEqual(response.data['unchanged'], 1)
+        enqueue.assert_not_called()
+
+    def test_rejects_the_whole_batch_when_any_row_is_invalid(self):
+        other_course = make_course('ART1')
+        rows = [
+            {'student': self.students[0].pk, 'component': self.exam.pk, 'score': '50'},
+            {'student': 999999, 'component': self.exam.pk, 'score': '50'},
+            {'student': self.students[1].pk, 'component': 999999, 'score': '50'},
+            {'student': self.students[1].pk, 'component': other_course.grade_components.first().pk, 'score': '50'},
+            {'student': self.students[0].pk, 'component': self.exam.pk, 'score': '55'},
+        ]
+        GradeComponent.objects.filter(pk=self.quiz.pk).update(max_score=Decimal('20'))
+        rows.append({'student': self.students[1].pk, 'component': self.quiz.pk, 'score': '25'})
+
+        with mock.patch('academics.views.enqueue_grade_recompute') as enqueue:
+            response = self.post(rows)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errors']), {1, 2, 3, 4, 5})
+        self.assertFalse(Score.objects.exists())
+        enqueue.assert_not_called()
+
+
+def dict_walk_letter(grades, final_grade):
+    """Grade.save's original lookup: the first entry, in the scale's order, whose threshold the grade reaches."""
+    for key, value in grades.items():
+        entry = parse_grade_entry(key, value)
+        if entry is not None and float(final_grade) >= entry[0]:
+            return entry[1]
+    return None
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CompiledGradingScaleTests(TestCase):
+    def setUp(self):
+        PopulateGradingData().create_grading_scales()
+
+    def test_seeded_scales_match_the_dict_walk(self):
+        grades = [Decimal(value) / 4 for value in range(0, 401)]  # 0.00 to 100.00 in quarter steps
+        for scale in GradingScale.objects.all():
+            for final_grade in grades:
+                self.assertEqual(
+                    scale.get_letter_grade(final_grade), dict_walk_letter(scale.grades, final_grade),
+                    f"{scale.name} at {final_grade}",
+                )
+
+    def test_scales_keep_their_stored_order(self):
+        letter = lambda name, grade: GradingScale.objects.get(name=name).get_letter_grade(Decimal(grade))
+        # BECE is stored in ascending order, so every grade from 1 up is "Excellent"
+        self.assertEqual(letter('BECE', '75'), 'Excellent')
+        self.assertEqual(letter('University of Ghana - 4.0 Scale', '3.5'), 'B+')
+        self.assertEqual(letter('KNUST - CWA System', '65'), 'B')
+        self.assertEqual(letter('Primary School Grading', '45'), 'E')
+        self.assertIsNone(letter('WASSCE', '75'))
+
+
+def rollup_counts():
+    return {
+        (rollup.student_id, rollup.class_session_id, rollup.month, rollup.status): rollup.count
+        for rollup in AttendanceRollup.objects.exclude(count=0)
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AttendanceRollCallTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.TEACHER)
+        self.course = make_course('ENG1')
+        self.class_obj = Class.objects.create(name='Form 2B', academic_year='2024/2025', class_teacher=self.teacher)
+        self.class_obj.courses.add(self.course)
+        self.students = [make_student(number) for number in range(3)]
+        for student in self.students[:2]:
+            Enrollment.objects.create(student=student, course=self.course, class_enrolled=self.class_obj)
+        self.api = APIClient()
+        self.api.force_authenticate(self.teacher)
+        self.url = reverse('attendance-roll-call')
+
+    def roll_call(self, day, records):
+        return self.api.post(self.url, {'class_session': self.class_obj.pk, 'date': day, 'records': records}, format='json')
+
+    def test_records_the_class_and_counts_the_rollups(self):
+        first, second, outsider = self.students
+        response = self.roll_call('2025-03-10', [
+            {'student': first.pk, 'status': 'PRESENT'},
+            {'student': second.pk, 'status': 'ABSENT'},
+            {'student': outsider.pk, 'status': 'PRESENT'},
+            {'student': first.pk, 'status': 'LATE'},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([result['result'] for result in response.data['results']], ['created', 'created', 'not_enrolled', 'duplicate'])
+        march = date(2025, 3, 1)
+        self.assertEqual(rollup_counts(), {
+            (first.pk, self.class_obj.pk, march, 'PRESENT'): 1,
+            (second.pk, self.class_obj.pk, march, 'ABSENT'): 1,
+        })
+
+        self.roll_call('2025-03-11', [{'student': first.pk, 'status': 'PRESENT'}, {'student': second.pk, 'status': 'PRESENT'}])
+        self.assertEqual(rollup_counts(), {
+            (first.pk, self.class_obj.pk, march, 'PRESENT'): 2,
+            (second.pk, self.class_obj.pk, march, 'ABSENT'): 1,
+            (second.pk, self.class_obj.pk, march, 'PRESENT'): 1,
+        })
+
+    def test_a_repeated_roll_call_counts_nothing_twice(self):
+        records = [{'student': student.pk, 'status': 'PRESENT'} for student in self.students[:2]]
+        self.roll_call('2025-03-10', records)
+
+        response = self.roll_call('2025-03-10', records)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual({result['result'] for result in response.data['results']}, {'already_recorded'})
+        self.assertEqual(sum(rollup_counts().values()), 2)
+
+    def test_other_teachers_cannot_call_the_roll(self):
+        other = User.objects.create_user(username='other', password='password', role=User.Role.TEACHER)
+        self.api.force_authenticate(other)
+
+        response = self.roll_call('2025-03-10', [{'student': self.students[0].pk}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_single_record_edits_move_their_count(self):
+        record = Attendance.objects.create(student=self.students[0], class_session=self.class_obj, date=date(2025, 3, 31), status='PRESENT')
+        record.status = 'LATE'
+        record.date = date(2025, 4, 1)
+        record.save()
+        Attendance.objects.create(student=self.students[1], class_session=self.class_obj, date=date(2025, 4, 2), status='ABSENT').delete()
+
+        self.assertEqual(rollup_counts(), {(self.students[0].pk, self.class_obj.pk, date(2025, 4, 1), 'LATE'): 1})
+
+    def test_rollups_match_a_rebuild(self):
+        self.roll_call('2025-03-10', [{'student': self.students[0].pk, 'status': 'PRESENT'}, {'student': self.students[1].pk, 'status': 'EXCUSED'}])
+        self.roll_call('2025-04-07', [{'student': self.students[0].pk, 'status': 'ABSENT'}])
+        incremental = rollup_counts()
+
+        rebuild_attendance_rollups()
+
+        self.assertEqual(rollup_counts(), incremental)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SeatReservationTests(TestCase):
+    def setUp(self):
+        self.course = make_course('HIST1')
+        self.class_obj = Class.objects.create(name='Form 3C', academic_year='2024/2025', max_students=2)
+        self.class_obj.courses.add(self.course)
+        self.students = [make_student(number) for number in range(4)]
+
+    def enrolled_count(self):
+        return Class.objects.values_list('enrolled_count', flat=True).get(pk=self.class_obj.pk)
+
+    def test_enrolling_takes_seats_until_the_class_is_full(self):
+        enroll_student(self.students[0], self.course, self.class_obj)
+        enroll_student(self.students[1], self.course, self.class_obj)
+
+        with self.assertRaises(ValidationError):
+            enroll_student(self.students[2], self.course, self.class_obj)
+
+        self.assertEqual(self.enrolled_count(), 2)
+        self.assertEqual(Enrollment.objects.filter(class_enrolled=self.class_obj).count(), 2)
+
+    def test_a_duplicate_enrollment_gives_its_seat_back(self):
+        enroll_student(self.students[0], self.course, self.class_obj)
+
+        with self.assertRaises(ValidationError):
+            enroll_student(self.students[0], self.course, self.class_obj)
+
+        self.assertEqual(self.enrolled_count(), 1)
+
+    def test_deleting_or_adding_enrollments_elsewhere_moves_the_counter(self):
+        enrollment = enroll_student(self.students[0], self.course, self.class_obj)
+        Enrollment.objects.create(student=self.students[1], course=self.course, class_enrolled=self.class_obj)
+        self.assertEqual(self.enrolled_count(), 2)
+
+        enrollment.delete()
+
+        self.assertEqual(self.enrolled_count(), 1)
+
+    def test_bulk_enroll_stops_at_capacity(self):
+        enroll_student(self.students[0], self.course, self.class_obj)
+        student_ids = [student.pk for student in self.students] + [999999]
+
+        results = bulk_enroll(student_ids, self.course, self.class_obj)
+
+        self.assertEqual([result['result'] for result in results], ['already_enrolled', 'enrolled', 'class_full', 'class_full', 'not_found'])
+        self.assertEqual(self.enrolled_count(), 2)
+        self.assertEqual(Enrollment.objects.filter(class_enrolled=self.class_obj).count(), 2)
+
+    def test_reserve_seats_rechecks_capacity_when_another_request_wins(self):
+        manager_filter = Class.objects.filter
+
+        def stale_read(*args, **kwargs):
+            if 'enrolled_count__lte' in kwargs:
+                return manager_filter(*args, **kwargs)
+            # Read the free seats, then let a competing request take them all before our update
+            free = manager_filter(*args, **kwargs).values_list(F('max_students') - F('enrolled_count'), flat=True).first()
+            manager_filter(pk=self.class_obj.pk).update(enrolled_count=F('max_students'))
+            stale = mock.Mock()
+            stale.values_list.return_value.first.return_value = free
+            return stale
+
+        with mock.patch.object(Class.objects, 'filter', side_effect=stale_read):
+            granted = reserve_seats(self.class_obj.pk, 2)
+
+        self.assertEqual(granted, 0)
+        self.assertEqual(self.enrolled_count(), 2)
+
+    def test_sync_seat_counts_repairs_drifted_counters(self):
+        enroll_student(self.students[0], self.course, self.class_obj)
+        Class.objects.filter(pk=self.class_obj.pk).update(enrolled_count=2)
+
+        self.assertEqual(sync_seat_counts(), 1)
+        self.assertEqual(self.enrolled_count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CourseAvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = make_course('GEO1')
+        self.class_obj = Class.objects.create(name='Form 1D', academic_year='2024/2025', max_students=1)
+        self.class_obj.courses.add(self.course)
+        self.student = make_student(1)
+
+    def test_seat_changes_refresh_only_their_class(self):
+        self.assertEqual(available_course_ids(), [self.course.pk])
+        index = cache.get(AVAILABILITY_CACHE_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = enroll_student(self.student, self.course, self.class_obj)
+        self.assertEqual(available_course_ids(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.delete()
+        self.assertEqual(available_course_ids(academic_year='2024/2025'), [self.course.pk])
+        self.assertEqual(available_course_ids(academic_year='2025/2026'), [])
+        self.assertEqual(cache.get(AVAILABILITY_CACHE_KEY), index)
+
+    def test_capacity_changes_are_seen(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enroll_student(self.student, self.course, self.class_obj)
+        self.assertEqual(available_course_ids(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_obj.max_students = 2
+            self.class_obj.save()
+
+        self.assertEqual(available_course_ids(), [self.course.pk])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class UserScopeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.TEACHER)
+        parent_user = User.objects.create_user(username='parent', password='password', role=User.Role.PARENT)
+        self.parent = Parent.objects.create(user=parent_user, first_name='Ama', last_name='Mensah', email='parent@example.com', phone_number='+233200000001')
+        self.course = make_course('PHY1')
+        self.other_course = make_course('CHE1')
+        self.class_obj = Class.objects.create(name='Form 3A', academic_year='2024/2025', class_teacher=self.teacher)
+        self.class_obj.courses.add(self.course)
+        self.other_class = Class.objects.create(name='Form 3B', academic_year='2024/2025')
+        self.other_class.courses.add(self.other_course)
+        self.child = make_student(1, parent=self.parent)
+        self.other_student = make_student(2)
+        Enrollment.objects.create(student=self.child, course=self.course, class_enrolled=self.class_obj)
+        Enrollment.objects.create(student=self.other_student, course=self.other_course, class_enrolled=self.other_class)
+
+    def scope(self, user):
+        # A fresh user object, so nothing is memoized from an earlier call
+        return get_user_scope(User.objects.get(pk=user.pk))
+
+    def test_each_role_sees_its_own_classes_courses_and_students(self):
+        expected = ({self.course.pk}, {self.class_obj.pk}, {self.child.pk})
+        for user in (self.teacher, self.parent.user, self.child.user):
+            scope = self.scope(user)
+            self.assertEqual((set(scope.course_ids), set(scope.class_ids), set(scope.student_ids)), expected, user.role)
+
+        other = self.scope(self.other_student.user)
+        self.assertEqual(set(other.student_ids), {self.other_student.pk})
+        self.assertEqual(set(other.class_ids), {self.other_class.pk})
+
+        admin = User.objects.create_user(username='admin', password='password', role=User.Role.ADMIN)
+        self.assertEqual(self.scope(admin), EMPTY_SCOPE)
+
+    def test_changes_retire_only_the_affected_users_scopes(self):
+        for user in (self.teacher, self.parent.user, self.child.user, self.other_student.user):
+            self.scope(user)
+        untouched = cache.get(SCOPE_VERSION_KEY.format(self.other_student.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.child, course=self.other_course, class_enrolled=self.other_class)
+
+        self.assertEqual(set(self.scope(self.child.user).course_ids), {self.course.pk, self.other_course.pk})
+        self.assertEqual(set(self.scope(self.parent.user).class_ids), {self.class_obj.pk, self.other_class.pk})
+        self.assertEqual(set(self.scope(self.teacher).course_ids), {self.course.pk})
+        self.assertEqual(cache.get(SCOPE_VERSION_KEY.format(self.other_student.user.pk)), untouched)
+
+    def test_a_new_class_teacher_sees_the_class(self):
+        self.scope(self.teacher)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_class.class_teacher = self.teacher
+            self.other_class.save()
+
+        scope = self.scope(self.teacher)
+        self.assertEqual(set(scope.class_ids), {self.class_obj.pk, self.other_class.pk})
+        self.assertEqual(set(scope.student_ids), {self.child.pk, self.other_student.pk})
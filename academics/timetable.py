@@ -0,0 +1,158 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from .models import Class
+
+
+TIMETABLE_VERSION_KEY = 'academics:timetable:version'
+
+
+class IntervalIndex:
+    """
+    Time slots of one room or teacher, sorted by start time.
+
+    Slots are half-open, so a class ending at 10:00 does not clash with one starting at 10:00.
+    `max_ends[i]` is the latest end among the first i + 1 slots, which lets a lookup stop
+    walking back once no earlier slot can still be running at the new start.
+    """
+
+    def __init__(self, slots):
+        slots = sorted(slots)
+        self.starts = [start for start, _, _ in slots]
+        self.ends = [end for _, end, _ in slots]
+        self.class_ids = [class_id for _, _, class_id in slots]
+        self.max_ends = []
+        for end in self.ends:
+            self.max_ends.append(max(end, self.max_ends[-1]) if self.max_ends else end)
+
+    def overlapping(self, start, end, exclude=None):
+        """
+        Returns the ids of classes whose slot overlaps [start, end).
+
+        The walk back stops once no earlier slot can still be running, so a lookup is usually
+        O(log n + conflicts). A long early slot keeps max_ends high, though, and then every
+        earlier slot is visited: the worst case is O(n) in the slots of one room or teacher.
+        """
+        conflicts = []
+        position = bisect_left(self.starts, start)
+        # Slots starting inside the new one
+        i = position
+        while i < len(self.starts) and self.starts[i] < end:
+            conflicts.append(self.class_ids[i])
+            i += 1
+        # Slots starting earlier that are still running at the new start
+        i = position - 1
+        while i >= 0 and self.max_ends[i] > start:
+            if self.ends[i] > start:
+                conflicts.append(self.class_ids[i])
+            i -= 1
+        return [class_id for class_id in conflicts if class_id != exclude]
+
+
+def build_timetable_index(academic_year):
+    """Returns {('room' | 'teacher', value): IntervalIndex} for the scheduled classes of a year."""
+    slots = defaultdict(list)
+    rows = Class.objects.filter(
+        academic_year=academic_year, start_time__isnull=False, end_time__isnull=False,
+    ).values_list('id', 'start_time', 'end_time', 'room', 'class_teacher_id')
+    for class_id, start, end, room, teacher_id in rows:
+        if room:
+            slots[('room', room)].append((start, end, class_id))
+        if teacher_id:
+            slots[('teacher', teacher_id)].append((start, end, class_id))
+    return {key: IntervalIndex(key_slots) for key, key_slots in slots.items()}
+
+
+def get_timetable_index(academic_year):
+    """Returns the cached interval index of an academic year, building it on a miss."""
+    version = cache.get_or_set(TIMETABLE_VERSION_KEY, time.time_ns, timeout=None)
+    key = f'academics:timetable:{version}:{academic_year}'
+    index = cache.get(key)
+    if index is None:
+        index = build_timetable_index(academic_year)
+        cache.set(key, index, timeout=60 * 60)
+    return index
+
+
+def invalidate_timetable_index():
+    """Retires every cached year index once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(TIMETABLE_VERSION_KEY, time.time_ns(), timeout=None))
+
+
+def find_conflicts(academic_year, start, end, room=None, teacher_id=None, exclude=None):
+    """Returns {'room': [class ids], 'teacher': [class ids]} clashing with the given slot."""
+    index = get_timetable_index(academic_year)
+    conflicts = {}
+    for kind, value in (('room', room), ('teacher', teacher_id)):
+        slots = index.get((kind, value)) if value else None
+        if slots:
+            clashes = slots.overlapping(start, end, exclude=exclude)
+            if clashes:
+                conflicts[kind] = clashes
+    return conflicts
+
+
+def validate_class_schedule(data, instance=None):
+    """
+    Raises a ValidationError if the class (validated data merged over the saved instance)
+    would double-book its room or class teacher.
+    """
+    def value(field):
+        if field in data:
+            return data[field]
+        return getattr(instance, field, None)
+
+    start, end = value('start_time'), value('end_time')
+    if start is None or end is None:
+        return
+    if end <= start:
+        raise ValidationError({"end_time": "The class must end after it starts."})
+
+    teacher = value('class_teacher')
+    conflicts = find_conflicts(
+        value('academic_year'), start, end,
+        room=value('room'),
+        teacher_id=teacher.pk if teacher else None,
+        exclude=instance.pk if instance else None,
+    )
+    if conflicts:
+        names = dict(Class.objects.filter(pk__in={pk for ids in conflicts.values() for pk in ids}).values_list('id', 'name'))
+        errors = {}
+        if 'room' in conflicts:
+            errors['room'] = f"Room is already booked by: {', '.join(names[pk] for pk in conflicts['room'])}."
+        if 'teacher' in conflicts:
+            errors['class_teacher'] = f"Teacher already teaches at this time in: {', '.join(names[pk] for pk in conflicts['teacher'])}."
+        raise ValidationError(errors)
+
+
+def scan_timetable(academic_year):
+    """
+    Returns every room and teacher clash in an academic year.
+
+    Each slot list is swept once in start order, keeping only the slots still running, so
+    the scan costs O(n log n + clashes) rather than comparing every pair of classes.
+    """
+    classes = {}
+    conflicts = []
+    for (kind, value), slots in build_timetable_index(academic_year).items():
+        running = []
+        for start, end, class_id in zip(slots.starts, slots.ends, slots.class_ids):
+            running = [(other_end, other_id) for other_end, other_id in running if other_end > start]
+            for other_end, other_id in running:
+                conflicts.append({
+                    'type': kind,
+                    kind: value,
+                    'classes': [other_id, class_id],
+                    'start_time': start,
+                    'end_time': min(end, other_end),
+                })
+                classes.update({other_id: None, class_id: None})
+            running.append((end, class_id))
+
+    names = dict(Class.objects.filter(pk__in=classes).values_list('id', 'name'))
+    for conflict in conflicts:
+        conflict['class_names'] = [names.get(pk) for pk in conflict['classes']]
+    return conflicts
@@ -10,7 +10,11 @@ from .views import (AvailableCoursesList, CourseListCreateView,
                     GradeComponentListCreateView, GradeComponentRetrieveUpdateDestroyView,
                     ScoreListCreateView, ScoreRetrieveUpdateDestroyView,
                     TeacherLesssonPlanListCreateView, TeacherLesssonPlanRetrieveUpdateDestroyView,
-                    TeacherAssignmentListCreateView, TeacherAssignmentRetrieveUpdateDestroyView
+                    TeacherAssignmentListCreateView, TeacherAssignmentRetrieveUpdateDestroyView,
+                    CourseGradeRecomputeView, ClassGradeRecomputeView, ScoreBulkUpsertView,
+                    GradeRecomputeQueueView, AttendanceRollCallView,
+                    StudentAttendanceSummaryView, ParentAttendanceSummaryView, BulkEnrollmentView,
+                    ClassConflictReportView,
                     )
 
 urlpatterns = [
@@ -18,22 +22,31 @@ urlpatterns = [
     path('courses/<int:pk>/', CourseRetrieveUpdateDestroyView.as_view(), name='course-retrieve-update-destroy'),
     path('classes/', ClassListCreateView.as_view(), name='class-list-create'),
     path('classes/<int:pk>/', ClassRetrieveUpdateDestroyView.as_view(), name='class-retrieve-update-destroy'),
+    path('classes/conflicts/', ClassConflictReportView.as_view(), name='class-conflict-report'),
     path('enrollments/', EnrollmentListCreateView.as_view(), name='enrollment-list-create'),
+    path('enrollments/bulk/', BulkEnrollmentView.as_view(), name='enrollment-bulk-create'),
     path('enrollments/<int:pk>/', EnrollmentRetrieveDestroyView.as_view(), name='enrollment-retrieve-destroy'),
     path("student/enrollments/", StudentEnrollmentListCreateView.as_view(), name="student-enrollment-list-create"),
     path("student/enrollments/<int:pk>/", StudentEnrollmentRetrieveDestroyView.as_view(), name="student-enrollment-detail"),
     path("courses/available/", AvailableCoursesList.as_view(), name="available-courses-list"),
     path('attendance/teacher/', TeacherAttendanceCreateListView.as_view(), name='teacher-attendance'),
+    path('attendance/roll-call/', AttendanceRollCallView.as_view(), name='attendance-roll-call'),
     path('attendance/student/', StudentAttendanceListView.as_view(), name='student-attendance'),
     path('attendance/parent/', ParentAttendanceListView.as_view(), name='parent-attendance'),
+    path('attendance/student/summary/', StudentAttendanceSummaryView.as_view(), name='student-attendance-summary'),
+    path('attendance/parent/summary/', ParentAttendanceSummaryView.as_view(), name='parent-attendance-summary'),
     path("grades/teacher/", TeacherGradeCreateListView.as_view(), name="teacher-grades"),
     path("grades/student/", StudentGradeListView.as_view(), name="student-grades"),
     path("grades/parent/", ParentGradeListView.as_view(), name="parent-grades"),
+    path("courses/<int:pk>/recompute-grades/", CourseGradeRecomputeView.as_view(), name="course-recompute-grades"),
+    path("classes/<int:pk>/recompute-grades/", ClassGradeRecomputeView.as_view(), name="class-recompute-grades"),
+    path("grades/recompute-queue/", GradeRecomputeQueueView.as_view(), name="grade-recompute-queue"),
     path("grading-scales/", GradingScaleListCreateView.as_view(), name="grading-scale-list-create"),
     path("grading-scales/<int:pk>/", GradingScaleRetrieveUpdateDestroyView.as_view(), name="grading-scale-detail"),
     path("grade-components/", GradeComponentListCreateView.as_view(), name="grade-component-list-create"),
     path("grade-components/<int:pk>/", GradeComponentRetrieveUpdateDestroyView.as_view(), name="grade-component-detail"),
     path("scores/", ScoreListCreateView.as_view(), name="score-list-create"),
+    path("scores/bulk/", ScoreBulkUpsertView.as_view(), name="score-bulk-upsert"),
     path("scores/<int:pk>/", ScoreRetrieveUpdateDestroyView.as_view(), name="score-detail"),
     path('lesson-plans/teacher/', TeacherLesssonPlanListCreateView.as_view(), name='teacher-lesson-plans'),
     path('lesson-plans/teacher/<int:pk>/', TeacherLesssonPlanRetrieveUpdateDestroyView.as_view(), name='teacher-lesson-plan-detail'),
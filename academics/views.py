@@ -4,13 +4,25 @@ from rest_framework.exceptions import ValidationError
 from academics.permissions import IsStudentEnrolled
 from users.models import User
 from users.permissions import IsAdminOrReadOnly, IsAdmin, IsParent, IsStudent, IsTeacher
-from .models import Assignment, Attendance, Course, Class, Enrollment, Grade, GradeComponent, GradingScale, LessonPlan, Score
-from .serializers import AssignmentSerializer, AttendanceSerializer, CourseSerializer, ClassSerializer, EnrollmentSerializer, GradeComponentSerializer, GradeSerializer, GradingScaleSerializer, LessonPlanSerializer, ScoreSerializer
+from .models import Assignment, Attendance, AttendanceRollup, Course, Class, Enrollment, Grade, GradeComponent, GradingScale, LessonPlan, Score
+from .serializers import AssignmentSerializer, AttendanceRollCallSerializer, AttendanceSerializer, BulkEnrollmentSerializer, CourseSerializer, ClassSerializer, EnrollmentSerializer, GradeComponentSerializer, GradeSerializer, GradingScaleSerializer, LessonPlanSerializer, ScoreBulkRowSerializer, ScoreSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, F   
 from rest_framework import serializers
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from students.models import Student
+from reports.report_cache import bump_model_version
+from .attendance import attendance_summary, filter_rollups, record_attendance
+from .availability import available_course_ids
+from .enrollment import bulk_enroll, enroll_student
+from .grading import enqueue_grade_recompute, invalidate_compiled_scale, pending_grade_recomputes, recompute_class_grades, recompute_course_grades
+from .scope import ensure_teaches_course, get_user_scope
+from .timetable import scan_timetable, validate_class_schedule
 
 
 class CourseListCreateView(generics.ListCreateAPIView):
@@ -32,11 +44,34 @@ class ClassListCreateView(generics.ListCreateAPIView):
     filterset_fields = ['name', 'academic_year', 'class_teacher', 'courses', 'start_time', 'end_time', 'room']
     search_fields = ['name', 'academic_year', 'class_teacher__first_name', 'class_teacher__last_name', 'courses__name', 'room']
 
+    def perform_create(self, serializer):
+        # Reject double-booked rooms and teachers
+        validate_class_schedule(serializer.validated_data)
+        serializer.save()
+
 
 class ClassRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Class.objects.all()
     serializer_class = ClassSerializer
     permission_classes = [IsAdminOrReadOnly]
+
+    def perform_update(self, serializer):
+        validate_class_schedule(serializer.validated_data, instance=serializer.instance)
+        serializer.save()
+
+
+class ClassConflictReportView(APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        """
+        Lists every room and teacher double-booking among the classes of an academic year.
+        """
+        academic_year = request.query_params.get('academic_year')
+        if not academic_year:
+            raise ValidationError({"academic_year": "This query parameter is required."})
+        conflicts = scan_timetable(academic_year)
+        return Response({"academic_year": academic_year, "count": len(conflicts), "conflicts": conflicts})
     
 
 class EnrollmentListCreateView(generics.ListCreateAPIView):
@@ -48,15 +83,37 @@ class EnrollmentListCreateView(generics.ListCreateAPIView):
     search_fields = ['student__first_name', 'student__last_name', 'course__name']
 
     def perform_create(self, serializer):
-        # Check for class capacity
-        class_enrolled = serializer.validated_data.get('class_enrolled')
-
-        if class_enrolled:
-            enrolled_count = Enrollment.objects.filter(class_enrolled=class_enrolled).count()
-            if enrolled_count >= class_enrolled.max_students:
-                raise ValidationError({"detail": "This class is already full."})
+        # The serializer's student field is read-only, so resolve it from the request
+        student_id = str(self.request.data.get('student', ''))
+        student = Student.objects.filter(pk=student_id).first() if student_id.isdigit() else None
+        if student is None:
+            raise ValidationError({"student": "A valid student is required."})
+
+        # Take a seat in the class and create the enrollment atomically
+        serializer.instance = enroll_student(
+            student,
+            serializer.validated_data['course'],
+            serializer.validated_data.get('class_enrolled'),
+        )
+
+class BulkEnrollmentView(APIView):
+    permission_classes = [IsAdmin]
 
-        serializer.save()
+    def post(self, request):
+        """
+        Enrolls a list of students in a course and class, up to the class capacity,
+        and returns the result for each student.
+        """
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_enroll(
+            serializer.validated_data['students'],
+            serializer.validated_data['course'],
+            serializer.validated_data['class_enrolled'],
+        )
+        enrolled = sum(1 for result in results if result['result'] == 'enrolled')
+        return Response({"enrolled": enrolled, "results": results},
+                        status=status.HTTP_201_CREATED if enrolled else status.HTTP_200_OK)
 
 class EnrollmentRetrieveDestroyView(generics.RetrieveDestroyAPIView):
     queryset = Enrollment.objects.all()
@@ -85,19 +142,13 @@ class StudentEnrollmentListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         student = self.request.user.student_profile  # Get the student profile
 
-        # Check for class capacity
-        class_enrolled = serializer.validated_data.get('class_enrolled')
-        if class_enrolled:
-            enrolled_count = Enrollment.objects.filter(class_enrolled=class_enrolled).count()
-            if enrolled_count >= class_enrolled.max_students:
-                raise ValidationError({"detail": "This class is already full."})
-
         # Prevent duplicate enrollment
         course = serializer.validated_data.get('course')
         if Enrollment.objects.filter(student=student, course=course).exists():
             raise ValidationError({"detail": "You are already enrolled in this course."})
 
-        serializer.save(student=student)
+        # Take a seat in the class and create the enrollment atomically
+        serializer.instance = enroll_student(student, course, serializer.validated_data.get('class_enrolled'))
 
 class StudentEnrollmentRetrieveDestroyView(generics.RetrieveDestroyAPIView):
     queryset = Enrollment.objects.all()
@@ -110,17 +161,15 @@ class AvailableCoursesList(generics.ListAPIView):
 
     def get_queryset(self):
         """
-        Returns a list of courses with available slots in at least one class.
+        Returns a list of courses with available slots in at least one class,
+        optionally filtered by level and academic_year.
         """
-        # Get all classes that have space available
-        available_classes = Class.objects.annotate(
-            enrolled_count=Count('enrollments')
-        ).filter(enrolled_count__lt=F('max_students'))
-
-        # Get all courses that have at least one class with space available
-        available_courses = Course.objects.filter(classes__in=available_classes).distinct()
-
-        return available_courses
+        # Read the cached availability index instead of counting enrollments per class
+        course_ids = available_course_ids(
+            level=self.request.query_params.get('level'),
+            academic_year=self.request.query_params.get('academic_year'),
+        )
+        return Course.objects.filter(pk__in=course_ids).select_related('grading_scale')
     
 
 
@@ -132,19 +181,86 @@ class TeacherAttendanceCreateListView(generics.ListCreateAPIView):
     search_fields = ['student__first_name', 'student__last_name']
 
     def get_queryset(self):
-        teacher = self.request.user.staff_profile
         today = date.today()
-        return Attendance.objects.filter(class_session__class_teacher=teacher, date=today)
+        return Attendance.objects.filter(class_session_id__in=get_user_scope(self.request.user).class_ids, date=today)
 
     def perform_create(self, serializer):
-        # Check if attendance has already been taken for this class on this date
+        # Check if attendance has already been taken for this student in this class on this date
+        student = serializer.validated_data.get('student')
         class_session = serializer.validated_data.get('class_session')
         date = serializer.validated_data.get('date')
-        if Attendance.objects.filter(class_session=class_session, date=date).exists():
-            raise ValidationError("Attendance has already been taken for this class on this date.")
+        if Attendance.objects.filter(student=student, class_session=class_session, date=date).exists():
+            raise ValidationError("Attendance has already been taken for this student in this class on this date.")
         
         serializer.save()
 
+class AttendanceRollCallView(APIView):
+    permission_classes = [IsTeacher]
+
+    def post(self, request):
+        """
+        Records attendance for a whole class on a date in one bulk insert and
+        returns the outcome for each student.
+        """
+        serializer = AttendanceRollCallSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        class_session = serializer.validated_data['class_session']
+        date = serializer.validated_data['date']
+        records = serializer.validated_data['records']
+
+        if class_session.id not in get_user_scope(request.user).class_ids:
+            raise ValidationError("You are not the class teacher of this class.")
+
+        student_ids = {record['student'] for record in records}
+        enrolled = set(
+            Enrollment.objects.filter(class_enrolled=class_session, student_id__in=student_ids).values_list('student_id', flat=True)
+        )
+        already_recorded = set(
+            Attendance.objects.filter(class_session=class_session, date=date, student_id__in=student_ids).values_list('student_id', flat=True)
+        )
+
+        results = []
+        to_create = []
+        seen = set()
+        for record in records:
+            student_id = record['student']
+            if student_id in seen:
+                outcome = 'duplicate'
+            elif student_id not in enrolled:
+                outcome = 'not_enrolled'
+            elif student_id in already_recorded:
+                outcome = 'already_recorded'
+            else:
+                outcome = 'created'
+                to_create.append(Attendance(
+                    student_id=student_id,
+                    class_session=class_session,
+                    date=date,
+                    status=record['status'],
+                    remark=record.get('remark'),
+                ))
+            seen.add(student_id)
+            results.append({"student": student_id, "result": outcome})
+
+        # A concurrent roll call for the same class and date trips the unique constraint and
+        # rolls back the whole batch, so the rollups only ever count rows that were inserted
+        try:
+            with transaction.atomic():
+                Attendance.objects.bulk_create(to_create, batch_size=500)
+                # bulk_create skips the model signals, so update the rollups and retire cached reports directly
+                record_attendance(to_create)
+                if to_create:
+                    bump_model_version('attendance')
+        except IntegrityError:
+            raise ValidationError("Attendance for some of these students was recorded at the same time. Reload and try again.")
+
+        return Response({
+            "class_session": class_session.id,
+            "date": date,
+            "created": len(to_create),
+            "results": results,
+        }, status=status.HTTP_201_CREATED if to_create else status.HTTP_200_OK)
+
 class StudentAttendanceListView(generics.ListAPIView):
     serializer_class = AttendanceSerializer
     permission_classes = [IsStudent]
@@ -164,11 +280,34 @@ class ParentAttendanceListView(generics.ListAPIView):
     search_fields = ['class_session__name', 'date']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
-        return Attendance.objects.filter(student__parent=parent)
+        return Attendance.objects.filter(student_id__in=get_user_scope(self.request.user).student_ids)
     
     
 
+class StudentAttendanceSummaryView(APIView):
+    permission_classes = [IsStudent]
+
+    def get(self, request):
+        """
+        Returns the current student's attendance totals and rates per class, read from the rollups.
+        """
+        student = request.user.student_profile
+        rollups = filter_rollups(AttendanceRollup.objects.filter(student=student), request.query_params)
+        return Response(attendance_summary(rollups))
+
+class ParentAttendanceSummaryView(APIView):
+    permission_classes = [IsParent]
+
+    def get(self, request):
+        """
+        Returns attendance totals and rates per class for each of the parent's children, read from the rollups.
+        """
+        children = []
+        for child in Student.objects.filter(pk__in=get_user_scope(request.user).student_ids):
+            rollups = filter_rollups(AttendanceRollup.objects.filter(student=child), request.query_params)
+            children.append(dict(attendance_summary(rollups), student=child.id, student_name=str(child)))
+        return Response(children)
+
 class GradingScaleListCreateView(generics.ListCreateAPIView):
     queryset = GradingScale.objects.all()
     serializer_class = GradingScaleSerializer
@@ -179,6 +318,16 @@ class GradingScaleRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIVie
     serializer_class = GradingScaleSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    def perform_update(self, serializer):
+        # Saving bumps the scale version, so other processes recompile on their next lookup
+        scale = serializer.save()
+        invalidate_compiled_scale(scale.pk)
+
+    def perform_destroy(self, instance):
+        scale_id = instance.pk
+        instance.delete()
+        invalidate_compiled_scale(scale_id)
+
 class GradeComponentListCreateView(generics.ListCreateAPIView):
     queryset = GradeComponent.objects.all()
     serializer_class = GradeComponentSerializer
@@ -188,12 +337,10 @@ class GradeComponentListCreateView(generics.ListCreateAPIView):
     search_fields = ['name', 'course__name']
 
     def perform_create(self, serializer):
-        teacher = self.request.user.staff_profile
         course = serializer.validated_data.get('course')
 
         # Check if the teacher is assigned to any class that teaches this course
-        if not Class.objects.filter(courses=course, class_teacher=teacher).exists():
-            raise serializers.ValidationError("You are not assigned to teach this course.")
+        ensure_teaches_course(self.request.user, course.id)
 
         serializer.save()
 
@@ -203,21 +350,16 @@ class GradeComponentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIV
     permission_classes = [IsTeacher]
 
     def perform_update(self, serializer):
-        teacher = self.request.user.staff_profile
         instance = self.get_object()
 
         # Check if the teacher is assigned to any class that teaches this course
-        if not Class.objects.filter(courses=instance.course, class_teacher=teacher).exists():
-            raise serializers.ValidationError("You are not assigned to teach this course.")
+        ensure_teaches_course(self.request.user, instance.course_id)
 
         serializer.save()
 
     def perform_destroy(self, instance):
-        teacher = self.request.user.staff_profile
-
         # Check if the teacher is assigned to any class that teaches this course
-        if not Class.objects.filter(courses=instance.course, class_teacher=teacher).exists():
-            raise serializers.ValidationError("You are not assigned to teach this course.")
+        ensure_teaches_course(self.request.user, instance.course_id)
 
         instance.delete()
 
@@ -230,13 +372,11 @@ class ScoreListCreateView(generics.ListCreateAPIView):
     search_fields = ['component__name', 'student__first_name', 'student__last_name']
 
     def perform_create(self, serializer):
-        teacher = self.request.user.staff_profile
         component = serializer.validated_data.get('component')
         student = serializer.validated_data.get('student')
 
         # Check if the teacher is assigned to any class that teaches this course
-        if not Class.objects.filter(courses=component.course, class_teacher=teacher).exists():
-            raise serializers.ValidationError("You are not assigned to teach this course.")
+        ensure_teaches_course(self.request.user, component.course_id)
 
         # Check if a score already exists for this student and component
         existing_score = Score.objects.filter(student=student, component=component).first()
@@ -250,13 +390,8 @@ class ScoreListCreateView(generics.ListCreateAPIView):
 
         serializer.save()
 
-        # Recalculate the final grade after saving the score
-        try:
-            grade = Grade.objects.get(student=student, course=component.course)
-            grade.calculate_final_grade()
-            grade.save()
-        except Grade.DoesNotExist:
-            print("A grade does not exist for this student in this course.")
+        # Queue the final grade recalculation instead of doing it in the request
+        enqueue_grade_recompute(student.id, component.course_id)
 
 class ScoreRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Score.objects.all()
@@ -264,39 +399,128 @@ class ScoreRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsTeacher]
 
     def perform_update(self, serializer):
-        teacher = self.request.user.staff_profile
         instance = self.get_object()
 
         # Check if the teacher is assigned to any class that teaches this course
-        if not Class.objects.filter(courses=instance.component.course, class_teacher=teacher).exists():
-            raise serializers.ValidationError("You are not assigned to teach this course.")
+        ensure_teaches_course(self.request.user, instance.component.course_id)
 
-        serializer.save()
+        score = serializer.save()
 
-        # Recalculate the final grade after updating the score
-        try:
-            grade = Grade.objects.get(student=instance.student, course=instance.component.course)
-            grade.calculate_final_grade()
-            grade.save()
-        except Grade.DoesNotExist:
-            print("A grade does not exist for this student in this course.")
+        # Queue the final grade recalculation for the old and (if changed) the new student/course
+        enqueue_grade_recompute(instance.student_id, instance.component.course_id)
+        if (score.student_id, score.component.course_id) != (instance.student_id, instance.component.course_id):
+            enqueue_grade_recompute(score.student_id, score.component.course_id)
 
     def perform_destroy(self, instance):
-        teacher = self.request.user.staff_profile
-
         # Check if the teacher is assigned to any class that teaches this course
-        if not Class.objects.filter(courses=instance.component.course, class_teacher=teacher).exists():
-            raise serializers.ValidationError("You are not assigned to teach this course.")
+        ensure_teaches_course(self.request.user, instance.component.course_id)
 
         instance.delete()
 
-        # Recalculate the final grade after deleting the score
-        try:
-            grade = Grade.objects.get(student=instance.student, course=instance.component.course)
-            grade.calculate_final_grade()
-            grade.save()
-        except Grade.DoesNotExist:
-            print("A grade does not exist for this student in this course.")
+        # Queue the final grade recalculation after deleting the score
+        enqueue_grade_recompute(instance.student_id, instance.component.course_id)
+
+class CourseGradeRecomputeView(APIView):
+    permission_classes = [IsAdmin]
+
+    def post(self, request, pk):
+        """
+        Recomputes the final and letter grades of every student taking the course.
+        """
+        course = get_object_or_404(Course, pk=pk)
+        return Response(recompute_course_grades(course))
+
+class ClassGradeRecomputeView(APIView):
+    permission_classes = [IsAdmin]
+
+    def post(self, request, pk):
+        """
+        Recomputes the final and letter grades of every student enrolled in the class.
+        """
+        class_obj = get_object_or_404(Class, pk=pk)
+        return Response(recompute_class_grades(class_obj))
+
+class GradeRecomputeQueueView(APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        """
+        Returns the number of grade recomputes still waiting in the queue.
+        """
+        return Response({"pending": pending_grade_recomputes()})
+
+class ScoreBulkUpsertView(APIView):
+    permission_classes = [IsTeacher]
+
+    def post(self, request):
+        """
+        Creates or updates a batch of scores (e.g. a whole class column) in one transaction
+        and queues one recompute for each affected grade.
+        """
+        rows = request.data.get('scores') if isinstance(request.data, dict) else request.data
+        serializer = ScoreBulkRowSerializer(data=rows, many=True)
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.validated_data
+        if not rows:
+            raise serializers.ValidationError("No scores provided.")
+
+        # Preload everything the rows refer to
+        components = GradeComponent.objects.select_related('course').in_bulk({row['component'] for row in rows})
+        student_ids = set(Student.objects.filter(pk__in={row['student'] for row in rows}).values_list('id', flat=True))
+        course_ids = {component.course_id for component in components.values()}
+        # Courses the teacher is assigned to through any class that teaches them
+        allowed_course_ids = course_ids & get_user_scope(request.user).course_ids
+
+        errors = {}
+        seen = set()
+        for index, row in enumerate(rows):
+            component = components.get(row['component'])
+            key = (row['student'], row['component'])
+            if component is None:
+                errors[index] = "Grade component does not exist."
+            elif row['student'] not in student_ids:
+                errors[index] = "Student does not exist."
+            elif component.course_id not in allowed_course_ids:
+                errors[index] = "You are not assigned to teach this course."
+            elif row['score'] > component.max_score:
+                errors[index] = f"The score cannot exceed the maximum score ({component.max_score}) for this component."
+            elif key in seen:
+                errors[index] = "Duplicate score for this student and component."
+            seen.add(key)
+        if errors:
+            raise serializers.ValidationError({"errors": errors})
+
+        with transaction.atomic():
+            existing = {
+                (score.student_id, score.component_id): score
+                for score in Score.objects.select_for_update().filter(
+                    student_id__in={row['student'] for row in rows},
+                    component_id__in=components.keys(),
+                )
+            }
+            to_create = []
+            to_update = []
+            for row in rows:
+                score = existing.get((row['student'], row['component']))
+                if score is None:
+                    to_create.append(Score(student_id=row['student'], component_id=row['component'], score=row['score']))
+                elif score.score != row['score']:
+                    score.score = row['score']
+                    to_update.append(score)
+            Score.objects.bulk_create(to_create, batch_size=500)
+            Score.objects.bulk_update(to_update, ['score'], batch_size=500)
+
+            # Queue one final grade recalculation per affected student and course, like single score saves
+            recomputes = {(score.student_id, components[score.component_id].course_id) for score in to_create + to_update}
+            for student_id, course_id in recomputes:
+                enqueue_grade_recompute(student_id, course_id)
+
+        return Response({
+            "created": len(to_create),
+            "updated": len(to_update),
+            "unchanged": len(rows) - len(to_create) - len(to_update),
+            "grade_recomputes_queued": len(recomputes),
+        }, status=status.HTTP_200_OK)
 
 class TeacherGradeCreateListView(generics.ListCreateAPIView):
     serializer_class = GradeSerializer
@@ -306,17 +530,14 @@ class TeacherGradeCreateListView(generics.ListCreateAPIView):
     search_fields = ['student__first_name', 'student__last_name', 'course__name']
 
     def get_queryset(self):
-        teacher = self.request.user.staff_profile
-        return Grade.objects.filter(course__classes__class_teacher=teacher)
+        return Grade.objects.filter(course_id__in=get_user_scope(self.request.user).course_ids)
     
     def perform_create(self, serializer):
         # Ensure the teacher is assigned to the course they are trying to enter a grade for
-        teacher = self.request.user.staff_profile
         course = serializer.validated_data.get('course')
         
         # Check if the teacher is assigned to any class that teaches this course
-        if not Class.objects.filter(courses=course, class_teacher=teacher).exists():
-            raise serializers.ValidationError("You are not assigned to teach this course.")
+        ensure_teaches_course(self.request.user, course.id)
 
         serializer.save()
 
@@ -339,8 +560,7 @@ class ParentGradeListView(generics.ListAPIView):
     search_fields = ['student__first_name', 'student__last_name', 'course__name']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
-        return Grade.objects.filter(student__parent=parent)
+        return Grade.objects.filter(student_id__in=get_user_scope(self.request.user).student_ids)
     
 
 class TeacherLesssonPlanListCreateView(generics.ListCreateAPIView):
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Message,BulkMessage
+from .models import Message,BulkMessage,DeliveryLog
 
 admin.site.register(Message)
-admin.site.register(BulkMessage)
\ No newline at end of file
+admin.site.register(BulkMessage)
+admin.site.register(DeliveryLog)
@@ -0,0 +1,76 @@
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from .models import BulkMessage, DeliveryLog
+
+
+def create_delivery_logs(bulk_message_id, recipients):
+    """
+    Records a chunk of recipients as Pending with one bulk insert, adds them to the counters
+    and returns them. Recipients that already have a log (e.g. from a dispatch that ran
+    again) are left out, so they are neither counted nor sent to twice.
+    """
+    existing = set(
+        DeliveryLog.objects.filter(bulk_message_id=bulk_message_id, recipient__in=list(recipients))
+        .values_list('recipient', flat=True)
+    )
+    new = [recipient for recipient in dict.fromkeys(recipients) if recipient not in existing]
+    if not new:
+        return new
+    DeliveryLog.objects.bulk_create(
+        [DeliveryLog(bulk_message_id=bulk_message_id, recipient=recipient) for recipient in new],
+        batch_size=500, ignore_conflicts=True,
+    )
+    BulkMessage.objects.filter(pk=bulk_message_id).update(
+        total_recipients=F('total_recipients') + len(new),
+        pending_count=F('pending_count') + len(new),
+    )
+    return new
+
+
+def record_deliveries(bulk_message_id, outcomes, provider_ids=None, retrying=()):
+    """
+    Writes the outcome of one send attempt, {recipient: None when sent, or the error}, to the
+    recipients' delivery logs with one read and one bulk update, then moves the counters.
+
+    Failed recipients listed in `retrying` stay Pending for the next attempt; the other
+    failures are final.
+    """
+    provider_ids = provider_ids or {}
+    retrying = set(retrying)
+    logs = list(DeliveryLog.objects.filter(bulk_message_id=bulk_message_id, recipient__in=list(outcomes), status='Pending'))
+    sent = failed = 0
+    now = timezone.now()
+    for log in logs:
+        error = outcomes[log.recipient]
+        log.attempts += 1
+        log.updated_at = now
+        log.provider_id = provider_ids.get(log.recipient, log.provider_id)
+        if error is None:
+            log.status = 'Sent'
+            log.error = None
+            sent += 1
+        else:
+            log.error = str(error)[:255]
+            if log.recipient not in retrying:
+                log.status = 'Failed'
+                failed += 1
+    DeliveryLog.objects.bulk_update(logs, ['status', 'provider_id', 'attempts', 'error', 'updated_at'], batch_size=500)
+
+    if sent or failed:
+        BulkMessage.objects.filter(pk=bulk_message_id).update(
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + failed,
+            pending_count=F('pending_count') - sent - failed,
+        )
+        finish_bulk_message(bulk_message_id)
+
+
+def finish_bulk_message(bulk_message_id):
+    """
+    Marks a fully dispatched ('Sending') message Sent, or Failed when no one received it,
+    once nothing is pending. The conditional update makes this safe to call from every task.
+    """
+    BulkMessage.objects.filter(pk=bulk_message_id, status='Sending', pending_count=0).update(
+        status=Case(When(sent_count__gt=0, then=Value('Sent')), default=Value('Failed')),
+        sent_time=timezone.now(),
+    )
@@ -0,0 +1,45 @@
+import smtplib
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.message import make_msgid
+
+
+def is_permanent_failure(error):
+    """Refused recipients will be refused again, so they are not retried."""
+    return isinstance(error, smtplib.SMTPRecipientsRefused)
+
+
+def send_individual_emails(subject, message_body, from_email, recipients, connection=None):
+    """
+    Sends one message per recipient, so no one sees the other addresses, over a single
+    backend connection that stays open for the whole batch.
+
+    Returns ({recipient: None when sent, or the exception}, {recipient: Message-ID}). A
+    failure only affects its own recipient; the connection is reopened if the server
+    dropped it.
+    """
+    connection = connection or get_connection(fail_silently=False)
+    outcomes = {}
+    message_ids = {}
+    try:
+        connection.open()
+        for recipient in recipients:
+            message_ids[recipient] = make_msgid()
+            message = EmailMessage(
+                subject, message_body, from_email, [recipient], connection=connection,
+                headers={'Message-ID': message_ids[recipient]},
+            )
+            try:
+                connection.send_messages([message])
+                outcomes[recipient] = None
+            except Exception as e:
+                outcomes[recipient] = e
+                if isinstance(e, smtplib.SMTPServerDisconnected):
+                    connection.close()
+                    connection.open()
+    except Exception as e:
+        # The connection could not be (re)opened: everyone not yet tried failed with it
+        for recipient in recipients:
+            outcomes.setdefault(recipient, e)
+    finally:
+        connection.close()
+    return outcomes, message_ids
@@ -0,0 +1,71 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a local stand-in for the Arkesel SMS API, for throughput testing. '
+        'Point ARKESEL_SMS_URL at http://<host>:<port>/v2/sms/send.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--latency', type=float, default=0.2, help='Seconds to wait before answering each request')
+        parser.add_argument('--fail-every', type=int, default=0, help='Fail every Nth request (0 never fails)')
+
+    def handle(self, *args, **options):
+        stats = {'requests': 0, 'messages': 0, 'started': None}
+        lock = threading.Lock()
+        latency = options['latency']
+        fail_every = options['fail_every']
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, so pooled connections are reused
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                try:
+                    recipients = json.loads(body)['recipients']
+                except (KeyError, ValueError):
+                    return self.respond(400, {'status': 'error', 'message': 'Invalid payload'})
+
+                time.sleep(latency)
+                with lock:
+                    stats['started'] = stats['started'] or time.monotonic()
+                    stats['requests'] += 1
+                    stats['messages'] += len(recipients)
+                    number = stats['requests']
+                    rate = stats['messages'] / max(time.monotonic() - stats['started'], 1e-6) * 60
+                stdout.write(f"Request {number}: {len(recipients)} recipient(s), {stats['messages']} total, {rate:.0f}/min")
+
+                if fail_every and number % fail_every == 0:
+                    return self.respond(500, {'status': 'error', 'message': 'Simulated failure'})
+                self.respond(200, {'status': 'success', 'data': [{'recipient': recipient, 'id': str(uuid.uuid4())} for recipient in recipients]})
+
+            def respond(self, code, data):
+                payload = json.dumps(data).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stub SMS provider listening on http://{options['host']}:{options['port']}/v2/sms/send"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
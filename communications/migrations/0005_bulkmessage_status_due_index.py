@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+def mark_dispatched_messages_sent(apps, schema_editor):
+    # Messages were sent as soon as they were created and left Pending; the scheduler must not send them again
+    BulkMessage = apps.get_model('communications', 'BulkMessage')
+    BulkMessage.objects.filter(status='Pending').update(status='Sent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0004_bulkmessage_counters_deliverylog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bulkmessage',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Queued', 'Queued'), ('Sending', 'Sending'), ('Sent', 'Sent'), ('Failed', 'Failed'), ('Cancelled', 'Cancelled')], default='Pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='bulkmessage',
+            index=models.Index(fields=['status', 'scheduled_time'], name='bulk_message_due_idx'),
+        ),
+        migrations.RunPython(mark_dispatched_messages_sent, migrations.RunPython.noop),
+    ]
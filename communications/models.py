@@ -32,9 +32,37 @@ class BulkMessage(models.Model):
     message_body = models.TextField()
     custom_recipients = models.TextField(blank=True, null=True, help_text="Enter recipient emails or phone numbers separated by commas or newlines.")
     delivery_method = models.CharField(max_length=20, choices=DeliveryMethod.choices, default=DeliveryMethod.EMAIL)
-    status = models.CharField(max_length=20, choices=(('Pending', 'Pending'), ('Sent', 'Sent'), ('Failed', 'Failed')), default='Pending')
+    # Pending until released (at once, or at scheduled_time), Queued while recipients are dispatched, Sending until nothing is pending
+    status = models.CharField(max_length=20, choices=(('Pending', 'Pending'), ('Queued', 'Queued'), ('Sending', 'Sending'), ('Sent', 'Sent'), ('Failed', 'Failed'), ('Cancelled', 'Cancelled')), default='Pending')
     scheduled_time = models.DateTimeField(null=True, blank=True)  # Optional: For scheduling messages
     sent_time = models.DateTimeField(null=True, blank=True)
+    # Delivery counters, kept up to date with F() updates by the sending tasks
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'scheduled_time'], name='bulk_message_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"From: {self.sender.get_full_name()}, To: {self.recipient_group}, Subject: {self.subject}"
+
+
+class DeliveryLog(models.Model):
+    """The delivery of a bulk message to one recipient (an email address or phone number)."""
+    bulk_message = models.ForeignKey(BulkMessage, on_delete=models.CASCADE, related_name='deliveries')
+    recipient = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=(('Pending', 'Pending'), ('Sent', 'Sent'), ('Failed', 'Failed')), default='Pending')
+    provider_id = models.CharField(max_length=255, blank=True, null=True)  # Message-ID for email, the provider's message id for SMS
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('bulk_message', 'recipient')
 
     def __str__(self):
-        return f"From: {self.sender.get_full_name()}, To: {self.recipient_group}, Subject: {self.subject}"
\ No newline at end of file
+        return f"{self.bulk_message_id} - {self.recipient}: {self.status}"
@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+from academics.models import GradingScale
+from fees.models import Fee, Payment
+from staff.models import Staff
+from students.models import Student
+from users.models import Parent, User
+
+
+# Recipient groups:
+#   "All Students", "All Parents", "All Teachers", "All Staff"
+#   "class:<class name>"                   students enrolled in the class (a bare class name also works)
+#   "level:<PRIMARY|JHS|SHS|UNIVERSITY>"   students taking a course of the level
+#   "fees:outstanding" / "fees:paid"       students with / without a fee balance left
+# Prefix a student group with "parents:" (e.g. "parents:class:Form 1A") to reach their parents instead.
+GROUPS = {
+    'All Students': (Student, 'students'),
+    'All Parents': (Parent, 'parents'),
+    'All Teachers': (Staff, 'staff'),
+    'All Staff': (Staff, 'staff'),
+}
+
+# Contact column per audience and channel
+CONTACT_COLUMNS = {
+    'students': {'email': 'user__email', 'sms': 'phone_number'},
+    'parents': {'email': 'user__email', 'sms': 'phone_number'},
+    'staff': {'email': 'user__email', 'sms': 'phone_number'},
+    # Parents reached through a Student queryset
+    'students_parents': {'email': 'parent__user__email', 'sms': 'parent__phone_number'},
+}
+
+FEE_STATUSES = ('outstanding', 'paid')
+
+MONEY = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def fee_balance():
+    """A student's total fees minus their completed payments, as correlated subqueries."""
+    fees = (
+        Fee.objects.filter(student=OuterRef('pk')).order_by()
+        .values('student').annotate(total=Sum('amount')).values('total')
+    )
+    paid = (
+        Payment.objects.filter(fee__student=OuterRef('pk'), status='Completed').order_by()
+        .values('fee__student').annotate(total=Sum('amount_paid')).values('total')
+    )
+    return Coalesce(Subquery(fees), Value(0), output_field=MONEY) - Coalesce(Subquery(paid), Value(0), output_field=MONEY)
+
+
+def parse_recipient_group(group):
+    """
+    Returns the (queryset, audience) a recipient group resolves to, or raises a
+    ValidationError for an unknown level or fee status.
+    """
+    if group in GROUPS:
+        model_class, audience = GROUPS[group]
+        queryset = model_class.objects.all()
+        if group == 'All Teachers':
+            queryset = queryset.filter(user__role=User.Role.TEACHER)
+        return queryset, audience
+
+    audience = 'students'
+    if group.startswith('parents:'):
+        audience = 'students_parents'
+        group = group[len('parents:'):]
+    kind, _, value = group.partition(':')
+
+    if kind == 'level':
+        if value not in GradingScale.Level.values:
+            raise serializers.ValidationError(f"Unknown level: {value}.")
+        queryset = Student.objects.filter(enrollments__course__level=value)
+    elif kind == 'fees':
+        if value not in FEE_STATUSES:
+            raise serializers.ValidationError(f"Unknown fee status: {value}. Use one of {', '.join(FEE_STATUSES)}.")
+        queryset = Student.objects.filter(fees__isnull=False).annotate(balance=fee_balance())
+        queryset = queryset.filter(balance__gt=0) if value == 'outstanding' else queryset.filter(balance__lte=0)
+    elif kind == 'class':
+        queryset = Student.objects.filter(enrollments__class_enrolled__name=value)
+    else:
+        # A bare class name
+        queryset = Student.objects.filter(enrollments__class_enrolled__name=group)
+    return queryset, audience
+
+
+def parse_custom_recipients(custom_recipients, channel):
+    """Returns the custom recipients that look like addresses of the channel, in order and without duplicates."""
+    recipients = []
+    for recipient in (custom_recipients or '').replace('\n', ',').split(','):
+        recipient = recipient.strip()
+        if channel == 'sms' and recipient.startswith('+'):  # Basic check for phone numbers
+            recipients.append(recipient)
+        elif channel == 'email' and '@' in recipient:  # Basic check for email
+            recipients.append(recipient)
+    return list(dict.fromkeys(recipients))
+
+
+def group_contacts(recipient_group, channel):
+    """The distinct, non-empty contact values of a recipient group, as a values_list queryset."""
+    queryset, audience = parse_recipient_group(recipient_group)
+    column = CONTACT_COLUMNS[audience][channel]
+    return (
+        queryset.exclude(**{f'{column}__isnull': True}).exclude(**{column: ''})
+        .order_by(column).values_list(column, flat=True).distinct()
+    )
+
+
+def count_recipients(recipient_group, custom_recipients=None, channel='email'):
+    """Counts the recipients with one COUNT query; custom recipients who are also in the group count twice."""
+    total = len(parse_custom_recipients(custom_recipients, channel))
+    if recipient_group:
+        total += group_contacts(recipient_group, channel).count()
+    return total
+
+
+def iter_recipients(recipient_group, custom_recipients=None, channel='email', chunk_size=2000):
+    """
+    Yields every distinct email address or phone number ('email' or 'sms' channel) of a
+    recipient group and the custom recipients.
+
+    Only the contact column is read, with the joins it needs; the database removes empty
+    values and duplicates, and rows are streamed with .iterator(), so memory stays flat
+    however large the group is. Only the custom recipients are held in memory.
+    """
+    custom = parse_custom_recipients(custom_recipients, channel)
+    yield from custom
+
+    if not recipient_group:
+        return
+    contacts = group_contacts(recipient_group, channel)
+    seen = set(custom)
+    for contact in contacts.iterator(chunk_size=chunk_size):
+        if contact not in seen:
+            yield contact
+
+
+def recipient_chunks(recipient_group, custom_recipients=None, channel='email', chunk_size=None):
+    """Groups iter_recipients into lists of RECIPIENT_CHUNK_SIZE, one per task."""
+    chunk_size = chunk_size or getattr(settings, 'RECIPIENT_CHUNK_SIZE', 500)
+    chunk = []
+    for recipient in iter_recipients(recipient_group, custom_recipients, channel):
+        chunk.append(recipient)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
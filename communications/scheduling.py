@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.utils import timezone
+from .models import BulkMessage
+
+
+def is_scheduled(bulk_message):
+    """True when the message is due later, so it waits for the dispatcher instead of going out now."""
+    return bool(bulk_message.scheduled_time and bulk_message.scheduled_time > timezone.now())
+
+
+def due_bulk_message_ids(limit=100):
+    """Ids of the Pending messages that are due, oldest scheduled time first (served by the (status, scheduled_time) index)."""
+    return list(
+        BulkMessage.objects.filter(status='Pending', scheduled_time__lte=timezone.now())
+        .order_by('scheduled_time').values_list('pk', flat=True)[:limit]
+    )
+
+
+def claim_bulk_message(bulk_message_id):
+    """
+    Moves a Pending message to Queued and returns True, or returns False when it was already
+    released or cancelled, so each message is dispatched exactly once.
+    """
+    return BulkMessage.objects.filter(pk=bulk_message_id, status='Pending').update(status='Queued') == 1
+
+
+def cancel_bulk_message(bulk_message_id):
+    """Cancels a message that has not been released yet; returns False once it has."""
+    return BulkMessage.objects.filter(pk=bulk_message_id, status='Pending').update(status='Cancelled') == 1
+
+
+def send_window(total):
+    """
+    Seconds to spread a send of `total` recipients over: BULK_MESSAGE_SEND_WINDOW for sends
+    of at least BULK_MESSAGE_SPREAD_THRESHOLD recipients, otherwise 0 (send at once).
+    """
+    if total < getattr(settings, 'BULK_MESSAGE_SPREAD_THRESHOLD', 1000):
+        return 0
+    return getattr(settings, 'BULK_MESSAGE_SEND_WINDOW', 10 * 60)
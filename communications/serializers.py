@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import BulkMessage, Message
+from .models import BulkMessage, DeliveryLog, Message
+from .recipients import parse_recipient_group
 from users.serializers import UserSerializer
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -30,5 +31,20 @@ class BulkMessageSerializer(serializers.ModelSerializer):
             'status',
             'scheduled_time',
             'sent_time',
+            'total_recipients',
+            'sent_count',
+            'failed_count',
+            'pending_count',
         ]
-        read_only_fields = ['status', 'sent_time']
\ No newline at end of file
+        read_only_fields = ['status', 'sent_time', 'total_recipients', 'sent_count', 'failed_count', 'pending_count']
+
+    def validate_recipient_group(self, value):
+        # Raises for an unknown level or fee status
+        parse_recipient_group(value)
+        return value
+
+
+class DeliveryLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeliveryLog
+        fields = ['id', 'recipient', 'status', 'provider_id', 'attempts', 'error', 'updated_at']
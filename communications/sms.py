@@ -0,0 +1,140 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+def sms_setting(name, default):
+    return getattr(settings, name, None) or default
+
+
+RATE_KEY = 'sms:bucket:{}:{}'
+
+# Refills the bucket for the time since the last call, then takes the messages. The bucket
+# may go into debt: the caller is told how long to wait for its messages to be refilled,
+# so concurrent senders queue up in arrival order instead of retrying.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * refill) - tonumber(ARGV[3])
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / refill) + 1)
+return tostring(math.max(-tokens, 0) / refill)
+"""
+
+
+class RateLimiter:
+    """
+    Holds SMS sending to `rate` messages per `per` seconds across every process and worker
+    with a token bucket in Redis. The bucket holds up to `capacity` messages and refills
+    continuously at rate / per, so there are no window boundaries at which twice the rate
+    can go out. acquire() takes its messages in one atomic script call and sleeps until
+    the bucket has refilled enough to cover them.
+    """
+
+    def __init__(self, rate, per=60):
+        self.rate = rate
+        self.per = per
+        self.capacity = rate
+        self.script = None
+
+    def acquire(self, messages=1):
+        if messages > self.capacity:
+            raise ValueError(f"Cannot take {messages} messages at once; the bucket holds {self.capacity}.")
+        if self.script is None:
+            self.script = get_redis_connection('default').register_script(TOKEN_BUCKET_SCRIPT)
+        wait = float(self.script(keys=[RATE_KEY.format(self.rate, self.per)], args=[self.capacity, self.rate / self.per, messages]))
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ArkeselClient:
+    """Sends SMS through Arkesel's v2 API over one pooled, keep-alive requests.Session."""
+
+    def __init__(self, api_key, sender_id, url=None, pool_size=10, timeout=30):
+        self.sender_id = sender_id
+        self.url = url or sms_setting('ARKESEL_SMS_URL', 'https://sms.arkesel.com/v2/sms/send')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['api-key'] = api_key
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, message, recipients):
+        """
+        Sends one message to many recipients in a single request. Returns (None, {recipient:
+        provider message id}) on success, or (the error, {}).
+        """
+        payload = {
+            'sender': self.sender_id,
+            'message': message,
+            'recipients': list(recipients),
+        }
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            if data['status'] != 'success':
+                return str(data), {}
+        except requests.exceptions.RequestException as e:
+            return str(e), {}
+        except (KeyError, ValueError):
+            return "Invalid response format", {}
+        entries = data.get('data') if isinstance(data.get('data'), list) else []
+        return None, {
+            str(entry['recipient']): str(entry['id'])
+            for entry in entries if isinstance(entry, dict) and 'recipient' in entry and 'id' in entry
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def sms_rate_limiter():
+    """Returns the limiter shared by every SMS sender: SMS_RATE_LIMIT messages per minute."""
+    return RateLimiter(sms_setting('SMS_RATE_LIMIT', 100))
+
+
+def send_bulk_sms(api_key, sender_id, message_body, recipients, batch_size=None, workers=None, url=None, limiter=None):
+    """
+    Sends a message to every recipient and returns {'sent': count, 'failed': {recipient: error},
+    'provider_ids': {recipient: provider message id}}.
+
+    Recipients are deduplicated and packed SMS_BATCH_SIZE to a request. Up to SMS_WORKERS
+    requests run concurrently over one connection pool, and the shared rate limiter holds
+    every sender together to SMS_RATE_LIMIT messages per minute; a request for n recipients
+    counts as n messages.
+    """
+    limiter = limiter or sms_rate_limiter()
+    # A batch can never be larger than one window allows
+    batch_size = min(batch_size or sms_setting('SMS_BATCH_SIZE', 100), int(limiter.capacity))
+    workers = workers or sms_setting('SMS_WORKERS', 4)
+
+    recipients = list(dict.fromkeys(recipient for recipient in recipients if recipient))
+    batches = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+    client = ArkeselClient(api_key, sender_id, url=url, pool_size=workers)
+
+    def send_batch(batch):
+        limiter.acquire(len(batch))
+        return batch, client.send(message_body, batch)
+
+    result = {'sent': 0, 'failed': {}, 'provider_ids': {}}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch, (error, provider_ids) in executor.map(send_batch, batches):
+                if error:
+                    result['failed'].update(dict.fromkeys(batch, error))
+                else:
+                    result['sent'] += len(batch)
+                    result['provider_ids'].update(provider_ids)
+    finally:
+        client.close()
+    return result
@@ -1,3 +1,77 @@
 from django.test import TestCase
+from users.models import User
+from .delivery import create_delivery_logs, finish_bulk_message, record_deliveries
+from .models import BulkMessage, DeliveryLog
 
-# Create your tests here.
+
+class DeliveryCounterTests(TestCase):
+    def setUp(self):
+        sender = User.objects.create_user(username='admin', password='password', role=User.Role.ADMIN)
+        self.message = BulkMessage.objects.create(
+            sender=sender, recipient_group='Custom', subject='Term dates', message_body='School reopens on Monday.',
+            delivery_method=BulkMessage.DeliveryMethod.SMS, status='Sending',
+        )
+
+    def counters(self):
+        self.message.refresh_from_db()
+        return {
+            'total': self.message.total_recipients, 'sent': self.message.sent_count,
+            'failed': self.message.failed_count, 'pending': self.message.pending_count,
+        }
+
+    def test_create_delivery_logs_skips_recipients_already_logged(self):
+        self.assertEqual(create_delivery_logs(self.message.pk, ['0201', '0202', '0202']), ['0201', '0202'])
+        self.assertEqual(create_delivery_logs(self.message.pk, ['0202', '0203']), ['0203'])
+        self.assertEqual(create_delivery_logs(self.message.pk, ['0201']), [])
+
+        self.assertEqual(DeliveryLog.objects.filter(bulk_message=self.message).count(), 3)
+        self.assertEqual(self.counters(), {'total': 3, 'sent': 0, 'failed': 0, 'pending': 3})
+
+    def test_record_deliveries_moves_the_counters(self):
+        create_delivery_logs(self.message.pk, ['0201', '0202', '0203'])
+
+        record_deliveries(self.message.pk, {'0201': None, '0202': 'Invalid number', '0203': 'Timeout'}, provider_ids={'0201': 'abc'}, retrying=['0203'])
+
+        self.assertEqual(self.counters(), {'total': 3, 'sent': 1, 'failed': 1, 'pending': 1})
+        logs = {log.recipient: log for log in DeliveryLog.objects.filter(bulk_message=self.message)}
+        self.assertEqual((logs['0201'].status, logs['0201'].provider_id, logs['0201'].attempts), ('Sent', 'abc', 1))
+        self.assertEqual((logs['0202'].status, logs['0202'].error), ('Failed', 'Invalid number'))
+        self.assertEqual((logs['0203'].status, logs['0203'].error), ('Pending', 'Timeout'))
+        self.assertEqual(self.message.status, 'Sending')
+
+    def test_recording_an_attempt_twice_counts_it_once(self):
+        create_delivery_logs(self.message.pk, ['0201', '0202'])
+        record_deliveries(self.message.pk, {'0201': None})
+
+        record_deliveries(self.message.pk, {'0201': None})
+
+        self.assertEqual(self.counters(), {'total': 2, 'sent': 1, 'failed': 0, 'pending': 1})
+
+    def test_the_last_delivery_finishes_the_message(self):
+        create_delivery_logs(self.message.pk, ['0201', '0202'])
+        record_deliveries(self.message.pk, {'0201': 'Timeout', '0202': None}, retrying=['0201'])
+
+        record_deliveries(self.message.pk, {'0201': None})
+
+        self.assertEqual(self.counters(), {'total': 2, 'sent': 2, 'failed': 0, 'pending': 0})
+        self.assertEqual(self.message.status, 'Sent')
+        self.assertIsNotNone(self.message.sent_time)
+
+    def test_a_message_no_one_received_fails(self):
+        create_delivery_logs(self.message.pk, ['0201', '0202'])
+
+        record_deliveries(self.message.pk, {'0201': 'Invalid number', '0202': 'Invalid number'})
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, 'Failed')
+
+    def test_finish_waits_for_dispatch_and_pending_recipients(self):
+        create_delivery_logs(self.message.pk, ['0201'])
+        finish_bulk_message(self.message.pk)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, 'Sending')
+
+        BulkMessage.objects.filter(pk=self.message.pk).update(status='Queued', pending_count=0, sent_count=1)
+        finish_bulk_message(self.message.pk)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, 'Queued')
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import BulkMessageListCreateView, BulkMessageRetrieveUpdateDestroyView, MessageListCreateView, MessageRetrieveUpdateDestroyView
+from .views import BulkMessageCancelView, BulkMessageListCreateView, BulkMessageRetrieveUpdateDestroyView, DeliveryLogListView, MessageListCreateView, MessageRetrieveUpdateDestroyView
 
 urlpatterns = [
     path('messages/', MessageListCreateView.as_view(), name='message-list-create'),
     path('messages/<int:pk>/', MessageRetrieveUpdateDestroyView.as_view(), name='message-retrieve-update-destroy'),
      path('bulk-messages/', BulkMessageListCreateView.as_view(), name='bulk-message-list-create'),
     path('bulk-messages/<int:pk>/', BulkMessageRetrieveUpdateDestroyView.as_view(), name='bulk-message-retrieve-update-destroy'),
+    path('bulk-messages/<int:pk>/deliveries/', DeliveryLogListView.as_view(), name='bulk-message-deliveries'),
+    path('bulk-messages/<int:pk>/cancel/', BulkMessageCancelView.as_view(), name='bulk-message-cancel'),
 ]
\ No newline at end of file
@@ -1,20 +1,22 @@
 from datetime import timezone
 import requests
-from rest_framework import generics, permissions
-from django.conf import settings
-from ESchoolSuite.tasks import send_bulk_email_task, send_bulk_sms_task
-from academics.models import Class
-from staff.models import Staff
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ESchoolSuite.tasks import dispatch_bulk_message_task, release_scheduled_messages_task
+from academics.scope import get_user_scope
 from students.models import Student
-from .models import BulkMessage, Message
-from .serializers import BulkMessageSerializer, MessageSerializer
-from users.models import Parent, User
+from .models import BulkMessage, DeliveryLog, Message
+from .scheduling import cancel_bulk_message, claim_bulk_message, is_scheduled
+from .serializers import BulkMessageSerializer, DeliveryLogSerializer, MessageSerializer
+from users.models import User
 from users.permissions import IsAdmin, IsParent, IsTeacher
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from rest_framework import serializers
 from django.core.mail import send_mail
-from django.db import models
+from django.db import models, transaction
 
 class MessageListCreateView(generics.ListCreateAPIView):
     serializer_class = MessageSerializer
@@ -25,10 +27,9 @@ class MessageListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        if user.role == User.Role.TEACHER:
-            return Message.objects.filter(models.Q(sender=user) | models.Q(recipient=user, student__in=user.staff_profile.classes_taught.all().values_list('enrollments__student', flat=True)))
-        elif user.role == User.Role.PARENT:
-            return Message.objects.filter(models.Q(sender=user) | models.Q(recipient=user, student__in=user.parent_profile.children.all()))
+        if user.role in (User.Role.TEACHER, User.Role.PARENT):
+            # Teachers see messages about students in their classes, parents about their children
+            return Message.objects.filter(models.Q(sender=user) | models.Q(recipient=user, student_id__in=get_user_scope(user).student_ids))
         else:
             return Message.objects.none()
 
@@ -46,7 +47,7 @@ class MessageListCreateView(generics.ListCreateAPIView):
         # Check if the current user is a teacher and the recipient is a parent of a student in their class
         user = self.request.user
         if user.role == User.Role.TEACHER:
-            if not student or not recipient.parent_profile.children.filter(id=student.id).exists():
+            if not student or student.id not in get_user_scope(user).student_ids or not student.parent or student.parent.user_id != recipient.id:
                 raise serializers.ValidationError("You can only send messages to parents of students in your class.")
             serializer.save(sender=user, recipient=recipient, student=student)
         elif user.role == User.Role.PARENT:
@@ -54,7 +55,7 @@ class MessageListCreateView(generics.ListCreateAPIView):
             if recipient.role != User.Role.TEACHER:
                 raise serializers.ValidationError("Parents can only send messages to teachers.")
             # Check if the student belongs to the parent
-            if not user.parent_profile.children.filter(id=student.id).exists():
+            if not student or student.id not in get_user_scope(user).student_ids:
                 raise serializers.ValidationError("You can only send messages regarding your own children.")
             serializer.save(sender=user, recipient=recipient, student=student)
         else:
@@ -67,10 +68,9 @@ class MessageRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        if user.role == User.Role.TEACHER:
-            return Message.objects.filter(models.Q(sender=user) | models.Q(recipient=user, student__in=user.staff_profile.classes_taught.all().values_list('enrollments__student', flat=True)))
-        elif user.role == User.Role.PARENT:
-            return Message.objects.filter(models.Q(sender=user) | models.Q(recipient=user, student__in=user.parent_profile.children.all()))
+        if user.role in (User.Role.TEACHER, User.Role.PARENT):
+            # Teachers see messages about students in their classes, parents about their children
+            return Message.objects.filter(models.Q(sender=user) | models.Q(recipient=user, student_id__in=get_user_scope(user).student_ids))
         else:
             return Message.objects.none()
 
@@ -94,84 +94,38 @@ class BulkMessageListCreateView(generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         bulk_message = serializer.save(sender=self.request.user)
-        if bulk_message.delivery_method == BulkMessage.DeliveryMethod.EMAIL:
-            recipient_list = self.get_recipients(bulk_message.recipient_group, bulk_message.custom_recipients)
-            if recipient_list:
-                send_bulk_email_task.delay(
-                    bulk_message.subject,
-                    bulk_message.message_body,
-                    settings.DEFAULT_FROM_EMAIL,
-                    recipient_list,
-                )
-            else:
-                bulk_message.status = 'Failed'
-                bulk_message.save()
-        elif bulk_message.delivery_method == BulkMessage.DeliveryMethod.SMS:
-            recipients = self.get_recipients(bulk_message.recipient_group, bulk_message.custom_recipients, as_phone_numbers=True)
-            if recipients:
-                send_bulk_sms_task.delay(
-                    settings.ARKESEL_API_KEY,
-                    settings.ARKESEL_SENDER_ID,
-                    bulk_message.message_body,
-                    recipients,
-                )
-            else:
-                bulk_message.status = 'Failed'
-                bulk_message.save()
-
-    def get_recipients(self, recipient_group, custom_recipients=None, as_phone_numbers=False):
-        recipients = []
-
-        if recipient_group:
-            # Existing logic to get recipients based on group
-            if recipient_group == 'All Students':
-                if as_phone_numbers:
-                    recipients.extend([student.phone_number for student in Student.objects.all() if student.phone_number])
-                else:
-                    recipients.extend([student.user.email for student in Student.objects.all() if student.user.email])
-            elif recipient_group == 'All Parents':
-                if as_phone_numbers:
-                    recipients.extend([parent.phone_number for parent in Parent.objects.all() if parent.phone_number])
-                else:
-                    recipients.extend([parent.user.email for parent in Parent.objects.all() if parent.user.email])
-            elif recipient_group == 'All Teachers':
-                if as_phone_numbers:
-                    recipients.extend([staff.phone_number for staff in Staff.objects.filter(user__role=User.Role.TEACHER) if staff.phone_number])
-                else:
-                    recipients.extend([staff.user.email for staff in Staff.objects.filter(user__role=User.Role.TEACHER) if staff.user.email])
-            elif recipient_group == 'All Staff':
-                if as_phone_numbers:
-                    recipients.extend([staff.phone_number for staff in Staff.objects.all() if staff.phone_number])
-                else:
-                    recipients.extend([staff.user.email for staff in Staff.objects.all() if staff.user.email])
-            else:
-                # Handle filtering by class
-                try:
-                    class_obj = Class.objects.get(name=recipient_group)
-                    students_in_class = Student.objects.filter(enrollments__class_enrolled=class_obj).distinct()
-
-                    if as_phone_numbers:
-                        recipients.extend([student.phone_number for student in students_in_class if student.phone_number])
-                    else:
-                        recipients.extend([student.user.email for student in students_in_class if student.user.email])
-
-                except Class.DoesNotExist:
-                    return []
-
-        if custom_recipients:
-            # Handle custom recipients
-            custom_recipients_list = custom_recipients.replace('\n', ',').split(',')
-            for recipient in custom_recipients_list:
-                recipient = recipient.strip()
-                if recipient:  # Add only if not empty
-                    if as_phone_numbers and recipient.startswith("+"):  # Basic check for phone numbers
-                        recipients.append(recipient)
-                    elif '@' in recipient:  # Basic check for email
-                        recipients.append(recipient)
-
-        return list(set(recipients))  # Remove duplicates
+        if is_scheduled(bulk_message):
+            # Released at scheduled_time; the periodic sweep also catches it if the ETA task is lost
+            transaction.on_commit(lambda: release_scheduled_messages_task.apply_async(eta=bulk_message.scheduled_time))
+        else:
+            # Recipients are resolved and streamed to the senders by the task, not held in the request
+            claim_bulk_message(bulk_message.pk)
+            transaction.on_commit(lambda: dispatch_bulk_message_task.delay(bulk_message.pk))
 
 class BulkMessageRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = BulkMessage.objects.all()
     serializer_class = BulkMessageSerializer
-    permission_classes = [IsAdmin]
\ No newline at end of file
+    permission_classes = [IsAdmin]
+
+class BulkMessageCancelView(APIView):
+    permission_classes = [IsAdmin]
+
+    def post(self, request, pk):
+        """Cancels a bulk message that has not been released yet."""
+        bulk_message = get_object_or_404(BulkMessage, pk=pk)
+        if not cancel_bulk_message(bulk_message.pk):
+            bulk_message.refresh_from_db()
+            return Response({"error": f"The message is already {bulk_message.status.lower()} and can no longer be cancelled."}, status=status.HTTP_400_BAD_REQUEST)
+        bulk_message.refresh_from_db()
+        return Response(BulkMessageSerializer(bulk_message).data)
+
+class DeliveryLogListView(generics.ListAPIView):
+    """Per-recipient delivery status of a bulk message; filter with ?status=Failed."""
+    serializer_class = DeliveryLogSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = ['status']
+    search_fields = ['recipient']
+
+    def get_queryset(self):
+        return DeliveryLog.objects.filter(bulk_message_id=self.kwargs['pk']).order_by('id')
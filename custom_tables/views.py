@@ -1,9 +1,9 @@
 from django.shortcuts import render
-import requests
 from rest_framework import generics
 from .models import CustomTable, CustomField
 from .serializers import CustomTableSerializer, CustomFieldSerializer
 from users.permissions import IsAdmin
+from ESchoolSuite.pages import check_page_permissions
 from django.apps import apps
 from django.http import JsonResponse, HttpResponseNotFound, HttpResponse
 from django.db import connection
@@ -174,22 +174,19 @@ def custom_table_data_detail(request, table_name, pk):
 
 
 def custom_tables_list(request):
-    response = requests.get('http://127.0.0.1:8000/api/custom-tables/tables/')  # Replace with your API endpoint URL
-    custom_tables = response.json() if response.status_code == 200 else []
+    check_page_permissions(request, CustomTableListCreateView.permission_classes)
+    custom_tables = CustomTableSerializer(CustomTable.objects.prefetch_related('fields'), many=True).data
     return render(request, 'custom_tables/custom_table_list.html', {'custom_tables': custom_tables})
 
 def custom_table_form(request):
       return render(request, 'custom_tables/custom_table_form.html')
 
 def custom_table_detail(request, pk):
-    response = requests.get(f'http://127.0.0.1:8000/api/custom-tables/tables/{pk}/')
-    custom_table = response.json() if response.status_code == 200 else None
-
-    if custom_table:
-        fields_response = requests.get(f'http://127.0.0.1:8000/api/custom-tables/fields/?table={custom_table["id"]}')
-        fields = fields_response.json() if fields_response.status_code == 200 else []
-    else:
-        fields = []
+    check_page_permissions(request, CustomTableRetrieveUpdateDestroyView.permission_classes)
+    table = CustomTable.objects.prefetch_related('fields').filter(pk=pk).first()
+    custom_table = CustomTableSerializer(table).data if table else None
+    # The serializer nests the table's own fields
+    fields = custom_table['fields'] if custom_table else []
 
     return render(request, 'custom_tables/custom_table_detail.html', {'custom_table': custom_table, 'fields': fields})
 
@@ -0,0 +1,70 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from academics.models import Enrollment
+from fees.models import Fee, Payment
+from staff.models import Staff
+from students.models import Student
+from .snapshot import bump_dashboard_counters, to_cents
+
+
+COUNTED_MODELS = {Student: 'students', Staff: 'staff', Enrollment: 'enrollments'}
+
+
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        bump_dashboard_counters(**{COUNTED_MODELS[sender]: 1})
+
+
+def count_deleted(sender, instance, **kwargs):
+    bump_dashboard_counters(**{COUNTED_MODELS[sender]: -1})
+
+
+for model_class in COUNTED_MODELS:
+    post_save.connect(count_created, sender=model_class, dispatch_uid=f'dashboard-count-save-{model_class._meta.label}')
+    post_delete.connect(count_deleted, sender=model_class, dispatch_uid=f'dashboard-count-delete-{model_class._meta.label}')
+
+
+def payment_totals(amount_paid, status):
+    """Returns the (payments, completed payments) cents a payment contributes."""
+    cents = to_cents(amount_paid)
+    return cents, cents if status == 'Completed' else 0
+
+
+@receiver(pre_save, sender=Fee)
+def remember_fee_amount(sender, instance, **kwargs):
+    # Keep the amount the fee was counted with so an edit can move the total
+    instance._previous_amount = None
+    if instance.pk:
+        instance._previous_amount = Fee.objects.filter(pk=instance.pk).values_list('amount', flat=True).first()
+
+
+@receiver(post_save, sender=Fee)
+def count_fee(sender, instance, created, **kwargs):
+    bump_dashboard_counters(fees_cents=to_cents(instance.amount) - to_cents(getattr(instance, '_previous_amount', None)))
+
+
+@receiver(post_delete, sender=Fee)
+def uncount_fee(sender, instance, **kwargs):
+    bump_dashboard_counters(fees_cents=-to_cents(instance.amount))
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_totals(sender, instance, **kwargs):
+    instance._previous_payment_totals = (0, 0)
+    if instance.pk:
+        previous = Payment.objects.filter(pk=instance.pk).values_list('amount_paid', 'status').first()
+        if previous:
+            instance._previous_payment_totals = payment_totals(*previous)
+
+
+@receiver(post_save, sender=Payment)
+def count_payment(sender, instance, created, **kwargs):
+    payments, completed = payment_totals(instance.amount_paid, instance.status)
+    previous_payments, previous_completed = getattr(instance, '_previous_payment_totals', (0, 0))
+    bump_dashboard_counters(payments_cents=payments - previous_payments, completed_payments_cents=completed - previous_completed)
+
+
+@receiver(post_delete, sender=Payment)
+def uncount_payment(sender, instance, **kwargs):
+    payments, completed = payment_totals(instance.amount_paid, instance.status)
+    bump_dashboard_counters(payments_cents=-payments, completed_payments_cents=-completed)
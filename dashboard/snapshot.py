@@ -0,0 +1,134 @@
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, F, Func, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from academics.models import Attendance, AttendanceRollup, Enrollment
+from fees.models import Fee, Payment
+from staff.models import Staff
+from students.models import Student
+
+
+SNAPSHOT_KEY = 'dashboard:snapshot'
+GENERATION_KEY = 'dashboard:generation'
+REFRESH_LOCK_KEY = 'dashboard:refreshing'
+DELTA_KEY = 'dashboard:delta:{}:{}'
+
+# Raw snapshot counters; money is kept in cents so signals can bump it with atomic integer increments
+COUNTERS = (
+    'students', 'staff', 'enrollments', 'fees_cents', 'payments_cents', 'completed_payments_cents',
+    'attendance_total', 'attendance_present',
+)
+
+COUNT = models.IntegerField()
+MONEY = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def snapshot_max_age():
+    return getattr(settings, 'DASHBOARD_SNAPSHOT_MAX_AGE', 5 * 60)
+
+
+def to_cents(amount):
+    return int(round(Decimal(str(amount or 0)) * 100))
+
+
+class TableTotal(Subquery):
+    """
+    COUNT or SUM of a field over a whole queryset, as an uncorrelated scalar subquery. It is
+    a single value however many rows the outer query reads, so it may be selected alongside
+    that query's aggregates.
+    """
+    contains_aggregate = True
+
+    def __init__(self, queryset, function, field='pk', output_field=COUNT):
+        total = Coalesce(Func(F(field), function=function, output_field=output_field), Value(0), output_field=output_field)
+        super().__init__(queryset.order_by().annotate(total=total).values('total'), output_field=output_field)
+
+
+def compute_counters():
+    """Reads every dashboard counter from the database in one aggregate query over the students."""
+    totals = Student.objects.aggregate(
+        students=Count('pk'),
+        staff=TableTotal(Staff.objects.all(), 'COUNT'),
+        enrollments=TableTotal(Enrollment.objects.all(), 'COUNT'),
+        fees=TableTotal(Fee.objects.all(), 'SUM', 'amount', MONEY),
+        payments=TableTotal(Payment.objects.all(), 'SUM', 'amount_paid', MONEY),
+        completed_payments=TableTotal(Payment.objects.filter(status='Completed'), 'SUM', 'amount_paid', MONEY),
+        attendance_total=TableTotal(AttendanceRollup.objects.all(), 'SUM', 'count'),
+        attendance_present=TableTotal(AttendanceRollup.objects.filter(status=Attendance.AttendanceStatus.PRESENT), 'SUM', 'count'),
+    )
+    return {
+        'students': totals['students'],
+        'staff': totals['staff'],
+        'enrollments': totals['enrollments'],
+        'fees_cents': to_cents(totals['fees']),
+        'payments_cents': to_cents(totals['payments']),
+        'completed_payments_cents': to_cents(totals['completed_payments']),
+        'attendance_total': totals['attendance_total'],
+        'attendance_present': totals['attendance_present'],
+    }
+
+
+def refresh_dashboard_snapshot():
+    """
+    Recomputes the snapshot and starts a new counter generation, so signal deltas recorded
+    against the previous snapshot no longer apply; their keys are deleted.
+    """
+    previous_generation = cache.get(GENERATION_KEY)
+    snapshot = {
+        'counters': compute_counters(),
+        'generation': time.time_ns(),
+        'computed_at': timezone.now().isoformat(),
+        'computed_ts': time.time(),
+    }
+    cache.set_many({GENERATION_KEY: snapshot['generation'], SNAPSHOT_KEY: snapshot}, timeout=None)
+    cache.delete(REFRESH_LOCK_KEY)
+    if previous_generation is not None:
+        cache.delete_many([DELTA_KEY.format(previous_generation, counter) for counter in COUNTERS])
+    return snapshot
+
+
+def bump_dashboard_counters(**deltas):
+    """
+    Adds {counter: delta} to the current snapshot once the transaction commits. Does
+    nothing before the first snapshot exists.
+    """
+    deltas = {counter: delta for counter, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    def bump():
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            return
+        for counter, delta in deltas.items():
+            key = DELTA_KEY.format(generation, counter)
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, delta)
+
+    transaction.on_commit(bump)
+
+
+def get_dashboard_snapshot():
+    """
+    Returns the dashboard counters in constant time: the cached snapshot plus the deltas
+    signals recorded since it was computed.
+
+    Stale-while-revalidate: a snapshot older than DASHBOARD_SNAPSHOT_MAX_AGE is still
+    served while one background task recomputes it. Only the very first call computes
+    the snapshot inline.
+    """
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = refresh_dashboard_snapshot()
+    elif time.time() - snapshot['computed_ts'] > snapshot_max_age() and cache.add(REFRESH_LOCK_KEY, True, timeout=snapshot_max_age()):
+        from ESchoolSuite.tasks import refresh_dashboard_snapshot_task
+        refresh_dashboard_snapshot_task.delay()
+
+    keys = {counter: DELTA_KEY.format(snapshot['generation'], counter) for counter in COUNTERS}
+    deltas = cache.get_many(list(keys.values()))
+    counters = {counter: value + deltas.get(keys[counter], 0) for counter, value in snapshot['counters'].items()}
+    return counters, snapshot['computed_at']
@@ -1,3 +1,103 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from academics.enrollment import bulk_enroll
+from academics.models import Class, Course, Enrollment
+from fees.models import Fee, Payment
+from staff.models import Staff
+from students.models import Student
+from users.models import User
+from .snapshot import DELTA_KEY, GENERATION_KEY, compute_counters, get_dashboard_snapshot, refresh_dashboard_snapshot
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_student(number):
+    user = User.objects.create_user(username=f'student{number}', password='password', role=User.Role.STUDENT)
+    return Student.objects.create(
+        user=user, student_id=f'S{number:04d}', first_name='Student', last_name=str(number),
+        date_of_birth=date(2010, 1, 1), gender='Female', address='1 School Road', city='Accra',
+        region='Greater Accra', email=f'student{number}@example.com', admission_number=f'A{number:04d}',
+        admission_date=date(2024, 9, 1), emergency_contact_name='Guardian',
+        emergency_contact_phone='+233200000000', emergency_contact_relationship='Parent',
+    )
+
+
+def make_staff(number):
+    user = User.objects.create_user(username=f'staff{number}', password='password', role=User.Role.TEACHER)
+    return Staff.objects.create(
+        user=user, staff_id=f'T{number:04d}', first_name='Staff', last_name=str(number),
+        date_of_birth=date(1985, 1, 1), gender='Male', address='2 School Road', city='Accra',
+        region='Greater Accra', email=f'staff{number}@example.com', phone_number='+233200000001',
+        qualification='B.Ed', date_joined=date(2020, 9, 1),
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = [make_student(number) for number in range(3)]
+        make_staff(0)
+        self.fee = Fee.objects.create(student=self.students[0], name='Tuition Fee', amount=Decimal('150.50'), due_date=date(2024, 10, 1))
+
+    def counters(self):
+        return get_dashboard_snapshot()[0]
+
+    def test_counters_are_read_in_one_query(self):
+        Payment.objects.create(fee=self.fee, amount_paid=Decimal('50.25'), payment_date=date(2024, 9, 15), status='Completed')
+        Payment.objects.create(fee=self.fee, amount_paid=Decimal('20'), payment_date=date(2024, 9, 16))
+
+        with self.assertNumQueries(1):
+            counters = compute_counters()
+
+        self.assertEqual(counters, {
+            'students': 3, 'staff': 1, 'enrollments': 0, 'fees_cents': 15050, 'payments_cents': 7025,
+            'completed_payments_cents': 5025, 'attendance_total': 0, 'attendance_present': 0,
+        })
+
+    def test_signal_deltas_keep_the_snapshot_current(self):
+        refresh_dashboard_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_student(10)
+            make_staff(1)
+            self.fee.amount = Decimal('200')
+            self.fee.save()
+            payment = Payment.objects.create(fee=self.fee, amount_paid=Decimal('80'), payment_date=date(2024, 9, 15))
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.status = 'Completed'
+            payment.save()
+            self.students[1].delete()
+
+        self.assertEqual(self.counters(), compute_counters())
+
+    def test_bulk_enroll_counts_its_enrollments(self):
+        course = Course.objects.create(name='Course MATH1', code='MATH1')
+        class_obj = Class.objects.create(name='Form 1A', academic_year='2024/2025', max_students=2)
+        refresh_dashboard_snapshot()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_enroll([student.pk for student in self.students], course, class_obj)
+
+        self.assertEqual(Enrollment.objects.count(), 2)
+        self.assertEqual(self.counters()['enrollments'], 2)
+
+    def test_writes_before_the_first_snapshot_are_not_counted_twice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_student(10)
+
+        self.assertEqual(self.counters()['students'], 4)
+
+    def test_a_refresh_drops_the_previous_generations_deltas(self):
+        refresh_dashboard_snapshot()
+        generation = cache.get(GENERATION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_student(10)
+
+        refresh_dashboard_snapshot()
+
+        self.assertNotEqual(cache.get(GENERATION_KEY), generation)
+        self.assertIsNone(cache.get(DELTA_KEY.format(generation, 'students')))
+        self.assertEqual(self.counters()['students'], 4)
@@ -1,57 +1,42 @@
 from django.shortcuts import render
-import requests
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from students.models import Student
-from staff.models import Staff
-from academics.models import Attendance, Enrollment
-from fees.models import Fee, Payment
-from django.db.models import Sum, Count
+from decimal import Decimal
+from .snapshot import get_dashboard_snapshot
 from users.permissions import IsAdmin
-
-
-@api_view(['GET'])
-@permission_classes([IsAdmin])
-def dashboard_data(request):
-    total_students = Student.objects.all().count()
-    total_staff = Staff.objects.all().count()
-    total_enrollments = Enrollment.objects.all().count()
-    total_fees = Fee.objects.all().aggregate(Sum('amount'))['amount__sum'] or 0
-    total_payments = Payment.objects.all().aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    # Calculate the total amount paid by parents
-    total_paid_by_parents = Payment.objects.filter(status='Completed').aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    # Calculate the total outstanding fees
-    total_outstanding_fees = total_fees - total_paid_by_parents if total_fees is not None else 0
-    attendance_rate = calculate_attendance_rate()  # You'll need to implement this function
-
-    data = {
-        'total_students': total_students,
-        'total_staff': total_staff,
-        'total_enrollments': total_enrollments,
+from ESchoolSuite.pages import check_page_permissions
+
+
+def dashboard_summary():
+    """
+    Returns the dashboard metrics and when they were computed; shared by the API and the
+    admin dashboard page. Served from the cached snapshot, so it costs no table scans.
+    """
+    counters, computed_at = get_dashboard_snapshot()
+    total_fees = Decimal(counters['fees_cents']) / 100
+    total_payments = Decimal(counters['payments_cents']) / 100
+    # Outstanding fees are what completed payments have not covered
+    total_paid_by_parents = Decimal(counters['completed_payments_cents']) / 100
+    attendance_total = counters['attendance_total']
+
+    return {
+        'total_students': counters['students'],
+        'total_staff': counters['staff'],
+        'total_enrollments': counters['enrollments'],
         'total_fees': total_fees,
         'total_payments': total_payments,
-        'total_outstanding_fees': total_outstanding_fees,
-        'attendance_rate': attendance_rate,
+        'total_outstanding_fees': total_fees - total_paid_by_parents,
+        'attendance_rate': counters['attendance_present'] / attendance_total * 100 if attendance_total else 0,
+        'computed_at': computed_at,
     }
-    return Response(data)
-
-def calculate_attendance_rate():
-    total_attendance_records = Attendance.objects.all().count()
-    if total_attendance_records == 0:
-        return 0  # Avoid division by zero
-    present_count = Attendance.objects.filter(status='PRESENT').count()
-    return (present_count / total_attendance_records) * 100
-
 
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def dashboard_data(request):
+    return Response(dashboard_summary())
 
 def admin_dashboard(request):
-    # Fetch the data from the dashboard_data API endpoint
-    response = requests.get('http://127.0.0.1:8000/api/dashboard/')  # Replace with your actual API endpoint URL
-    
-    if response.status_code == 200:
-        dashboard_data = response.json()
-    else:
-        dashboard_data = {}
-
-    return render(request, 'dashboard/dashboard.html', {'dashboard_data': dashboard_data})
\ No newline at end of file
+    # Computed in-process with the same permission as the dashboard_data API endpoint
+    check_page_permissions(request, [IsAdmin])
+    return render(request, 'dashboard/dashboard.html', {'dashboard_data': dashboard_summary()})
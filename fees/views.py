@@ -1,5 +1,6 @@
 from rest_framework import generics, permissions, status
 
+from academics.scope import get_user_scope
 from students.models import Student
 from .models import Fee, Payment
 from .serializers import FeeSerializer, PaymentSerializer
@@ -60,8 +61,7 @@ class ParentPaymentHistoryView(generics.ListAPIView):
     search_fields = ['fee__name', 'transaction_id']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
-        return Payment.objects.filter(fee__student__parent=parent)
+        return Payment.objects.filter(fee__student_id__in=get_user_scope(self.request.user).student_ids)
 
 class ParentUnpaidFeesView(generics.ListAPIView):
     serializer_class = FeeSerializer
@@ -71,9 +71,8 @@ class ParentUnpaidFeesView(generics.ListAPIView):
     search_fields = ['name', 'description']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
         student_id = self.kwargs.get('student_id')
-        student = get_object_or_404(Student, id=student_id, parent=parent)
+        student = get_object_or_404(Student.objects.filter(pk__in=get_user_scope(self.request.user).student_ids), id=student_id)
 
         # Get all fees for the student
         fees = Fee.objects.filter(student=student)
@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from academics.models import Enrollment
+from students.models import Student
+from .models import ReportCard, ReportCardBatch
+from .utils import build_report_card_data, render_report_card, report_card_grade_rows, report_card_score_rows, report_card_upload
+
+
+def batch_student_ids(batch):
+    """Returns the ids of the students enrolled in the batch's class (or any class of its academic year)."""
+    enrollments = Enrollment.objects.filter(class_enrolled__academic_year=batch.academic_year)
+    if batch.class_obj_id:
+        enrollments = enrollments.filter(class_enrolled_id=batch.class_obj_id)
+    return sorted(set(enrollments.values_list('student_id', flat=True)))
+
+
+def collect_report_card_data(student_ids, term, academic_year):
+    """Builds the report card data of many students with one student, one grade and one score query."""
+    grades = report_card_grade_rows(student_ids, academic_year)
+    scores = report_card_score_rows(student_ids, academic_year)
+    return [
+        build_report_card_data(student, term, academic_year, grades=grades[student.pk], scores=scores[student.pk])
+        for student in Student.objects.filter(pk__in=student_ids).order_by('pk')
+    ]
+
+
+def latest_report_cards(student_ids, term, academic_year):
+    """Returns {student id: (report card id, fingerprint, file)} for each student's newest card of the term."""
+    latest = {}
+    rows = (
+        ReportCard.objects.filter(student_id__in=student_ids, term=term, academic_year=academic_year)
+        .order_by('student_id', '-generated_date', '-id').values_list('student_id', 'id', 'fingerprint', 'pdf_file')
+    )
+    for student_id, report_card_id, fingerprint, pdf_file in rows:
+        latest.setdefault(student_id, (report_card_id, fingerprint, str(pdf_file)))
+    return latest
+
+
+def manifest_entry(card, report_card_id=None, file_name=None, reused=False, error=None):
+    """One manifest entry: the report card written (or kept) for a student, or the error."""
+    if error is not None:
+        return {'student': card['student'], 'student_id': card['student_id'], 'error': error}
+    return {
+        'student': card['student'],
+        'student_id': card['student_id'],
+        'report_card': report_card_id,
+        'file': file_name,
+        'reused': reused,
+    }
+
+
+def start_report_card_batch(batch, chunk_size=None):
+    """
+    Marks the batch Running and returns the ids of the students whose cards must be
+    rendered, in chunks of REPORT_CARD_BATCH_CHUNK_SIZE, one per task.
+
+    Students whose newest card was rendered from the same inputs (same fingerprint) keep
+    that card; it goes straight into the manifest.
+    """
+    chunk_size = chunk_size or getattr(settings, 'REPORT_CARD_BATCH_CHUNK_SIZE', 50)
+    student_ids = batch_student_ids(batch)
+    ReportCardBatch.objects.filter(pk=batch.pk).update(status='Running', total=len(student_ids))
+
+    cards = collect_report_card_data(student_ids, batch.term, batch.academic_year)
+    latest = latest_report_cards(student_ids, batch.term, batch.academic_year)
+    manifest = []
+    dirty = []
+    for card in cards:
+        existing = latest.get(card['student'])
+        if existing and existing[1] == card['fingerprint']:
+            manifest.append(manifest_entry(card, existing[0], existing[2], reused=True))
+        else:
+            dirty.append(card['student'])
+    ReportCardBatch.objects.filter(pk=batch.pk).update(completed=len(manifest), manifest=manifest)
+    return [dirty[i:i + chunk_size] for i in range(0, len(dirty), chunk_size)]
+
+
+def render_report_card_chunk(batch, student_ids):
+    """
+    Renders the report cards of a chunk of the batch's students, writes the ReportCard rows
+    (which upload the rendered bytes to storage) with one bulk insert, adds them to the
+    batch's progress and returns their manifest entries.
+
+    A render error only fails its own card; any other error fails the chunk's cards that
+    were not failed already.
+    """
+    manifest = []
+    written = []
+    try:
+        rendered = []
+        for card in collect_report_card_data(student_ids, batch.term, batch.academic_year):
+            try:
+                rendered.append((card, render_report_card(card)))
+            except Exception as e:
+                manifest.append(manifest_entry(card, error=str(e)))
+        report_cards = ReportCard.objects.bulk_create([
+            ReportCard(
+                student_id=card['student'], term=batch.term, academic_year=batch.academic_year,
+                pdf_file=report_card_upload(*pdf), fingerprint=card['fingerprint'],
+            )
+            for card, pdf in rendered
+        ])
+        for (card, (file_name, _)), report_card in zip(rendered, report_cards):
+            written.append(manifest_entry(card, report_card.pk, file_name))
+    except Exception as e:
+        failed_ids = {entry['student'] for entry in manifest}
+        school_ids = dict(Student.objects.filter(pk__in=student_ids).values_list('id', 'student_id'))
+        manifest.extend(
+            manifest_entry({'student': student_id, 'student_id': school_ids.get(student_id)}, error=str(e))
+            for student_id in student_ids if student_id not in failed_ids
+        )
+        written = []
+
+    ReportCardBatch.objects.filter(pk=batch.pk).update(
+        completed=F('completed') + len(written), failed=F('failed') + len(manifest),
+    )
+    return written + manifest
+
+
+def finish_report_card_batch(batch, chunk_manifests):
+    """Adds the chunks' manifest entries to the batch's, marks it Completed and returns the manifest."""
+    manifest = list(batch.manifest)
+    for entries in chunk_manifests:
+        manifest.extend(entries)
+    ReportCardBatch.objects.filter(pk=batch.pk).update(
+        status='Completed', manifest=manifest, finished_at=timezone.now(),
+    )
+    return manifest
+
+
+def fail_report_card_batch(batch, error):
+    """Marks the batch Failed with the error."""
+    ReportCardBatch.objects.filter(pk=batch.pk).update(status='Failed', error=str(error), finished_at=timezone.now())
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_reportcardbatch'),
+        ('students', '0003_admissionapplication_student_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportcard',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='reportcard',
+            index=models.Index(fields=['student', 'term', 'academic_year'], name='reports_rep_student_37a59f_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from students.models import Student
+from academics.models import Class
 from django.conf import settings
 from cloudinary.models import CloudinaryField
 import os
@@ -10,6 +11,11 @@ class ReportCard(models.Model):
     academic_year = models.CharField(max_length=20)  # e.g., "2023-2024"
     generated_date = models.DateTimeField(auto_now_add=True)
     pdf_file = CloudinaryField('report_card_pdf', resource_type='raw', format='pdf', folder='report_cards/')
+    # sha256 of the grades, scores, term, year and template version the PDF was rendered from
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['student', 'term', 'academic_year'])]
     
     def __str__(self):
         return f"Report Card - {self.student.user.get_full_name()} - {self.term} {self.academic_year}"
@@ -17,4 +23,35 @@ class ReportCard(models.Model):
     def get_download_url(self):
         if self.pdf_file:
             return os.path.join(settings.MEDIA_URL, self.pdf_file.name)
-        return None
\ No newline at end of file
+        return None
+
+
+class ReportCardBatch(models.Model):
+    """A background job that generates the report cards of a class (or a whole academic year)."""
+    class_obj = models.ForeignKey(Class, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_card_batches')
+    term = models.CharField(max_length=50)
+    academic_year = models.CharField(max_length=20)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_card_batches')
+    status = models.CharField(max_length=20, choices=(('Pending', 'Pending'), ('Running', 'Running'), ('Completed', 'Completed'), ('Failed', 'Failed')), default='Pending')
+    total = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    # One entry per student: the report card written, or the error
+    manifest = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = "Report card batches"
+
+    def __str__(self):
+        scope = self.class_obj or 'All classes'
+        return f"Report Cards - {scope} - {self.term} {self.academic_year} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 100 if self.status == 'Completed' else 0
+        return round((self.completed + self.failed) / self.total * 100, 1)
@@ -0,0 +1,288 @@
+from collections import namedtuple
+from django.db import models
+from django.db.models import Avg, Count, F, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from academics.models import Attendance, Class, Course, Enrollment, Grade
+from fees.models import Fee, Payment
+from staff.models import Staff
+from students.models import Student
+from users.models import Parent
+
+
+# Allowed fields for the report
+ALLOWED_FIELDS = {
+    'students': ['first_name', 'last_name', 'email', 'phone_number', 'address', 'city', 'region', 'student_id'],
+    'staff': ['first_name', 'last_name', 'email', 'phone_number', 'staff_id'],
+    'courses': ['name', 'code', 'description', 'credit_hours'],
+    'classes': ['name', 'academic_year', 'start_time', 'end_time', 'room'],
+    'enrollments': ['enrollment_date'],
+    'attendance': ['date', 'status', 'remark'],
+    'grades': ['final_grade', 'letter_grade'],
+    'fees': ['name', 'amount', 'due_date'],
+    'payments': ['amount_paid', 'payment_date', 'status'],
+}
+
+# Mapping from model names to actual model classes
+REPORT_MODELS = {
+    'students': Student,
+    'staff': Staff,
+    'courses': Course,
+    'classes': Class,
+    'enrollments': Enrollment,
+    'attendance': Attendance,
+    'grades': Grade,
+    'fees': Fee,
+    'payments': Payment,
+}
+
+# Models that can only be reached through a join
+JOINED_MODELS = {
+    'parents': Parent,
+}
+JOINED_FIELDS = {
+    'parents': ['first_name', 'last_name', 'email', 'phone_number', 'occupation'],
+}
+
+# The join graph: model -> {relation used in field names: (ORM relation, related model)}.
+# A report selects related fields as e.g. "parent.phone_number" or "fee.student.region".
+JOIN_GRAPH = {
+    'students': {'parent': ('parent', 'parents')},
+    'enrollments': {'student': ('student', 'students'), 'class': ('class_enrolled', 'classes'), 'course': ('course', 'courses')},
+    'attendance': {'student': ('student', 'students'), 'class': ('class_session', 'classes')},
+    'grades': {'student': ('student', 'students'), 'course': ('course', 'courses')},
+    'fees': {'student': ('student', 'students')},
+    'payments': {'fee': ('fee', 'fees')},
+}
+
+MAX_JOIN_DEPTH = 2
+
+MONEY = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def subquery_sum(model_class, link, outer, field, **filters):
+    """Sums `field` over the rows of model_class linked to the outer row (and matching `filters`), as a correlated subquery."""
+    totals = (
+        model_class.objects.filter(**{link: OuterRef(outer)}, **filters).order_by()
+        .values(link).annotate(total=Sum(field)).values('total')
+    )
+    return Coalesce(Subquery(totals), Value(0), output_field=MONEY)
+
+
+# Per-row totals over one-to-many relations. They are computed with correlated subqueries,
+# so they never multiply the report rows. Each takes the ORM path of the row's primary key
+# and the ORM prefix of its own fields.
+COMPUTED_FIELDS = {
+    'students': {
+        'total_fees': lambda outer, prefix: subquery_sum(Fee, 'student', outer, 'amount'),
+        'total_paid': lambda outer, prefix: subquery_sum(Payment, 'fee__student', outer, 'amount_paid', status='Completed'),
+        'outstanding_fees': lambda outer, prefix: (
+            subquery_sum(Fee, 'student', outer, 'amount') - subquery_sum(Payment, 'fee__student', outer, 'amount_paid', status='Completed')
+        ),
+    },
+    'fees': {
+        'total_paid': lambda outer, prefix: subquery_sum(Payment, 'fee', outer, 'amount_paid', status='Completed'),
+        'outstanding': lambda outer, prefix: F(f'{prefix}amount') - subquery_sum(Payment, 'fee', outer, 'amount_paid', status='Completed'),
+    },
+}
+
+AGGREGATE_FUNCTIONS = {
+    'count': Count,
+    'sum': Sum,
+    'avg': Avg,
+    'min': Min,
+    'max': Max,
+}
+
+# sum and avg only make sense over numbers
+NUMERIC_FIELDS = (models.IntegerField, models.DecimalField, models.FloatField)
+
+PREVIEW_ROWS = 50
+
+# A report column resolved against the join graph: the ORM lookup (or annotation alias)
+# to select, the annotation to add for computed fields, and whether it is numeric
+ResolvedField = namedtuple('ResolvedField', ['lookup', 'expression', 'numeric'])
+
+
+class ReportBuilderError(ValueError):
+    """Raised for an invalid custom report definition; the message is safe to show the user."""
+
+
+def model_fields(model_name):
+    return ALLOWED_FIELDS.get(model_name) or JOINED_FIELDS.get(model_name, [])
+
+
+def available_fields(model_name, depth=0):
+    """Lists every field a report on the model can select, including joined and computed ones."""
+    fields = list(model_fields(model_name)) + list(COMPUTED_FIELDS.get(model_name, {}))
+    if depth < MAX_JOIN_DEPTH:
+        for relation, (_, related_model) in JOIN_GRAPH.get(model_name, {}).items():
+            fields.extend(f"{relation}.{field}" for field in available_fields(related_model, depth + 1))
+    return fields
+
+
+def resolve_field(model_name, name):
+    """Resolves a (possibly dotted) report field name to a ResolvedField, or raises ReportBuilderError."""
+    if not isinstance(name, str):
+        raise ReportBuilderError(f"Invalid field: {name}.")
+    *relations, field = name.split('.')
+    if len(relations) > MAX_JOIN_DEPTH:
+        raise ReportBuilderError(f"Invalid field: {name}.")
+
+    prefix = ''
+    for relation in relations:
+        joined = JOIN_GRAPH.get(model_name, {}).get(relation)
+        if joined is None:
+            raise ReportBuilderError(f"Invalid field: {name}.")
+        orm_relation, model_name = joined
+        prefix += f"{orm_relation}__"
+
+    if field in COMPUTED_FIELDS.get(model_name, {}):
+        outer = prefix[:-2] if prefix else 'pk'
+        return ResolvedField(name.replace('.', '_'), COMPUTED_FIELDS[model_name][field](outer, prefix), True)
+    if field in model_fields(model_name):
+        model_class = REPORT_MODELS.get(model_name) or JOINED_MODELS[model_name]
+        numeric = isinstance(model_class._meta.get_field(field), NUMERIC_FIELDS)
+        return ResolvedField(f"{prefix}{field}", None, numeric)
+    raise ReportBuilderError(f"Invalid field: {name}.")
+
+
+def report_dependencies(model_name, field_names):
+    """Returns the names of every model whose rows can change the result of a report over these fields."""
+    dependencies = {model_name}
+    for name in field_names:
+        if not isinstance(name, str):
+            continue
+        current = model_name
+        *relations, field = name.split('.')
+        for relation in relations:
+            joined = JOIN_GRAPH.get(current, {}).get(relation)
+            if joined is None:
+                break
+            current = joined[1]
+            dependencies.add(current)
+        if field in COMPUTED_FIELDS.get(current, {}):
+            dependencies.update(('fees', 'payments'))
+    return sorted(dependencies)
+
+
+def parse_limit(value):
+    """Returns a positive row limit, or None when no limit was given."""
+    if value in (None, ''):
+        return None
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ReportBuilderError("Limit must be a positive integer.")
+    if limit < 1:
+        raise ReportBuilderError("Limit must be a positive integer.")
+    return limit
+
+
+def parse_aggregates(model_name, aggregates):
+    """
+    Turns [{"function": "sum", "field": "amount"}, "count", ...] into
+    ({column name: aggregate}, {alias: computed expression it needs}).
+
+    Columns are named <function>_<field> (dots become underscores), or just count for a row count.
+    """
+    if not isinstance(aggregates, (list, tuple)):
+        raise ReportBuilderError("Aggregates must be a list.")
+    compiled = {}
+    annotations = {}
+    for aggregate in aggregates:
+        if isinstance(aggregate, str):
+            aggregate = {'function': aggregate}
+        if not isinstance(aggregate, dict):
+            raise ReportBuilderError("Invalid aggregate.")
+        function = str(aggregate.get('function', '')).lower()
+        field = aggregate.get('field')
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ReportBuilderError(f"Invalid aggregate function: {function}. Use one of {', '.join(AGGREGATE_FUNCTIONS)}.")
+        if field is None:
+            if function != 'count':
+                raise ReportBuilderError(f"The {function} aggregate needs a field.")
+            compiled['count'] = Count('pk')
+            continue
+        resolved = resolve_field(model_name, field)
+        if function in ('sum', 'avg') and not resolved.numeric:
+            raise ReportBuilderError(f"The {function} aggregate needs a numeric field.")
+        if resolved.expression is not None:
+            annotations[resolved.lookup] = resolved.expression
+        compiled[f"{function}_{field.replace('.', '_')}"] = AGGREGATE_FUNCTIONS[function](resolved.lookup)
+    return compiled, annotations
+
+
+def build_report(model_name, fields=None, filters=None, limit=None, group_by=None, aggregates=None):
+    """
+    Turns a custom report definition into (columns, rows).
+
+    Fields may follow the join graph ("parent.phone_number") or be computed totals
+    ("outstanding_fees"); everything is compiled into one query, with joins for related
+    fields and correlated subqueries for computed ones.
+
+    Without aggregates, rows is a values_list over exactly the selected columns (all
+    allowed fields when none are selected), so only those columns are read from the
+    database. With group_by and/or aggregates, the rows are computed by one GROUP BY
+    query; group_by without aggregates counts the rows of each group.
+    """
+    if not model_name or model_name not in REPORT_MODELS:
+        raise ReportBuilderError("Invalid model selected.")
+
+    # Validate selected fields
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+    resolved_group_by = [resolve_field(model_name, field) for field in group_by]
+    annotations = {field.lookup: field.expression for field in resolved_group_by if field.expression is not None}
+    if group_by or aggregates:
+        if fields and not set(fields) <= set(group_by):
+            raise ReportBuilderError("Only group_by fields can be selected in an aggregated report.")
+        compiled, aggregate_annotations = parse_aggregates(model_name, aggregates or ['count'])
+        annotations.update(aggregate_annotations)
+        columns = group_by + list(compiled)
+    else:
+        columns = list(fields or ALLOWED_FIELDS[model_name])
+        resolved_fields = [resolve_field(model_name, field) for field in columns]
+        annotations.update({field.lookup: field.expression for field in resolved_fields if field.expression is not None})
+
+    # Build queryset with filters
+    queryset = REPORT_MODELS[model_name].objects.all()
+    for field, value in (filters or {}).items():
+        try:
+            resolved = resolve_field(model_name, field)
+        except ReportBuilderError:
+            continue
+        if resolved.expression is None:
+            queryset = queryset.filter(**{f"{resolved.lookup}__icontains": value})
+    if annotations:
+        queryset = queryset.annotate(**annotations)
+
+    limit = parse_limit(limit)
+    if group_by:
+        lookups = [field.lookup for field in resolved_group_by]
+        queryset = (
+            queryset.values(*lookups).annotate(**compiled).order_by(*lookups)
+            .values_list(*lookups, *compiled)
+        )
+    elif aggregates:
+        # A single row over the whole (filtered) table
+        totals = queryset.aggregate(**compiled)
+        return columns, [tuple(totals[column] for column in columns)]
+    else:
+        queryset = queryset.order_by('pk').values_list(*[field.lookup for field in resolved_fields])
+    if limit:
+        queryset = queryset[:limit]
+    return columns, queryset
+
+
+def iter_report_rows(rows, chunk_size=2000):
+    """Yields the report rows, reading the database in chunks."""
+    if hasattr(rows, 'iterator'):
+        return rows.iterator(chunk_size=chunk_size)
+    return iter(rows)
+
+
+def preview_report(columns, rows):
+    """Returns the first PREVIEW_ROWS rows as JSON-ready data."""
+    return {
+        'columns': columns,
+        'rows': [list(row) for row in rows[:PREVIEW_ROWS]],
+    }
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+REPORT_VERSION_KEY = 'reports:version:{}'
+
+
+def report_cache_timeout():
+    return getattr(settings, 'REPORT_CACHE_TIMEOUT', 5 * 60)
+
+
+def report_cache_max_rows():
+    return getattr(settings, 'REPORT_CACHE_MAX_ROWS', 10000)
+
+
+def model_versions(model_names):
+    """Returns the current write version of each report model."""
+    keys = [REPORT_VERSION_KEY.format(name) for name in model_names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = cache.get_or_set(key, time.time_ns, timeout=None)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model_name):
+    """Retires every cached report that reads the model, once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(REPORT_VERSION_KEY.format(model_name), time.time_ns(), timeout=None))
+
+
+def report_cache_key(definition, dependencies):
+    """
+    Hashes the normalized report definition together with the write versions of every
+    model it reads, so any write to one of them makes the key unreachable.
+    """
+    payload = json.dumps({'definition': definition, 'versions': model_versions(dependencies)}, sort_keys=True, default=str)
+    return f"reports:result:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def get_cached_report(key):
+    """Returns the cached {'columns', 'rows', 'generated_at'} for the key, or None."""
+    return cache.get(key)
+
+
+def caching_rows(key, columns, rows):
+    """
+    Yields the rows and, when the whole report fits within REPORT_CACHE_MAX_ROWS, stores it
+    once the last row has been produced. Larger reports are streamed without being kept.
+    """
+    max_rows = report_cache_max_rows()
+    kept = []
+    for row in rows:
+        if kept is not None:
+            kept.append(row)
+            if len(kept) > max_rows:
+                kept = None
+        yield row
+    if kept is not None:
+        cache.set(key, {
+            'columns': columns,
+            'rows': kept,
+            'generated_at': timezone.now().isoformat(),
+        }, timeout=report_cache_timeout())
@@ -3,6 +3,7 @@ from students.models import Student
 from academics.models import Grade, Attendance, Enrollment, Course, Class
 from staff.models import Staff
 from fees.models import Fee, Payment
+from .models import ReportCardBatch
 
 class StudentReportSerializer(serializers.ModelSerializer):
     class Meta:
@@ -58,4 +59,19 @@ class PaymentReportSerializer(serializers.ModelSerializer):
 class StaffReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Staff
-        fields = ['id', 'first_name', 'last_name', 'staff_id']
\ No newline at end of file
+        fields = ['id', 'first_name', 'last_name', 'staff_id']
+
+class ReportCardBatchSerializer(serializers.ModelSerializer):
+    class_obj = serializers.PrimaryKeyRelatedField(queryset=Class.objects.all(), required=False, allow_null=True)
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ReportCardBatch
+        fields = ['id', 'class_obj', 'term', 'academic_year', 'status', 'total', 'completed', 'failed', 'progress', 'manifest', 'error', 'created_at', 'finished_at']
+        read_only_fields = ['status', 'total', 'completed', 'failed', 'manifest', 'error', 'created_at', 'finished_at']
+
+    def validate(self, data):
+        class_obj = data.get('class_obj')
+        if class_obj and class_obj.academic_year != data['academic_year']:
+            raise serializers.ValidationError("The class does not belong to this academic year.")
+        return data
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from .report_builder import JOINED_MODELS, REPORT_MODELS
+from .report_cache import bump_model_version
+
+
+# Report model name of every model a custom report can read
+REPORT_MODEL_NAMES = {model_class: name for name, model_class in {**REPORT_MODELS, **JOINED_MODELS}.items()}
+
+
+def invalidate_cached_reports(sender, **kwargs):
+    bump_model_version(REPORT_MODEL_NAMES[sender])
+
+
+for model_class in REPORT_MODEL_NAMES:
+    post_save.connect(invalidate_cached_reports, sender=model_class, dispatch_uid=f'reports-cache-save-{model_class._meta.label}')
+    post_delete.connect(invalidate_cached_reports, sender=model_class, dispatch_uid=f'reports-cache-delete-{model_class._meta.label}')
@@ -1,3 +1,156 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from fees.models import Fee, Payment
+from students.models import Student
+from users.models import Parent, User
+from .report_builder import ReportBuilderError, build_report, report_dependencies
+from .report_cache import report_cache_key
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_student(number, region='Greater Accra', parent=None):
+    user = User.objects.create_user(username=f'student{number}', password='password', role=User.Role.STUDENT)
+    return Student.objects.create(
+        user=user, student_id=f'S{number:04d}', first_name='Student', last_name=str(number),
+        date_of_birth=date(2010, 1, 1), gender='Female', address='1 School Road', city='Accra',
+        region=region, email=f'student{number}@example.com', admission_number=f'A{number:04d}',
+        admission_date=date(2024, 9, 1), emergency_contact_name='Guardian',
+        emergency_contact_phone='+233200000000', emergency_contact_relationship='Parent', parent=parent,
+    )
+
+
+def make_fee(student, amount, payments=()):
+    fee = Fee.objects.create(student=student, name='Tuition Fee', amount=Decimal(amount), due_date=date(2024, 10, 1))
+    for amount_paid, status in payments:
+        Payment.objects.create(fee=fee, amount_paid=Decimal(amount_paid), payment_date=date(2024, 9, 15), status=status)
+    return fee
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReportBuilderTests(TestCase):
+    def setUp(self):
+        parent_user = User.objects.create_user(username='parent', password='password', role=User.Role.PARENT)
+        self.parent = Parent.objects.create(user=parent_user, first_name='Ama', last_name='Mensah', email='parent@example.com', phone_number='+233200000001')
+        self.students = [
+            make_student(1, parent=self.parent),
+            make_student(2, region='Ashanti'),
+            make_student(3, region='Ashanti'),
+        ]
+        make_fee(self.students[0], '100', payments=[('60', 'Completed'), ('30', 'Pending')])
+        make_fee(self.students[0], '50')
+        make_fee(self.students[1], '80', payments=[('80', 'Completed')])
+
+    def test_selects_only_the_requested_columns(self):
+        columns, rows = build_report('students', fields=['student_id', 'region'], limit=2)
+
+        self.assertEqual(columns, ['student_id', 'region'])
+        self.assertEqual(list(rows), [('S0001', 'Greater Accra'), ('S0002', 'Ashanti')])
+
+    def test_joined_fields_follow_the_join_graph(self):
+        columns, rows = build_report('fees', fields=['amount', 'student.student_id', 'student.parent.phone_number'])
+
+        self.assertEqual(columns, ['amount', 'student.student_id', 'student.parent.phone_number'])
+        self.assertEqual(list(rows), [
+            (Decimal('100'), 'S0001', '+233200000001'),
+            (Decimal('50'), 'S0001', '+233200000001'),
+            (Decimal('80'), 'S0002', None),
+        ])
+
+    def test_computed_totals_do_not_multiply_the_rows(self):
+        _, rows = build_report('students', fields=['student_id', 'total_fees', 'total_paid', 'outstanding_fees'])
+
+        self.assertEqual(list(rows), [
+            ('S0001', Decimal('150'), Decimal('60'), Decimal('90')),
+            ('S0002', Decimal('80'), Decimal('80'), Decimal('0')),
+            ('S0003', Decimal('0'), Decimal('0'), Decimal('0')),
+        ])
+
+    def test_filters_apply_to_joined_fields(self):
+        _, rows = build_report('fees', fields=['amount'], filters={'student.region': 'ashanti'})
+
+        self.assertEqual(list(rows), [(Decimal('80'),)])
+
+    def test_group_by_aggregates_each_group(self):
+        columns, rows = build_report('students', group_by='region', aggregates=['count', {'function': 'sum', 'field': 'total_fees'}])
+
+        self.assertEqual(columns, ['region', 'count', 'sum_total_fees'])
+        self.assertEqual(list(rows), [('Ashanti', 2, Decimal('80')), ('Greater Accra', 1, Decimal('150'))])
+
+    def test_group_by_a_joined_field_counts_the_rows(self):
+        columns, rows = build_report('payments', group_by=['fee.student.student_id', 'status'])
+
+        self.assertEqual(columns, ['fee.student.student_id', 'status', 'count'])
+        self.assertEqual(list(rows), [('S0001', 'Completed', 1), ('S0001', 'Pending', 1), ('S0002', 'Completed', 1)])
+
+    def test_aggregates_without_group_by_return_one_row(self):
+        columns, rows = build_report('payments', aggregates=[
+            {'function': 'sum', 'field': 'amount_paid'}, {'function': 'max', 'field': 'amount_paid'}, 'count',
+        ])
+
+        self.assertEqual(columns, ['sum_amount_paid', 'max_amount_paid', 'count'])
+        self.assertEqual(rows, [(Decimal('170'), Decimal('80'), 3)])
+
+    def test_rejects_invalid_definitions(self):
+        invalid = [
+            {'model_name': 'users'},
+            {'model_name': 'students', 'fields': ['password']},
+            {'model_name': 'students', 'fields': ['parent.user.password']},
+            {'model_name': 'fees', 'fields': ['student.parent.user.email']},
+            {'model_name': 'students', 'group_by': 'region', 'fields': ['student_id']},
+            {'model_name': 'students', 'aggregates': [{'function': 'sum', 'field': 'region'}]},
+            {'model_name': 'students', 'aggregates': [{'function': 'median', 'field': 'total_fees'}]},
+            {'model_name': 'students', 'limit': 0},
+        ]
+        for definition in invalid:
+            with self.subTest(definition=definition), self.assertRaises(ReportBuilderError):
+                build_report(**definition)
+
+    def test_dependencies_include_joined_and_computed_models(self):
+        self.assertEqual(report_dependencies('students', ['parent.phone_number', 'outstanding_fees']), ['fees', 'parents', 'payments', 'students'])
+        self.assertEqual(report_dependencies('fees', ['amount']), ['fees'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = make_student(1)
+        self.fee = make_fee(self.student, '100')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='password', role=User.Role.ADMIN))
+
+    def export(self, definition):
+        response = self.client.post(reverse('custom_report'), definition, format='json')
+        return response['X-Report-Cache'], b''.join(response.streaming_content).decode()
+
+    def test_writes_retire_only_the_reports_that_read_the_model(self):
+        definition = {'model': 'students', 'fields': ['student_id', 'outstanding_fees']}
+        key = report_cache_key(definition, report_dependencies('students', definition['fields']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Parent.objects.create(
+                user=User.objects.create_user(username='parent', password='password', role=User.Role.PARENT),
+                first_name='Ama', last_name='Mensah', email='parent@example.com', phone_number='+233200000001',
+            )
+        self.assertEqual(report_cache_key(definition, report_dependencies('students', definition['fields'])), key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(fee=self.fee, amount_paid=Decimal('40'), payment_date=date(2024, 9, 15), status='Completed')
+        self.assertNotEqual(report_cache_key(definition, report_dependencies('students', definition['fields'])), key)
+
+    def test_an_export_is_served_from_the_cache_until_a_write(self):
+        definition = {'model': 'students', 'fields': ['student_id', 'outstanding_fees']}
+        self.assertEqual(self.export(definition)[0], 'MISS')
+        self.assertEqual(self.export(definition), ('HIT', 'student_id,outstanding_fees\r\nS0001,100.00\r\n'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(fee=self.fee, amount_paid=Decimal('40'), payment_date=date(2024, 9, 15), status='Completed')
+
+        self.assertEqual(self.export(definition), ('MISS', 'student_id,outstanding_fees\r\nS0001,60.00\r\n'))
+        self.assertEqual(self.export({**definition, 'refresh': True})[0], 'MISS')
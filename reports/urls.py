@@ -3,6 +3,7 @@ from . import views
 urlpatterns = [
     path('student-performance/', views.StudentPerformanceReportView.as_view(), name='student-performance-report'),
     path('attendance/', views.AttendanceReportView.as_view(), name='attendance-report'),
+    path('attendance-summary/', views.AttendanceSummaryReportView.as_view(), name='attendance-summary-report'),
     path('enrollment/', views.EnrollmentReportView.as_view(), name='enrollment-report'),
     path('financial/', views.FinancialReportView.as_view(), name='financial-report'),
     path('fees/', views.FeesReportView.as_view(), name='fees-report'),
@@ -26,4 +27,6 @@ urlpatterns = [
      path('custom/', views.custom_report, name='custom_report'),
     path('generate-report-card/<int:student_id>/', views.GenerateReportCardView.as_view(), name='generate_report_card'),
     path('download-report-card/<int:report_card_id>/', views.download_report_card, name='report-card-download'),
+    path('report-card-batches/', views.ReportCardBatchListCreateView.as_view(), name='report-card-batch-list-create'),
+    path('report-card-batches/<int:pk>/', views.ReportCardBatchRetrieveView.as_view(), name='report-card-batch-detail'),
 ]
\ No newline at end of file
@@ -1,11 +1,176 @@
 # reports/utils.py
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph, Table, TableStyle, Spacer
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Paragraph, Table, TableStyle
 from reportlab.lib import colors
-import os
-from django.conf import settings
+import hashlib
+import json
+from collections import defaultdict
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from academics.models import Grade, Score
+
+# Bump whenever the report card layout changes, so existing cards are re-rendered
+REPORT_CARD_TEMPLATE_VERSION = 1
+
+
+def report_card_fingerprint(card, scores):
+    """Hashes everything a report card is built from: the student, grades, scores, term, year and template."""
+    payload = {
+        'student': [card['student_id'], card['first_name'], card['last_name']],
+        'term': card['term'],
+        'academic_year': card['academic_year'],
+        'grades': sorted([str(value) for value in row] for row in card['grades']),
+        'scores': sorted([str(value) for value in row] for row in scores),
+        'template': REPORT_CARD_TEMPLATE_VERSION,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def report_card_grade_rows(student_ids, academic_year):
+    """
+    Returns {student id: [(course name, final grade, letter grade), ...]} for the year. Rows
+    are distinct per grade, so a course taught in several classes is listed once and two
+    courses with equal names and grades are both kept.
+    """
+    grades = defaultdict(list)
+    rows = (
+        Grade.objects.filter(student_id__in=student_ids, course__classes__academic_year=academic_year)
+        .distinct().order_by('id').values_list('id', 'student_id', 'course__name', 'final_grade', 'letter_grade')
+    )
+    for _, student_id, course_name, final_grade, letter_grade in rows:
+        grades[student_id].append((course_name, final_grade, letter_grade))
+    return grades
+
+
+def report_card_score_rows(student_ids, academic_year):
+    """Returns {student id: [(component id, score), ...]} for the year, distinct per score."""
+    scores = defaultdict(list)
+    rows = (
+        Score.objects.filter(student_id__in=student_ids, component__course__classes__academic_year=academic_year)
+        .distinct().order_by('id').values_list('id', 'student_id', 'component_id', 'score')
+    )
+    for _, student_id, component_id, score in rows:
+        scores[student_id].append((component_id, score))
+    return scores
+
+
+def build_report_card_data(student, term, academic_year, grades=None, scores=None):
+    """
+    Collects everything a report card shows into a plain, picklable dict, including the
+    fingerprint of its inputs.
+
+    Args:
+        student: The Student object.
+        term: The term (e.g., "Term 1", "Term 2").
+        academic_year: The academic year (e.g., "2023-2024").
+        grades: Optional list of (course name, final grade, letter grade) rows, as returned
+            by report_card_grade_rows. Fetched for the student when omitted.
+        scores: Optional list of (component id, score) rows, as returned by
+            report_card_score_rows. Fetched for the student when omitted.
+    """
+    if grades is None:
+        grades = report_card_grade_rows([student.pk], academic_year)[student.pk]
+    if scores is None:
+        scores = report_card_score_rows([student.pk], academic_year)[student.pk]
+    card = {
+        'student': student.pk,
+        'student_id': student.student_id,
+        'first_name': student.first_name,
+        'last_name': student.last_name,
+        'term': term,
+        'academic_year': academic_year,
+        'grades': grades,
+    }
+    card['fingerprint'] = report_card_fingerprint(card, scores)
+    return card
+
+
+class ReportCardRenderer:
+    """
+    Renders report card data (see build_report_card_data) to PDF bytes.
+
+    Styles are built once per renderer, and get_report_card_renderer keeps one renderer per
+    process. Rendering touches neither the database nor the disk, so it can run in a worker
+    process and the bytes can go straight to storage or an HTTP response.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.heading_style = ParagraphStyle('ReportCardHeading', parent=styles['Heading1'], alignment=1)  # Center align
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        self.title = Paragraph("ESchoolSuite Report Card", self.heading_style)
+        self.title.wrap(400, 100)
+
+    def render(self, card):
+        """Returns the PDF of one report card as bytes."""
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter)
+
+        # Title
+        self.title.drawOn(c, 100, 750)
+
+        c.setFont("Helvetica", 12)
+        c.drawString(100, 700, f"Name: {card['first_name']} {card['last_name']}")
+        c.drawString(100, 680, f"Student ID: {card['student_id']}")
+        c.drawString(100, 660, f"Term: {card['term']}")
+        c.drawString(100, 640, f"Academic Year: {card['academic_year']}")
+
+        # Display grades
+        if card['grades']:
+            data = [["Course Name", "Final Grade", "Letter Grade"]]
+            for course_name, final_grade, letter_grade in card['grades']:
+                data.append([
+                    course_name,
+                    str(final_grade),
+                    letter_grade
+                ])
+
+            table = Table(data)
+            table.setStyle(self.table_style)
+            table.wrapOn(c, 400, 600)
+            table.drawOn(c, 100, 450)
+        else:
+            c.drawString(100, 500, "No grades available for this term.")
+
+        c.save()
+        return buffer.getvalue()
+
+
+_renderer = None
+
+
+def get_report_card_renderer():
+    """Returns this process's shared ReportCardRenderer."""
+    global _renderer
+    if _renderer is None:
+        _renderer = ReportCardRenderer()
+    return _renderer
+
+
+def report_card_file_name(card):
+    return f"report_card_{card['student_id']}_{card['term']}_{card['academic_year']}.pdf"
+
+
+def render_report_card(card):
+    """Renders a report card with the process's renderer and returns (file name, PDF bytes)."""
+    return report_card_file_name(card), get_report_card_renderer().render(card)
+
+
+def report_card_upload(file_name, pdf_bytes):
+    """Wraps rendered PDF bytes so ReportCard.pdf_file uploads them on save."""
+    return SimpleUploadedFile(file_name, pdf_bytes, content_type='application/pdf')
+
 
 def generate_report_card_pdf(student, term, academic_year):
     """
@@ -17,70 +182,6 @@ def generate_report_card_pdf(student, term, academic_year):
         academic_year: The academic year (e.g., "2023-2024").
 
     Returns:
-        The path to the generated PDF file.
+        A (file name, PDF bytes) tuple.
     """
-
-    # Create a unique filename for the report card
-    file_name = f"report_card_{student.student_id}_{term}_{academic_year}.pdf"
-    file_path = os.path.join(settings.MEDIA_ROOT, 'report_cards', file_name)
-
-     # Ensure the directory exists
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-    # Create a new PDF document
-    c = canvas.Canvas(file_path, pagesize=letter)
-
-    # Set up styles
-    styles = getSampleStyleSheet()
-    normal_style = styles['Normal']
-    heading_style = styles['Heading1']
-    heading_style.alignment = 1  # Center align
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ])
-
-    # Title
-    title = Paragraph("ESchoolSuite Report Card", heading_style)
-    title.wrapOn(c, 400, 100)
-    title.drawOn(c, 100, 750)
-
-    c.setFont("Helvetica", 12)
-    c.drawString(100, 700, f"Name: {student.first_name} {student.last_name}")
-    c.drawString(100, 680, f"Student ID: {student.student_id}")
-    c.drawString(100, 660, f"Term: {term}")
-    c.drawString(100, 640, f"Academic Year: {academic_year}")
-
-    # Add some space before the table
-    spacer = Spacer(1, 36)
-    spacer.wrapOn(c, 400, 100)
-    spacer.drawOn(c, 100, 604)
-
-    # Fetch and display grades
-    grades = student.grades.filter(course__classes__academic_year=academic_year)
-    if grades.exists():
-        data = [["Course Name", "Final Grade", "Letter Grade"]]
-        for grade in grades:
-            data.append([
-                grade.course.name,
-                str(grade.final_grade),
-                grade.letter_grade
-            ])
-
-        table = Table(data)
-        table.setStyle(table_style)
-        table.wrapOn(c, 400, 600)
-        table.drawOn(c, 100, 450)
-    else:
-        c.drawString(100, 500, "No grades available for this term.")
-
-    # Save the PDF
-    c.save()
-
-    return file_path
\ No newline at end of file
+    return render_report_card(build_report_card_data(student, term, academic_year))
@@ -1,32 +1,63 @@
-import os
 from django.shortcuts import get_object_or_404, render
 from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAdminUser
-from ESchoolSuite.tasks import send_report_card_sms_task
-from reports.models import ReportCard
-from reports.utils import generate_report_card_pdf
+from ESchoolSuite.pages import list_view_data
+from ESchoolSuite.tasks import generate_report_card_batch_task, send_report_card_sms_task
+from reports.models import ReportCard, ReportCardBatch
+from reports.report_builder import ALLOWED_FIELDS, ReportBuilderError, available_fields, build_report, iter_report_rows, preview_report, report_dependencies
+from reports.report_cache import caching_rows, get_cached_report, report_cache_key
+from reports.utils import build_report_card_data, render_report_card, report_card_upload
 from students.models import Student
-from academics.models import Grade, Attendance, Enrollment, Course, Class
+from academics.attendance import attendance_summary, filter_rollups
+from academics.models import Grade, Attendance, AttendanceRollup, Enrollment, Course, Class
 from staff.models import Staff
 from fees.models import Fee, Payment
 from users.permissions import IsAdmin
-from .serializers import GradeReportSerializer, AttendanceReportSerializer, EnrollmentReportSerializer, FeeReportSerializer, PaymentReportSerializer, StudentReportSerializer, StaffReportSerializer, CourseReportSerializer, ClassReportSerializer
+from .serializers import ReportCardBatchSerializer, GradeReportSerializer, AttendanceReportSerializer, EnrollmentReportSerializer, FeeReportSerializer, PaymentReportSerializer, StudentReportSerializer, StaffReportSerializer, CourseReportSerializer, ClassReportSerializer
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters
+from rest_framework import filters, serializers
 from rest_framework.decorators import api_view, permission_classes
 from django.http import HttpResponse, StreamingHttpResponse
 import csv
+from django.utils import timezone
+from itertools import chain
+from django.db import transaction
 from rest_framework.response import Response
 from rest_framework import status
-import requests
 from django.template.loader import get_template
 from xhtml2pdf import pisa
 
 
-class StudentPerformanceReportView(generics.ListAPIView):
+class CSVExportMixin:
+    """
+    Adds ?format=csv to a list report view. The filtered queryset is streamed with
+    .iterator() and serialized one row at a time, so exports run in constant memory.
+    """
+    csv_filename = 'report.csv'
+    csv_select_related = ()
+    csv_chunk_size = 2000
+
+    def perform_content_negotiation(self, request, force=False):
+        # There is no CSV renderer; the export bypasses rendering, so don't 404 on format=csv
+        if request.query_params.get('format') == 'csv':
+            force = True
+        return super().perform_content_negotiation(request, force=force)
+
+    def get(self, request, *args, **kwargs):
+        if request.query_params.get('format') == 'csv':
+            queryset = self.filter_queryset(self.get_queryset())
+            if self.csv_select_related:
+                queryset = queryset.select_related(*self.csv_select_related)
+            return generate_csv_report(request, self.get_serializer_class(), queryset, self.csv_filename, chunk_size=self.csv_chunk_size)
+        return super().get(request, *args, **kwargs)
+
+
+class StudentPerformanceReportView(CSVExportMixin, generics.ListAPIView):
     serializer_class = GradeReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'student_performance_report.csv'
+    csv_select_related = ('student', 'course')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['student', 'course', 'letter_grade']
     search_fields = ['student__first_name', 'student__last_name', 'course__name']
@@ -41,14 +72,14 @@ class StudentPerformanceReportView(generics.ListAPIView):
             template_path = 'reports/student_performance_report_pdf.html'
             context_data = {'report_data': self.get_queryset(), 'request': request}  # Pass the request object to the context
             return generate_pdf_report(request, template_path, context_data)
-        elif request.query_params.get('format') == 'csv':
-            return generate_csv_report(request, self.get_serializer_class(), self.get_queryset(), 'student_performance_report.csv')
         else:
             return super().get(request, *args, **kwargs)
 
-class AttendanceReportView(generics.ListAPIView):
+class AttendanceReportView(CSVExportMixin, generics.ListAPIView):
     serializer_class = AttendanceReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'attendance_report.csv'
+    csv_select_related = ('student', 'class_session')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['student', 'class_session', 'date', 'status']
     search_fields = ['student__first_name', 'student__last_name']
@@ -57,9 +88,36 @@ class AttendanceReportView(generics.ListAPIView):
         queryset = Attendance.objects.all()
         return queryset
 
-class EnrollmentReportView(generics.ListAPIView):
+class AttendanceSummaryReportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Attendance totals and rates per class, read from the attendance rollups.
+        Accepts the student, class_session and month (YYYY-MM) query parameters.
+        """
+        rollups = filter_rollups(AttendanceRollup.objects.all(), request.query_params)
+        summary = attendance_summary(rollups)
+        if request.query_params.get('format') == 'csv':
+            statuses = [choice for choice, _ in Attendance.AttendanceStatus.choices]
+            rows = (
+                [entry['class_session'], entry['class_name'], entry['total'], entry['attendance_rate']]
+                + [entry['counts'].get(choice, 0) for choice in statuses]
+                for entry in summary['classes']
+            )
+            return stream_csv(['class_session', 'class_name', 'total', 'attendance_rate'] + statuses, rows, 'attendance_summary_report.csv')
+        return Response(summary)
+
+    def perform_content_negotiation(self, request, force=False):
+        if request.query_params.get('format') == 'csv':
+            force = True
+        return super().perform_content_negotiation(request, force=force)
+
+class EnrollmentReportView(CSVExportMixin, generics.ListAPIView):
     serializer_class = EnrollmentReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'enrollment_report.csv'
+    csv_select_related = ('student', 'course', 'class_enrolled')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['student', 'course', 'class_enrolled']
     search_fields = ['student__first_name', 'student__last_name', 'course__name', 'class_enrolled__name']
@@ -68,9 +126,10 @@ class EnrollmentReportView(generics.ListAPIView):
         queryset = Enrollment.objects.all()
         return queryset
 
-class CourseReportView(generics.ListAPIView):
+class CourseReportView(CSVExportMixin, generics.ListAPIView):
     serializer_class = CourseReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'courses_report.csv'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['name', 'code', 'level']
     search_fields = ['name', 'code', 'level']
@@ -78,9 +137,10 @@ class CourseReportView(generics.ListAPIView):
     def get_queryset(self):
         return Course.objects.all()
 
-class ClassReportView(generics.ListAPIView):
+class ClassReportView(CSVExportMixin, generics.ListAPIView):
     serializer_class = ClassReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'classes_report.csv'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['name', 'academic_year', 'class_teacher', 'courses', 'start_time', 'end_time', 'room']
     search_fields = ['name', 'academic_year', 'class_teacher__first_name', 'class_teacher__last_name', 'courses__name', 'room']
@@ -88,10 +148,12 @@ class ClassReportView(generics.ListAPIView):
     def get_queryset(self):
         return Class.objects.all()
 
-class FinancialReportView(generics.ListAPIView):
+class FinancialReportView(CSVExportMixin, generics.ListAPIView):
     # queryset = Fee.objects.all()  # You can use either Fee or Payment as the queryset
     serializer_class = FeeReportSerializer  # You can create a separate serializer for financial reports if needed
     permission_classes = [IsAdminUser]
+    csv_filename = 'financial_report.csv'
+    csv_select_related = ('student',)
 
     def get_queryset(self):
         # Customize this method to return the data you want for financial reports
@@ -100,34 +162,40 @@ class FinancialReportView(generics.ListAPIView):
         # For now, let's return all fees:
         return Fee.objects.all()
 
-class FeesReportView(generics.ListAPIView):
+class FeesReportView(CSVExportMixin, generics.ListAPIView):
     queryset = Fee.objects.all()
     serializer_class = FeeReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'fees_report.csv'
+    csv_select_related = ('student',)
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['student', 'name', 'due_date']
     search_fields = ['name', 'description', 'student__first_name', 'student__last_name']
 
-class PaymentsReportView(generics.ListAPIView):
+class PaymentsReportView(CSVExportMixin, generics.ListAPIView):
     queryset = Payment.objects.all()
     serializer_class = PaymentReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'payments_report.csv'
+    csv_select_related = ('fee__student',)
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['fee', 'status', 'payment_method']
     search_fields = ['transaction_id', 'fee__name', 'fee__student__first_name', 'fee__student__last_name']
 
-class StudentReportView(generics.ListAPIView):
+class StudentReportView(CSVExportMixin, generics.ListAPIView):
     queryset = Student.objects.all()
     serializer_class = StudentReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'students_report.csv'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['gender', 'region', 'admission_number', 'parent__user__email', 'parent__phone_number', 'parent__first_name', 'parent__last_name', 'parent__middle_name', 'parent__occupation']
     search_fields = ['first_name', 'last_name', 'student_id', 'email', 'phone_number', 'admission_number']
 
-class StaffReportView(generics.ListAPIView):
+class StaffReportView(CSVExportMixin, generics.ListAPIView):
     queryset = Staff.objects.all()
     serializer_class = StaffReportSerializer
     permission_classes = [IsAdminUser]
+    csv_filename = 'staff_report.csv'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['gender', 'region', 'qualification', 'date_joined', 'user__role']
     search_fields = ['first_name', 'last_name', 'staff_id', 'email', 'phone_number']
@@ -137,126 +205,96 @@ class StaffReportView(generics.ListAPIView):
 @api_view(['GET', 'POST'])
 @permission_classes([IsAdmin])
 def custom_report(request):
-    # Allowed fields for the report
-    allowed_fields = {
-        'students': ['first_name', 'last_name', 'email', 'phone_number', 'address', 'city', 'region', 'student_id'],
-        'staff': ['first_name', 'last_name', 'email', 'phone_number', 'staff_id'],
-        'courses': ['name', 'code', 'description', 'credit_hours'],
-        'classes': ['name', 'academic_year', 'start_time', 'end_time', 'room'],
-        'enrollments': ['enrollment_date'],
-        'attendance': ['date', 'status', 'remark'],
-        'grades': ['final_grade', 'letter_grade'],
-        'fees': ['name', 'amount', 'due_date'],
-        'payments': ['amount_paid', 'payment_date', 'status'],
-    }
-
-    # Mapping from model names to actual model classes and serializers
-    model_mapping = {
-        'students': (Student, StudentReportSerializer),
-        'staff': (Staff, StaffReportSerializer),
-        'courses': (Course, CourseReportSerializer),
-        'classes': (Class, ClassReportSerializer),
-        'enrollments': (Enrollment, EnrollmentReportSerializer),
-        'attendance': (Attendance, AttendanceReportSerializer),
-        'grades': (Grade, GradeReportSerializer),
-        'fees': (Fee, FeeReportSerializer),
-        'payments': (Payment, PaymentReportSerializer),
-    }
-
     if request.method == 'GET':
-        # Return the list of available models and fields
-        return Response(allowed_fields)
+        # Return the list of available models and fields, including joined and computed ones
+        return Response({model_name: available_fields(model_name) for model_name in ALLOWED_FIELDS})
 
     elif request.method == 'POST':
         selected_model = request.data.get('model')
-        selected_fields = request.data.get('fields', [])
-        filters = request.data.get('filters', {})
-
-        if not selected_model or selected_model not in model_mapping:
-            return Response({"error": "Invalid model selected."}, status=status.HTTP_400_BAD_REQUEST)
-
-        model_class, serializer_class = model_mapping[selected_model]
-
-        # Validate selected fields
-        valid_fields = allowed_fields[selected_model]
-        if not all(field in valid_fields for field in selected_fields):
-            return Response({"error": "Invalid fields selected."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Build queryset with filters
-        queryset = model_class.objects.all()
-        for field, value in filters.items():
-            if field in valid_fields:
-                queryset = queryset.filter(**{f"{field}__icontains": value})
-
-        # Filter fields in the serializer
-        class CustomSerializer(serializer_class):
-            class Meta(serializer_class.Meta):
-                fields = selected_fields if selected_fields else '__all__'
-
-        # Serialize and return data
-        serializer = CustomSerializer(queryset, many=True)
-
-        # Generate CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{selected_model}_report.csv"'
-        writer = csv.DictWriter(response, fieldnames=selected_fields)
-        writer.writeheader()
-        for row in serializer.data:
-            writer.writerow(row)
+        definition = {
+            'model': selected_model,
+            'fields': request.data.get('fields', []),
+            'filters': request.data.get('filters', {}),
+            'limit': request.data.get('limit'),
+            'group_by': request.data.get('group_by', []),
+            'aggregates': request.data.get('aggregates', []),
+        }
+        try:
+            columns, rows = build_report(
+                selected_model,
+                fields=definition['fields'],
+                filters=definition['filters'],
+                limit=definition['limit'],
+                group_by=definition['group_by'],
+                aggregates=definition['aggregates'],
+            )
+        except ReportBuilderError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Results are cached per definition until a model the report reads is written to
+        field_names = list(definition['fields'] or []) + list(definition['filters'] or {})
+        field_names += [definition['group_by']] if isinstance(definition['group_by'], str) else list(definition['group_by'] or [])
+        field_names += [aggregate.get('field') for aggregate in definition['aggregates'] if isinstance(aggregate, dict)]
+        cache_key = report_cache_key(definition, report_dependencies(selected_model, field_names))
+        cached = None if request.data.get('refresh') else get_cached_report(cache_key)
+
+        # Preview: the first rows as JSON, to check a report before exporting it
+        if request.data.get('preview'):
+            if cached:
+                data = dict(preview_report(cached['columns'], cached['rows']), cached=True, generated_at=cached['generated_at'])
+            else:
+                data = dict(preview_report(columns, rows), cached=False, generated_at=timezone.now().isoformat())
+            response = Response(data)
+        elif cached:
+            response = stream_csv(cached['columns'], cached['rows'], f"{selected_model}_report.csv")
+        else:
+            # Stream the selected columns (or grouped totals) straight from the database to the CSV
+            response = stream_csv(columns, caching_rows(cache_key, columns, iter_report_rows(rows)), f"{selected_model}_report.csv")
 
+        response['X-Report-Cache'] = 'HIT' if cached else 'MISS'
+        if cached:
+            response['X-Report-Generated-At'] = cached['generated_at']
         return response
     
     
     
+def render_report_page(request, view_class, template_name):
+    """Renders a report page from its API view's rows, computed in-process with the same filters."""
+    try:
+        report_data = list_view_data(view_class, request)
+    except serializers.ValidationError as e:
+        return render(request, template_name, {'report_data': [], 'errors': e.detail}, status=400)
+    return render(request, template_name, {'report_data': report_data})
+
 def student_performance_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/student-performance/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/student_performance_report.html', {'report_data': report_data})
+    return render_report_page(request, StudentPerformanceReportView, 'reports/student_performance_report.html')
 
 def attendance_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/attendance/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/attendance_report.html', {'report_data': report_data})
+    return render_report_page(request, AttendanceReportView, 'reports/attendance_report.html')
 
 def enrollment_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/enrollment/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/enrollment_report.html', {'report_data': report_data})
+    return render_report_page(request, EnrollmentReportView, 'reports/enrollment_report.html')
 
 def financial_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/financial/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/financial_report.html', {'report_data': report_data})
+    return render_report_page(request, FinancialReportView, 'reports/financial_report.html')
 
 def fees_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/fees/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/fees_report.html', {'report_data': report_data})
+    return render_report_page(request, FeesReportView, 'reports/fees_report.html')
 
 def payments_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/payments/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/payments_report.html', {'report_data': report_data})
+    return render_report_page(request, PaymentsReportView, 'reports/payments_report.html')
 
 def student_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/students/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/student_report.html', {'report_data': report_data})
+    return render_report_page(request, StudentReportView, 'reports/student_report.html')
 
 def staff_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/staff/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/staff_report.html', {'report_data': report_data})
+    return render_report_page(request, StaffReportView, 'reports/staff_report.html')
 
 def course_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/courses/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/course_report.html', {'report_data': report_data})
+    return render_report_page(request, CourseReportView, 'reports/course_report.html')
 
 def class_report(request):
-    response = requests.get('http://127.0.0.1:8000/api/reports/classes/', params=request.GET)
-    report_data = response.json()
-    return render(request, 'reports/class_report.html', {'report_data': report_data})
+    return render_report_page(request, ClassReportView, 'reports/class_report.html')
 
 
 
@@ -271,35 +309,81 @@ class GenerateReportCardView(APIView):
 
         # Validate term and academic_year here if necessary
 
-        # Generate the PDF report card
+        # Generate the PDF report card in memory, unless the newest card was built from the same inputs
         try:
-            pdf_file_path = generate_report_card_pdf(student, term, academic_year)
+            card = build_report_card_data(student, term, academic_year)
+            existing = None
+            if not (request.data.get('preview') or request.data.get('force')):
+                existing = ReportCard.objects.filter(
+                    student=student, term=term, academic_year=academic_year
+                ).order_by('-generated_date', '-id').first()
+                if existing and existing.fingerprint != card['fingerprint']:
+                    existing = None
+            if existing is None:
+                file_name, pdf_bytes = render_report_card(card)
         except Exception as e:
             # Handle PDF generation errors
             return Response({"message": f"Error generating report card: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Preview: hand the bytes straight back without storing a report card
+        if request.data.get('preview'):
+            response = HttpResponse(pdf_bytes, content_type='application/pdf')
+            response['Content-Disposition'] = f'inline; filename="{file_name}"'
+            return response
         
-        # Create a ReportCard instance (if you decide to use a model)
-        report_card = ReportCard.objects.create(
-            student=student,
-            term=term,
-            academic_year=academic_year,
-            pdf_file=pdf_file_path 
-        )
+        if existing:
+            report_card = existing
+            message = "Report card is already up to date."
+            response_status = status.HTTP_200_OK
+        else:
+            # Create a ReportCard instance; saving uploads the bytes to storage
+            report_card = ReportCard.objects.create(
+                student=student,
+                term=term,
+                academic_year=academic_year,
+                pdf_file=report_card_upload(file_name, pdf_bytes),
+                fingerprint=card['fingerprint'],
+            )
+            message = "Report card generated successfully."
+            response_status = status.HTTP_201_CREATED
 
         # Generate a secure URL for the report card
-        report_card_url = request.build_absolute_uri(f"/media/report_cards/{os.path.basename(pdf_file_path)}")
+        report_card_url = report_card.pdf_file.url
 
         # Send SMS if requested
         if request.data.get('send_sms') and student.parent and student.parent.phone_number:
             send_report_card_sms_task.delay(student.id, report_card_url)
-            message = "Report card generated and sent via SMS."
-        else:
-            message = "Report card generated successfully."
+            message = f"{message} The link was sent via SMS."
 
         return Response({
             "message": message,
             "report_card_url": report_card_url
-        }, status=status.HTTP_201_CREATED)
+        }, status=response_status)
+
+
+class ReportCardBatchListCreateView(generics.ListCreateAPIView):
+    queryset = ReportCardBatch.objects.all()
+    serializer_class = ReportCardBatchSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['class_obj', 'term', 'academic_year', 'status']
+
+    def create(self, request, *args, **kwargs):
+        """
+        Queues report card generation for every student of a class (or, without a class,
+        of the whole academic year) and returns the batch to poll for progress.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        batch = serializer.save(requested_by=request.user)
+        transaction.on_commit(lambda: generate_report_card_batch_task.delay(batch.id))
+        return Response(self.get_serializer(batch).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ReportCardBatchRetrieveView(generics.RetrieveAPIView):
+    queryset = ReportCardBatch.objects.all()
+    serializer_class = ReportCardBatchSerializer
+    permission_classes = [IsAdmin]
         
 
 from django.http import FileResponse
@@ -346,21 +430,48 @@ class Echo:
         """Write the value by returning it, instead of storing in a buffer."""
         return value
 
-def generate_csv_report(request, serializer_class, queryset, filename):
-    # Create a StreamingHttpResponse with CSV content
+def stream_csv(header, rows, filename):
+    """Streams a header and an iterable of rows as a CSV download, one line at a time."""
     pseudo_buffer = Echo()
     writer = csv.writer(pseudo_buffer)
-    response = StreamingHttpResponse((writer.writerow(row) for row in get_csv_data(serializer_class, queryset)),
+    response = StreamingHttpResponse((writer.writerow(row) for row in chain([header], rows)),
                                      content_type="text/csv")
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
-def get_csv_data(serializer_class, queryset):
+def generate_csv_report(request, serializer_class, queryset, filename, chunk_size=2000):
+    # Create a StreamingHttpResponse with CSV content
+    rows = get_csv_data(serializer_class, queryset, chunk_size)
+    return stream_csv(next(rows), rows, filename)
+
+def csv_columns(fields, prefix=''):
+    """
+    Returns (column name, path) pairs for a serializer's fields, expanding nested
+    serializers into one column per sub-field (e.g. student__first_name).
+    """
+    columns = []
+    for name, field in fields.items():
+        if isinstance(field, serializers.Serializer):
+            columns.extend(csv_columns(field.fields, f"{prefix}{name}__"))
+        else:
+            columns.append((f"{prefix}{name}", f"{prefix}{name}".split('__')))
+    return columns
+
+def get_csv_data(serializer_class, queryset, chunk_size=2000):
+    # One serializer instance renders every row; the queryset is read in chunks
+    serializer = serializer_class()
+    columns = csv_columns(serializer.fields)
+
     # Get the header row from the serializer fields
-    header = [field for field in serializer_class.Meta.fields]
-    yield header
+    yield [name for name, _ in columns]
 
     # Yield data rows
-    serializer = serializer_class(queryset, many=True)
-    for item in serializer.data:
-        yield [item.get(field, '') for field in header]
\ No newline at end of file
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        item = serializer.to_representation(instance)
+        row = []
+        for _, path in columns:
+            value = item
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            row.append('' if value is None else value)
+        yield row
@@ -24,6 +24,7 @@ from django.contrib.auth.tokens import default_token_generator
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters,serializers
 from academics.models import Enrollment, Grade, Attendance, Assignment, Class
+from academics.scope import get_user_scope
 from academics.serializers import EnrollmentSerializer, GradeSerializer, AttendanceSerializer, AssignmentSerializer, ClassSerializer
 
 
@@ -303,16 +304,14 @@ class ParentChildrenListView(generics.ListAPIView):
     search_fields = ['first_name', 'last_name']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
-        return Student.objects.filter(parent=parent)
+        return Student.objects.filter(pk__in=get_user_scope(self.request.user).student_ids)
 
 class ParentChildDetailView(generics.RetrieveAPIView):
     serializer_class = StudentSerializer
     permission_classes = [IsParent]
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
-        return Student.objects.filter(parent=parent)
+        return Student.objects.filter(pk__in=get_user_scope(self.request.user).student_ids)
 
 class ParentChildEnrollmentsListView(generics.ListAPIView):
     serializer_class = EnrollmentSerializer
@@ -322,9 +321,10 @@ class ParentChildEnrollmentsListView(generics.ListAPIView):
     search_fields = ['course__name', 'class_enrolled__name']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
         student_id = self.kwargs.get('student_id')  # Get student ID from URL
-        return Enrollment.objects.filter(student__parent=parent, student_id=student_id)
+        if student_id not in get_user_scope(self.request.user).student_ids:
+            return Enrollment.objects.none()
+        return Enrollment.objects.filter(student_id=student_id)
 
 class ParentChildGradesListView(generics.ListAPIView):
     serializer_class = GradeSerializer
@@ -334,9 +334,10 @@ class ParentChildGradesListView(generics.ListAPIView):
     search_fields = ['course__name']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
         student_id = self.kwargs.get('student_id')
-        return Grade.objects.filter(student__parent=parent, student_id=student_id)
+        if student_id not in get_user_scope(self.request.user).student_ids:
+            return Grade.objects.none()
+        return Grade.objects.filter(student_id=student_id)
 
 class ParentChildAttendanceListView(generics.ListAPIView):
     serializer_class = AttendanceSerializer
@@ -346,9 +347,10 @@ class ParentChildAttendanceListView(generics.ListAPIView):
     search_fields = ['class_session__name', 'date']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
         student_id = self.kwargs.get('student_id')
-        return Attendance.objects.filter(student__parent=parent, student_id=student_id)
+        if student_id not in get_user_scope(self.request.user).student_ids:
+            return Attendance.objects.none()
+        return Attendance.objects.filter(student_id=student_id)
 
 class ParentChildAssignmentsListView(generics.ListAPIView):
     serializer_class = AssignmentSerializer
@@ -358,9 +360,10 @@ class ParentChildAssignmentsListView(generics.ListAPIView):
     search_fields = ['title', 'course__name']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
         student_id = self.kwargs.get('student_id')
-        return Assignment.objects.filter(course__classes__enrollments__student__parent=parent, course__classes__enrollments__student_id=student_id).distinct()
+        if student_id not in get_user_scope(self.request.user).student_ids:
+            return Assignment.objects.none()
+        return Assignment.objects.filter(course__classes__enrollments__student_id=student_id).distinct()
 
 class ParentChildClassesListView(generics.ListAPIView):
     serializer_class = ClassSerializer
@@ -370,6 +373,7 @@ class ParentChildClassesListView(generics.ListAPIView):
     search_fields = ['name', 'academic_year', 'courses__name']
 
     def get_queryset(self):
-        parent = self.request.user.parent_profile
         student_id = self.kwargs.get('student_id')  # Get student ID from URL
-        return Class.objects.filter(enrollments__student__parent=parent, enrollments__student_id=student_id).distinct()
\ No newline at end of file
+        if student_id not in get_user_scope(self.request.user).student_ids:
+            return Class.objects.none()
+        return Class.objects.filter(enrollments__student_id=student_id).distinct()
\ No newline at end of file